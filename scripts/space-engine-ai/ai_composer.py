@@ -4,8 +4,30 @@ Space Engine AI Composer
 Converts natural language prompts into Space Engine scripts using AI.
 """
 
-from typing import Optional
-from config import AI_PROVIDER, OPENAI_API_KEY, ANTHROPIC_API_KEY
+import asyncio
+import hashlib
+import json
+import time
+from functools import cached_property
+from typing import Iterator, Optional
+
+import se_script
+from cache import DiskCache
+from tracing import tracer
+from config import (
+    AI_PROVIDER,
+    OPENAI_API_KEY,
+    ANTHROPIC_API_KEY,
+    OPENAI_MODEL,
+    ANTHROPIC_MODEL,
+    AI_CACHE_ENABLED,
+    AI_CACHE_TTL,
+    AI_CACHE_SIZE,
+    AI_CONCURRENCY,
+    AI_MAX_RETRIES,
+    AI_STREAM,
+    CACHE_DIR,
+)
 
 # SE Script reference for AI context
 SE_SCRIPT_REFERENCE = """
@@ -47,6 +69,103 @@ COMMON OBJECTS:
 - "Milky Way/Asteroid Belt"     // Main asteroid belt
 """
 
+
+class ScriptStreamValidator:
+    """Incrementally validates SE Script text as it streams in
+    
+    Text is fed in arbitrary chunks; each complete line (or multi-line
+    `{ ... }` block) is checked as soon as it arrives. `complete` is set once
+    the terminal StartRecording command has been seen and `error` as soon as
+    a malformed command is found, so callers can stop generation early.
+    """
+    
+    MAX_BLOCK_LINES = 20  # A block still open after this many lines is malformed
+    
+    def __init__(self):
+        self.lines: list[str] = []
+        self.complete = False
+        self.error: Optional[str] = None
+        self._buffer = ''
+        self._block: list[str] = []
+    
+    @property
+    def done(self) -> bool:
+        return self.complete or self.error is not None
+    
+    @property
+    def script(self) -> str:
+        return '\n'.join(self.lines) + '\n'
+    
+    def feed(self, text: str) -> list[str]:
+        """Consume a chunk of text, returning the lines accepted from it"""
+        accepted = []
+        self._buffer += text
+        while '\n' in self._buffer and not self.done:
+            line, self._buffer = self._buffer.split('\n', 1)
+            accepted += self._accept(line)
+        return accepted
+    
+    def finish(self) -> list[str]:
+        """Flush the final unterminated line at end of stream"""
+        accepted = []
+        if self._buffer and not self.done:
+            accepted = self._accept(self._buffer)
+        self._buffer = ''
+        if self._block and not self.done:
+            self.error = f"Unterminated block: {self._block[0].strip()}"
+        return accepted
+    
+    def _accept(self, line: str) -> list[str]:
+        code = line.split('//', 1)[0].strip()
+        
+        # Markdown fences are not part of the script
+        if code.startswith('```'):
+            return []
+        
+        if self._block:
+            self._block.append(line)
+            code = ' '.join(l.split('//', 1)[0].strip() for l in self._block)
+            if code.count('{') > code.count('}'):
+                if len(self._block) > self.MAX_BLOCK_LINES:
+                    self.error = f"Unterminated block: {self._block[0].strip()}"
+                return []
+            lines, self._block = self._block, []
+            return self._check(code, lines)
+        
+        if not code:
+            self.lines.append(line)
+            return [line]
+        
+        if code.count('{') > code.count('}'):
+            self._block = [line]
+            return []
+        
+        return self._check(code, [line])
+    
+    def _check(self, code: str, lines: list[str]) -> list[str]:
+        command = code.split(None, 1)[0].split('{', 1)[0]
+        
+        if command not in se_script.COMMANDS:
+            self.error = f"Unknown command: {code}"
+            return []
+        if code.count('{') != code.count('}'):
+            self.error = f"Unbalanced braces: {code}"
+            return []
+        
+        # Flight path markers only parse as a group; check everything else fully
+        if command not in ('StartFlightPath', 'AddWaypoint', 'PlayFlightPath'):
+            try:
+                se_script.parse(code)
+            except ValueError as e:
+                self.error = f"{e}: {code}"
+                return []
+        
+        self.lines += lines
+        if command == 'StartRecording':
+            self.complete = True
+        return lines
+
+
 SCENE_TEMPLATES = {
     'black_hole': """
 // Black Hole - Event Horizon Approach
@@ -137,25 +256,66 @@ StartRecording {{ Width 3840 Height 2160 FPS 30 Duration {duration} }}
 class AIComposer:
     """Converts natural language to Space Engine scripts"""
     
-    def __init__(self):
+    def __init__(self, use_cache: bool = AI_CACHE_ENABLED):
         self.provider = AI_PROVIDER
-        self.client = self._init_client()
+        self.model = OPENAI_MODEL if self.provider == "openai" else ANTHROPIC_MODEL
+        self.temperature = 0.7
+        self._cooldown_until = 0.0  # Shared rate-limit pause for async requests
+        self.cache = DiskCache(CACHE_DIR / "ai_responses.json",
+                               max_entries=AI_CACHE_SIZE, ttl=AI_CACHE_TTL) if use_cache else None
+    
+    @cached_property
+    def client(self):
+        """Provider client, created on first use so templates never load an SDK"""
+        return self._init_client()
     
     def _init_client(self):
         """Initialize AI client based on provider"""
+        import http_transport
         if self.provider == "openai" and OPENAI_API_KEY:
             from openai import OpenAI
-            return OpenAI(api_key=OPENAI_API_KEY)
+            return OpenAI(api_key=OPENAI_API_KEY, http_client=http_transport.client(), max_retries=0)
         elif self.provider == "anthropic" and ANTHROPIC_API_KEY:
             from anthropic import Anthropic
-            return Anthropic(api_key=ANTHROPIC_API_KEY)
+            return Anthropic(api_key=ANTHROPIC_API_KEY, http_client=http_transport.client(), max_retries=0)
+        return None
+    
+    def _init_async_client(self):
+        """Initialize the provider's asyncio client
+        
+        The transport only retries connection failures here; status codes
+        are retried by _acomplete_with_retry, which pauses all requests.
+        The client's connections belong to the running event loop, so each
+        async entry point opens its own with `async with` and closes it.
+        """
+        import http_transport
+        if self.provider == "openai" and OPENAI_API_KEY:
+            from openai import AsyncOpenAI
+            return AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0,
+                               http_client=http_transport.async_client(retry_status=frozenset()))
+        elif self.provider == "anthropic" and ANTHROPIC_API_KEY:
+            from anthropic import AsyncAnthropic
+            return AsyncAnthropic(api_key=ANTHROPIC_API_KEY, max_retries=0,
+                                  http_client=http_transport.async_client(retry_status=frozenset()))
         return None
     
-    def from_template(self, template_name: str, duration: int = 600, **kwargs) -> str:
-        """Generate SE Script from a pre-defined template"""
+    def from_template(self, template_name: str, duration: int = 600,
+                      waypoints: Optional[int] = None, ease: str = 'ease_in_out',
+                      **kwargs) -> str:
+        """Generate SE Script from a pre-defined template
+        
+        With waypoints, the template's flight path is resampled into that many
+        smooth, arc-length-paced waypoints (see camera_path.py).
+        """
         if template_name not in SCENE_TEMPLATES:
             raise ValueError(f"Unknown template: {template_name}")
         
+        with tracer.span('ai.from_template', template=template_name, duration=duration,
+                         waypoints=waypoints or 0):
+            return self._from_template(template_name, duration, waypoints, ease, **kwargs)
+    
+    def _from_template(self, template_name: str, duration: int, waypoints: Optional[int],
+                       ease: str, **kwargs) -> str:
         template = SCENE_TEMPLATES[template_name]
         
         # Default parameters per template
@@ -166,14 +326,178 @@ class AIComposer:
         }
         params.update(kwargs)
         
-        return template.format(**params)
+        script = template.format(**params)
+        if not waypoints:
+            return script
+        
+        import camera_path
+        nodes = camera_path.densify(se_script.parse(script), waypoints, ease=ease)
+        return se_script.compile_script(nodes)
+    
+    def from_prompt(self, prompt: str, duration: int = 600,
+                    stream: bool = AI_STREAM) -> str:
+        """Generate SE Script from natural language using AI
+        
+        With stream (opt-in, AI_STREAM=1), the response is validated command
+        by command as it arrives and generation stops at the StartRecording
+        command (or at the first malformed command, which raises ValueError).
+        Validated and unvalidated responses are cached separately.
+        """
+        if not self.client:
+            raise RuntimeError("No AI client configured. Set OPENAI_API_KEY or ANTHROPIC_API_KEY")
+        
+        system_prompt = self._system_prompt(duration)
+        cache_key = self._cache_key(system_prompt, prompt, validated=stream)
+        with tracer.span('ai.from_prompt', provider=self.provider, model=self.model,
+                         stream=stream, cached=False) as span:
+            if self.cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    span.set(cached=True, output_chars=len(cached))
+                    return cached
+            
+            if stream:
+                script = ''.join(f"{line}\n" for line in self._stream_script(system_prompt, prompt))
+            else:
+                script = self._complete(system_prompt, prompt)
+            span.set(output_chars=len(script))
+        
+        if self.cache:
+            self.cache.put(cache_key, script)
+        return script
     
-    def from_prompt(self, prompt: str, duration: int = 600) -> str:
-        """Generate SE Script from natural language using AI"""
+    def stream_prompt(self, prompt: str, duration: int = 600) -> Iterator[str]:
+        """Yield validated SE Script lines as the AI generates them"""
         if not self.client:
             raise RuntimeError("No AI client configured. Set OPENAI_API_KEY or ANTHROPIC_API_KEY")
         
-        system_prompt = f"""You are a Space Engine script generator. Convert the user's natural language 
+        yield from self._stream_script(self._system_prompt(duration), prompt)
+    
+    def _stream_script(self, system_prompt: str, prompt: str) -> Iterator[str]:
+        """Validate streamed output, closing the stream as soon as the outcome is known"""
+        validator = ScriptStreamValidator()
+        chunks = self._stream_chunks(system_prompt, prompt)
+        try:
+            for chunk in chunks:
+                yield from validator.feed(chunk)
+                if validator.done:
+                    break
+            else:
+                yield from validator.finish()
+        finally:
+            chunks.close()  # Stops generation on the provider side
+        
+        if validator.error:
+            raise ValueError(f"AI generated an invalid SE Script: {validator.error}")
+        if not validator.complete:
+            raise ValueError("AI generated an SE Script without a StartRecording command")
+    
+    def _stream_chunks(self, system_prompt: str, prompt: str) -> Iterator[str]:
+        """Yield response text from the configured provider as it is generated"""
+        with tracer.span('ai.stream', provider=self.provider, model=self.model) as span:
+            try:
+                yield from self._stream_provider(system_prompt, prompt, span)
+            except GeneratorExit:
+                # Closed by the validator once the outcome is known; the final
+                # usage is never received, so output_tokens may be missing
+                span.set(stopped_early=True)
+    
+    def _stream_provider(self, system_prompt: str, prompt: str, span) -> Iterator[str]:
+        """Provider stream as text, recording token counts on span as they arrive"""
+        if self.provider == "openai":
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=self.temperature,
+                stream=True,
+                stream_options={"include_usage": True}  # Sent on a final, choice-less chunk
+            )
+            try:
+                for chunk in stream:
+                    if getattr(chunk, 'usage', None):
+                        span.set(**self._usage(chunk))
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                stream.close()
+        
+        elif self.provider == "anthropic":
+            with self.client.messages.stream(
+                model=self.model,
+                max_tokens=2000,
+                system=system_prompt,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=self.temperature
+            ) as stream:
+                for event in stream:
+                    if event.type == "message_start":
+                        span.set(**self._usage(event.message))
+                    elif event.type == "message_delta":
+                        # Cumulative output count, final on the last delta
+                        span.set(output_tokens=event.usage.output_tokens)
+                    elif event.type == "text":
+                        yield event.text
+        
+        else:
+            raise RuntimeError(f"Unknown provider: {self.provider}")
+    
+    async def afrom_prompt(self, prompt: str, duration: int = 600) -> str:
+        """Async variant of from_prompt using the provider's asyncio client"""
+        async with self._async_session() as client:
+            return await self._afrom_prompt(client, prompt, duration)
+    
+    async def agenerate_many(self, prompts: list[str], duration: int = 600,
+                             concurrency: int = AI_CONCURRENCY) -> list[str]:
+        """Generate scripts for many prompts concurrently, results in input order
+        
+        All requests share one client. If any prompt fails, the others are
+        cancelled and the first error is raised.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async with self._async_session() as client:
+            async def generate(prompt: str) -> str:
+                async with semaphore:
+                    return await self._afrom_prompt(client, prompt, duration)
+            
+            tasks = [asyncio.ensure_future(generate(prompt)) for prompt in prompts]
+            try:
+                return await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+    
+    def _async_session(self):
+        """A fresh asyncio client for one async call (use with `async with`)"""
+        client = self._init_async_client()
+        if not client:
+            raise RuntimeError("No AI client configured. Set OPENAI_API_KEY or ANTHROPIC_API_KEY")
+        return client
+    
+    async def _afrom_prompt(self, client, prompt: str, duration: int) -> str:
+        system_prompt = self._system_prompt(duration)
+        cache_key = self._cache_key(system_prompt, prompt)
+        if self.cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        script = await self._acomplete_with_retry(client, system_prompt, prompt)
+        
+        if self.cache:
+            self.cache.put(cache_key, script)
+        return script
+    
+    def _system_prompt(self, duration: int) -> str:
+        """System prompt for script generation"""
+        return f"""You are a Space Engine script generator. Convert the user's natural language 
 description into a valid Space Engine script.
 
 {SE_SCRIPT_REFERENCE}
@@ -187,31 +511,143 @@ Guidelines:
 6. Target duration: {duration} seconds
 
 Output ONLY the SE Script, no explanations."""
-
+    
+    def _cache_key(self, system_prompt: str, prompt: str, validated: bool = False) -> str:
+        """Identity of a request: provider, model, system prompt, prompt, temperature
+        
+        validated marks responses that passed ScriptStreamValidator, so an
+        unchecked response is never served to a caller that asked for one.
+        """
+        payload = json.dumps({
+            'provider': self.provider,
+            'model': self.model,
+            'system': hashlib.sha256(system_prompt.encode('utf-8')).hexdigest(),
+            'prompt': prompt,
+            'temperature': self.temperature,
+            'validated': validated,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def _usage(response) -> dict:
+        """Token counts reported by either provider, as span attributes"""
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return {}
+        input_tokens = getattr(usage, 'input_tokens', None) or getattr(usage, 'prompt_tokens', None)
+        output_tokens = getattr(usage, 'output_tokens', None) or getattr(usage, 'completion_tokens', None)
+        return {'input_tokens': input_tokens, 'output_tokens': output_tokens}
+    
+    def _complete(self, system_prompt: str, prompt: str) -> str:
+        """Send one request to the configured provider"""
+        with tracer.span('ai.complete', provider=self.provider, model=self.model) as span:
+            response = self._request(system_prompt, prompt)
+            span.set(**self._usage(response))
+        if self.provider == "openai":
+            return response.choices[0].message.content
+        return response.content[0].text
+    
+    def _request(self, system_prompt: str, prompt: str):
+        """Raw (non-streaming) provider response"""
         if self.provider == "openai":
-            response = self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
+            return self.client.chat.completions.create(
+                model=self.model,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.7
+                temperature=self.temperature
             )
+        
+        elif self.provider == "anthropic":
+            return self.client.messages.create(
+                model=self.model,
+                max_tokens=2000,
+                system=system_prompt,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=self.temperature
+            )
+        
+        raise RuntimeError(f"Unknown provider: {self.provider}")
+    
+    async def _acomplete(self, client, system_prompt: str, prompt: str) -> str:
+        """Send one request through the async client"""
+        with tracer.span('ai.acomplete', provider=self.provider, model=self.model) as span:
+            response = await self._arequest(client, system_prompt, prompt)
+            span.set(**self._usage(response))
+        if self.provider == "openai":
             return response.choices[0].message.content
+        return response.content[0].text
+    
+    async def _arequest(self, client, system_prompt: str, prompt: str):
+        """Raw provider response from the async client"""
+        if self.provider == "openai":
+            return await client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=self.temperature
+            )
         
         elif self.provider == "anthropic":
-            response = self.client.messages.create(
-                model="claude-3-opus-20240229",
+            return await client.messages.create(
+                model=self.model,
                 max_tokens=2000,
                 system=system_prompt,
                 messages=[
                     {"role": "user", "content": prompt}
-                ]
+                ],
+                temperature=self.temperature
             )
-            return response.content[0].text
         
         raise RuntimeError(f"Unknown provider: {self.provider}")
     
+    async def _acomplete_with_retry(self, client, system_prompt: str, prompt: str) -> str:
+        """Retry rate-limited requests with exponential backoff
+        
+        A rate limit on one request pauses every request to the provider
+        (not just the one that failed), honouring Retry-After when given.
+        """
+        import http_transport
+        for attempt in range(AI_MAX_RETRIES + 1):
+            pause = self._cooldown_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            
+            try:
+                return await self._acomplete(client, system_prompt, prompt)
+            except Exception as e:
+                status = getattr(e, 'status_code', None)
+                if status not in http_transport.RETRYABLE_STATUS or attempt == AI_MAX_RETRIES:
+                    raise
+                
+                response = getattr(e, 'response', None)
+                delay = http_transport.backoff(attempt, http_transport.retry_after(getattr(response, 'headers', None)))
+                self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+                print(f"AI provider returned {status}, retrying in {delay:.1f}s")
+    
+    def adjust_script(self, script: str, duration: Optional[float] = None,
+                      resolution: Optional[tuple[int, int]] = None,
+                      fov: Optional[float] = None,
+                      exposure: Optional[float] = None) -> str:
+        """Apply common adjustments locally through the SE Script IR (no AI call)"""
+        nodes = se_script.parse(script)
+        
+        if duration is not None:
+            se_script.rescale_duration(nodes, duration)
+        if resolution is not None:
+            se_script.set_resolution(nodes, *resolution)
+        if fov is not None:
+            se_script.set_fov(nodes, fov)
+        if exposure is not None:
+            se_script.set_exposure(nodes, exposure)
+        
+        return se_script.compile_script(nodes)
+    
     def enhance_script(self, script: str, enhancements: list[str]) -> str:
         """Use AI to enhance an existing script with additional features"""
         if not self.client:
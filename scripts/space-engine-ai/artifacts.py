@@ -0,0 +1,92 @@
+"""
+Artifact Store
+
+Content-addressed storage for render pipeline stage outputs (SE script, raw
+recording, processed video). Each artifact is stored under a key hashed from
+the inputs that produced it, so a rerun with the same inputs can skip every
+stage that already finished.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Optional
+
+from config import ARTIFACTS_DIR
+
+
+class ArtifactStore:
+    """Stage outputs stored as <root>/<stage>/<key><suffix>"""
+    
+    def __init__(self, root: Path = ARTIFACTS_DIR):
+        self.root = root
+    
+    @staticmethod
+    def key(stage: str, **inputs) -> str:
+        """Hash the inputs of a stage into an artifact key"""
+        payload = json.dumps({'stage': stage, **inputs}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:24]
+    
+    @staticmethod
+    def digest(text: str) -> str:
+        """Content hash used to chain text artifacts into downstream keys"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    
+    def path(self, stage: str, key: str, suffix: str) -> Path:
+        """Final location of an artifact (which may not exist yet)"""
+        return self.root / stage / f"{key}{suffix}"
+    
+    def get(self, stage: str, key: str, suffix: str) -> Optional[Path]:
+        """Return the artifact path if the stage already completed"""
+        path = self.path(stage, key, suffix)
+        return path if path.exists() else None
+    
+    def find(self, stage: str, key: str, suffixes: tuple[str, ...]) -> Optional[Path]:
+        """Like get(), for an artifact that may be stored under any of suffixes"""
+        for suffix in suffixes:
+            path = self.get(stage, key, suffix)
+            if path:
+                return path
+        return None
+    
+    def reserve(self, stage: str, key: str, suffix: str) -> Path:
+        """Scratch path to write an artifact into before commit()"""
+        path = self.path(stage, key, suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path.with_name(f".partial_{path.name}")
+    
+    def commit(self, stage: str, key: str, partial: Path) -> Path:
+        """Atomically publish a reserved artifact once it is complete"""
+        path = self.path(stage, key, partial.suffix)
+        os.replace(partial, path)
+        return path
+    
+    def put(self, stage: str, key: str, source: Path, move: bool = False,
+            suffix: Optional[str] = None) -> Path:
+        """Store an existing file as an artifact (under source's suffix by default)"""
+        partial = self.reserve(stage, key, suffix or source.suffix)
+        if move:
+            shutil.move(str(source), str(partial))
+        else:
+            shutil.copy2(source, partial)
+        return self.commit(stage, key, partial)
+    
+    def put_text(self, stage: str, key: str, text: str, suffix: str) -> Path:
+        """Store text content as an artifact"""
+        partial = self.reserve(stage, key, suffix)
+        partial.write_text(text)
+        return self.commit(stage, key, partial)
+    
+    @staticmethod
+    def publish(artifact: Path, output_path: Path) -> Path:
+        """Expose an artifact at a user-facing path (hard link, else copy)"""
+        if output_path.exists():
+            output_path.unlink()
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(artifact, output_path)
+        except OSError:
+            shutil.copy2(artifact, output_path)
+        return output_path
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Video Pipeline Benchmarks
+
+Times every VideoProcessor operation (and AIComposer.from_template) on
+deterministic synthetic clips generated with FFmpeg's testsrc2 / sine lavfi
+sources, and writes the results to JSON so runs can be compared. Runs fully
+offline on a CPU-only machine: no Space Engine, GPU or API key needed.
+
+Usage:
+    python benchmark.py                                # 1080p + 4K, 10s clips
+    python benchmark.py -r 1080p -d 5 --repeat 5
+    python benchmark.py --only crossfade --compare output/benchmarks/before.json
+"""
+
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import click
+
+from config import OUTPUT_DIR, RESOLUTION_PRESETS, RENDITIONS, DEFAULT_FPS, ENCODE_WORKERS
+
+BENCH_DIR = OUTPUT_DIR / "benchmarks"
+CLIPS_DIR = BENCH_DIR / "clips"
+
+# Synthetic sources: moving test pattern plus a 440 Hz tone
+AUDIO_RATE = 48000
+TONE_HZ = 440
+
+
+def _ffmpeg() -> str:
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        raise click.ClickException("FFmpeg not found in PATH")
+    return ffmpeg
+
+
+def make_clip(resolution: str, duration: int) -> Path:
+    """Deterministic H.264 + AAC test clip (generated once, then reused)"""
+    width, height = RESOLUTION_PRESETS[resolution]
+    path = CLIPS_DIR / f"testsrc2_{width}x{height}_{DEFAULT_FPS}fps_{duration}s.mp4"
+    if path.exists():
+        return path
+
+    CLIPS_DIR.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f".partial_{path.name}")
+    subprocess.run([
+        _ffmpeg(), '-v', 'error',
+        '-f', 'lavfi', '-i', f"testsrc2=size={width}x{height}:rate={DEFAULT_FPS}:duration={duration}",
+        '-f', 'lavfi', '-i', f"sine=frequency={TONE_HZ}:sample_rate={AUDIO_RATE}:duration={duration}",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+        '-g', str(DEFAULT_FPS * 2), '-threads', '1',  # Single-threaded x264 is bit-exact across runs
+        '-c:a', 'aac', '-b:a', '128k',
+        '-movflags', '+faststart',  # Index first, so process_live can read it from a pipe
+        '-fflags', '+bitexact', '-flags', '+bitexact', '-map_metadata', '-1',
+        '-f', 'mp4', '-y', str(partial),
+    ], check=True)
+    os.replace(partial, path)
+    return path
+
+
+def make_audio(duration: int) -> Path:
+    """Deterministic WAV tone for the audio-merge benchmarks"""
+    path = CLIPS_DIR / f"sine_{TONE_HZ}hz_{duration}s.wav"
+    if path.exists():
+        return path
+
+    CLIPS_DIR.mkdir(parents=True, exist_ok=True)
+    subprocess.run([
+        _ffmpeg(), '-v', 'error',
+        '-f', 'lavfi', '-i', f"sine=frequency={TONE_HZ * 2}:sample_rate={AUDIO_RATE}:duration={duration}",
+        '-fflags', '+bitexact', '-y', str(path),
+    ], check=True)
+    return path
+
+
+def _cases(processor, composer, clip: Path, audio: Path, duration: int, work: Path) -> dict:
+    """Benchmark name -> callable returning the path(s) it produced"""
+    import probe
+
+    fade = min(2.0, duration / 4)
+    loop_to = duration * 3
+    workers = max(2, ENCODE_WORKERS)
+
+    def scratch_copy() -> Path:
+        # _merge_audio deletes its input, so give it a throwaway copy
+        copy = work / f"copy_{clip.name}"
+        shutil.copyfile(clip, copy)
+        return copy
+    
+    ladder = {name: work / f"rendition_{name}.mp4" for name in RENDITIONS}
+
+    return {
+        'probe_cold': lambda: probe._ffprobe(clip),
+        'probe_keyframes': lambda: probe.keyframes(clip),
+        'probe_cached': lambda: processor._get_duration(clip),
+        'process': lambda: processor.process(clip, work / "process.mp4", workers=1),
+        'process_audio': lambda: processor.process(clip, work / "process_audio.mp4",
+                                                   audio_path=audio, workers=1),
+        'process_chunked': lambda: processor.process(clip, work / "process_chunked.mp4",
+                                                     workers=workers),
+        'process_thumbnail': lambda: [processor.process(clip, work / "process_thumb.mp4",
+                                                        thumbnail=True, workers=1),
+                                      work / "process_thumb.jpg"],
+        'process_live': lambda: processor.process_live(clip, work / "process_live.mp4",
+                                                       finished=lambda: True),
+        'process_renditions': lambda: [processor.process(clip, work / "process_ladder.mp4",
+                                                         renditions=ladder, workers=1),
+                                       *ladder.values()],
+        # The same ladder the old way: one pass (and decode) per deliverable
+        'renditions_single_pass': lambda: list(
+            processor.process_renditions(clip, ladder).values()),
+        'renditions_separate_passes': lambda: [
+            path for name, path in ladder.items()
+            for path in processor.process_renditions(clip, {name: path}).values()],
+        'optimize': lambda: processor._optimize(clip, workers=1),
+        'merge_audio': lambda: processor._merge_audio(scratch_copy(), audio),
+        'loop_video': lambda: processor.loop_video(clip, loop_to, work / "loop.mp4"),
+        'crossfade_loop': lambda: processor.crossfade_loop(clip, loop_to, fade),
+        'crossfade_loop_reencode': lambda: processor.crossfade_loop(clip, loop_to, fade,
+                                                                    stream_copy=False),
+        'add_thumbnail': lambda: processor.add_thumbnail(clip, timestamp=duration / 2,
+                                                         thumbnail_path=work / "thumb.jpg"),
+        'from_template': lambda: composer.from_template('black_hole', duration=duration),
+        'from_template_waypoints': lambda: composer.from_template(
+            'black_hole', duration=duration, waypoints=duration * DEFAULT_FPS),
+    }
+
+
+def _outputs(result) -> list[Path]:
+    """Files a benchmark produced (other return values are ignored)"""
+    results = result if isinstance(result, list) else [result]
+    return [p for p in results if isinstance(p, Path)]
+
+
+def _time(fn, repeat: int) -> tuple[list[float], int]:
+    """Wall-clock seconds per run, and bytes written by the last run"""
+    times, written = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        outputs = _outputs(fn())
+        times.append(time.perf_counter() - started)
+        written = sum(p.stat().st_size for p in outputs if p.exists())
+        for p in outputs:
+            if p.exists() and CLIPS_DIR not in p.parents:
+                p.unlink()
+    return times, written
+
+
+def _ffmpeg_version() -> str:
+    result = subprocess.run([_ffmpeg(), '-version'], capture_output=True, text=True)
+    return result.stdout.splitlines()[0] if result.stdout else 'unknown'
+
+
+def _git_commit() -> str:
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                            text=True, cwd=Path(__file__).parent)
+    return result.stdout.strip() or 'unknown'
+
+
+def _compare(results: list[dict], baseline_path: Path):
+    baseline = {
+        (r['resolution'], r['name']): r['median_seconds']
+        for r in json.loads(baseline_path.read_text())['results']
+    }
+    click.echo(f"\nCompared with {baseline_path.name} (median, lower is better):")
+    for r in results:
+        before = baseline.get((r['resolution'], r['name']))
+        if before:
+            change = (r['median_seconds'] - before) / before * 100
+            click.echo(f"  {r['resolution']:>6} {r['name']:<26} {before:8.3f}s -> "
+                       f"{r['median_seconds']:8.3f}s ({change:+.1f}%)")
+
+
+@click.command()
+@click.option('--resolution', '-r', 'resolutions', multiple=True, default=['1080p', '4k'],
+              type=click.Choice(list(RESOLUTION_PRESETS)), help='Clip resolutions (repeatable)')
+@click.option('--duration', '-d', type=int, default=10, help='Clip length in seconds (default: 10)')
+@click.option('--repeat', '-n', type=int, default=3, help='Timed runs per benchmark (default: 3)')
+@click.option('--only', multiple=True, help='Run benchmarks whose name contains this (repeatable)')
+@click.option('--output', '-o', type=click.Path(path_type=Path), help='Results JSON path')
+@click.option('--compare', type=click.Path(exists=True, path_type=Path),
+              help='Earlier results JSON to compare against')
+@click.option('--trace', is_flag=True, help='Also write a Chrome trace of every FFmpeg/AI span')
+def main(resolutions, duration, repeat, only, output, compare, trace):
+    """Benchmark VideoProcessor on synthetic lavfi clips"""
+    from ai_composer import AIComposer
+    from video_pipeline import VideoProcessor
+
+    processor = VideoProcessor()
+    composer = AIComposer(use_cache=False)  # from_template never calls the API
+    audio = make_audio(duration)
+    results = []
+
+    for resolution in resolutions:
+        clip = make_clip(resolution, duration)
+        processor._get_duration(clip)  # Prime the probe cache for probe_cached
+        click.echo(f"\n{resolution} ({clip.name}, {clip.stat().st_size / 1024 / 1024:.1f} MB)")
+
+        with tempfile.TemporaryDirectory(prefix="bench_", dir=BENCH_DIR) as work:
+            cases = _cases(processor, composer, clip, audio, duration, Path(work))
+            for name, fn in cases.items():
+                if only and not any(pattern in name for pattern in only):
+                    continue
+
+                times, written = _time(fn, repeat)
+                median = statistics.median(times)
+                results.append({
+                    'name': name,
+                    'resolution': resolution,
+                    'clip_seconds': duration,
+                    'input_bytes': clip.stat().st_size,
+                    'output_bytes': written,
+                    'runs_seconds': [round(t, 4) for t in times],
+                    'median_seconds': round(median, 4),
+                    'min_seconds': round(min(times), 4),
+                    # Seconds of clip processed per wall-clock second
+                    'realtime_factor': round(duration / median, 2) if median else None,
+                })
+                click.echo(f"  {name:<26} median {median:8.3f}s  min {min(times):8.3f}s")
+
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'ffmpeg': _ffmpeg_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {'duration': duration, 'repeat': repeat, 'fps': DEFAULT_FPS,
+                     'encode_workers': max(2, ENCODE_WORKERS)},
+        'results': results,
+    }
+
+    if not output:
+        output = BENCH_DIR / f"bench_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    click.echo(f"\nResults: {output}")
+
+    if trace:
+        from tracing import tracer
+        trace_path = tracer.write_chrome_trace(output.with_suffix('.trace.json'))
+        click.echo(f"Trace: {trace_path}")
+
+    if compare:
+        _compare(results, compare)
+
+
+if __name__ == '__main__':
+    main()
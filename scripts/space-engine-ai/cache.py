@@ -0,0 +1,77 @@
+"""
+Disk Cache
+
+Small JSON-backed LRU cache persisted to a single file. Used to remember
+results that are expensive to recompute (ffprobe metadata, AI responses)
+across runs.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+
+class DiskCache:
+    """Persistent LRU cache with optional time-to-live"""
+    
+    def __init__(self, path: Path, max_entries: int = 512, ttl: Optional[float] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: Optional[OrderedDict] = None
+        self._lock = threading.Lock()
+    
+    def _load(self) -> OrderedDict:
+        """Read entries from disk on first use"""
+        if self._entries is None:
+            self._entries = OrderedDict()
+            if self.path.exists():
+                try:
+                    self._entries.update(json.loads(self.path.read_text()))
+                except (OSError, ValueError):
+                    pass  # Corrupt or unreadable cache, start fresh
+        return self._entries
+    
+    def _save(self):
+        """Write entries atomically so concurrent readers never see a partial file"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self._entries))
+        os.replace(tmp, self.path)
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            
+            if self.ttl is not None and time.time() - entry['time'] > self.ttl:
+                del entries[key]
+                return None
+            
+            entries.move_to_end(key)
+            return entry['value']
+    
+    def put(self, key: str, value: Any):
+        """Store a JSON-serializable value, evicting least recently used entries"""
+        with self._lock:
+            entries = self._load()
+            entries[key] = {'time': time.time(), 'value': value}
+            entries.move_to_end(key)
+            
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            
+            self._save()
+    
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries = OrderedDict()
+            self._save()
@@ -0,0 +1,215 @@
+"""
+Camera Path
+
+NumPy-backed flight path generation. Takes a handful of control waypoints
+(positions, distances, rotations) and produces dense, smooth waypoint arrays:
+- Catmull-Rom (interpolating) or cubic B-spline (approximating) positions
+- Quaternion slerp rotations
+- Arc-length reparameterization so the camera moves at a steady speed,
+  shaped by an ease curve
+
+Everything is computed in batch on arrays, so tens of thousands of waypoints
+cost milliseconds.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+import se_script
+
+# Ease curves map normalized time [0, 1] to normalized path progress [0, 1]
+EASINGS = {
+    'linear': lambda t: t,
+    'ease_in': lambda t: t * t,
+    'ease_out': lambda t: 1 - (1 - t) ** 2,
+    'ease_in_out': lambda t: t * t * (3 - 2 * t),
+    'sine': lambda t: 0.5 - 0.5 * np.cos(np.pi * t),
+}
+
+# Samples of the curve used to measure arc length, per output waypoint
+ARC_LENGTH_OVERSAMPLE = 4
+
+
+def _pad(points: np.ndarray) -> np.ndarray:
+    """Add reflected phantom points so the curve reaches both end points"""
+    if len(points) == 1:
+        return np.repeat(points, 4, axis=0)
+    first = 2 * points[:1] - points[1:2]
+    last = 2 * points[-1:] - points[-2:-1]
+    return np.concatenate([first, points, last])
+
+
+def _segments(points: np.ndarray, u: np.ndarray):
+    """Control points and local parameter for each curve parameter u in [0, K-1]"""
+    padded = _pad(points)
+    seg = np.clip(np.floor(u).astype(int), 0, max(len(points) - 2, 0))
+    t = (u - seg)[:, None]
+    return padded[seg], padded[seg + 1], padded[seg + 2], padded[seg + 3], t
+
+
+def catmull_rom(points: np.ndarray, u: np.ndarray) -> np.ndarray:
+    """Uniform Catmull-Rom spline through points, evaluated at u in [0, K-1]"""
+    p0, p1, p2, p3, t = _segments(points, u)
+    return 0.5 * (
+        2 * p1
+        + (p2 - p0) * t
+        + (2 * p0 - 5 * p1 + 4 * p2 - p3) * t ** 2
+        + (3 * p1 - p0 - 3 * p2 + p3) * t ** 3
+    )
+
+
+def bspline(points: np.ndarray, u: np.ndarray) -> np.ndarray:
+    """Uniform cubic B-spline guided by points (passes through the end points)"""
+    p0, p1, p2, p3, t = _segments(points, u)
+    t2, t3 = t ** 2, t ** 3
+    return (
+        p0 * (1 - t) ** 3
+        + p1 * (3 * t3 - 6 * t2 + 4)
+        + p2 * (-3 * t3 + 3 * t2 + 3 * t + 1)
+        + p3 * t3
+    ) / 6
+
+
+CURVES = {'catmull_rom': catmull_rom, 'bspline': bspline}
+
+
+def slerp(q0: np.ndarray, q1: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """Row-wise spherical interpolation between unit quaternions (x, y, z, w)"""
+    q0 = q0 / np.linalg.norm(q0, axis=1, keepdims=True)
+    q1 = q1 / np.linalg.norm(q1, axis=1, keepdims=True)
+    t = t.reshape(-1, 1)
+
+    dot = np.sum(q0 * q1, axis=1, keepdims=True)
+    q1 = np.where(dot < 0, -q1, q1)  # Take the short way round
+    dot = np.abs(dot)
+
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+    nearly_equal = sin_theta < 1e-6
+    safe_sin = np.where(nearly_equal, 1.0, sin_theta)
+
+    w0 = np.where(nearly_equal, 1 - t, np.sin((1 - t) * theta) / safe_sin)
+    w1 = np.where(nearly_equal, t, np.sin(t * theta) / safe_sin)
+    result = w0 * q0 + w1 * q1
+    return result / np.linalg.norm(result, axis=1, keepdims=True)
+
+
+class CameraPath:
+    """Smooth camera path through control waypoints"""
+
+    def __init__(self, times: Optional[np.ndarray] = None,
+                 positions: Optional[np.ndarray] = None,
+                 rotations: Optional[np.ndarray] = None,
+                 distances: Optional[np.ndarray] = None,
+                 method: str = 'catmull_rom'):
+        if method not in CURVES:
+            raise ValueError(f"Unknown curve: {method}")
+
+        tracks = [np.asarray(a, dtype=float) for a in (positions, rotations, distances) if a is not None]
+        if not tracks:
+            raise ValueError("Camera path needs positions, rotations or distances")
+
+        count = len(tracks[0])
+        if any(len(track) != count for track in tracks):
+            raise ValueError("Every control track needs the same number of points")
+
+        self.count = count
+        self.times = np.asarray(times if times is not None else np.arange(count), dtype=float)
+        self.positions = None if positions is None else np.asarray(positions, dtype=float)
+        self.rotations = None if rotations is None else np.asarray(rotations, dtype=float)
+        # Distances span orders of magnitude, so interpolate them in log space
+        self.log_distances = None if distances is None else np.log10(np.asarray(distances, dtype=float))[:, None]
+        self.curve = CURVES[method]
+
+    def _driving_track(self) -> Optional[np.ndarray]:
+        """Track whose arc length sets the camera's pace"""
+        if self.positions is not None:
+            return self.positions
+        return self.log_distances
+
+    def parameters(self, count: int, ease: str = 'ease_in_out') -> np.ndarray:
+        """Curve parameters u in [0, K-1] for count evenly timed waypoints"""
+        if ease not in EASINGS:
+            raise ValueError(f"Unknown ease curve: {ease}")
+
+        progress = EASINGS[ease](np.linspace(0.0, 1.0, count))
+        last = self.count - 1
+        track = self._driving_track()
+
+        if track is not None and last > 0:
+            # Arc-length table: cumulative distance along a finely sampled curve
+            fine_u = np.linspace(0.0, last, max(count * ARC_LENGTH_OVERSAMPLE, 1024))
+            fine = self.curve(track, fine_u)
+            arc = np.concatenate([[0.0], np.cumsum(np.linalg.norm(np.diff(fine, axis=0), axis=1))])
+            if arc[-1] > 0:
+                return np.interp(progress * arc[-1], arc, fine_u)
+
+        # No measurable length (e.g. rotation-only paths): follow control timing
+        elapsed = self.times[0] + progress * (self.times[-1] - self.times[0])
+        return np.interp(elapsed, self.times, np.arange(self.count, dtype=float))
+
+    def sample(self, count: int, duration: float, ease: str = 'ease_in_out') -> dict:
+        """Dense waypoint arrays: {'Time', 'Pos', 'Rot', 'Dist'} (tracks present only)"""
+        u = self.parameters(count, ease)
+        samples = {'Time': np.linspace(0.0, duration, count)}
+
+        if self.positions is not None:
+            samples['Pos'] = self.curve(self.positions, u)
+        if self.log_distances is not None:
+            samples['Dist'] = 10 ** self.curve(self.log_distances, u)[:, 0]
+        if self.rotations is not None:
+            if self.count == 1:
+                samples['Rot'] = np.repeat(self.rotations, count, axis=0)
+            else:
+                seg = np.clip(np.floor(u).astype(int), 0, self.count - 2)
+                samples['Rot'] = slerp(self.rotations[seg], self.rotations[seg + 1], u - seg)
+
+        return samples
+
+    @classmethod
+    def from_flight_path(cls, path: se_script.FlightPath, method: str = 'catmull_rom') -> 'CameraPath':
+        """Use the waypoints of a parsed flight path as control points"""
+        waypoints = [w for w in path.waypoints if isinstance(w, se_script.Waypoint)]
+        if not waypoints:
+            raise ValueError("Flight path has no waypoints")
+
+        def track(key: str):
+            if all(key in w.params for w in waypoints):
+                return [w.params[key] for w in waypoints]
+            return None
+
+        return cls(
+            times=[w.time for w in waypoints],
+            positions=track('Pos'),
+            rotations=track('Rot'),
+            distances=track('Dist'),
+            method=method,
+        )
+
+
+def to_waypoints(samples: dict) -> list[se_script.Waypoint]:
+    """Convert sampled arrays into SE Script waypoint nodes"""
+    columns = {}
+    if 'Pos' in samples:
+        columns['Pos'] = [tuple(row) for row in samples['Pos'].tolist()]
+    if 'Rot' in samples:
+        columns['Rot'] = [tuple(row) for row in np.round(samples['Rot'], 6).tolist()]
+    if 'Dist' in samples:
+        columns['Dist'] = samples['Dist'].tolist()
+
+    times = np.round(samples['Time'], 3).tolist()
+    return [
+        se_script.Waypoint(time=time, params={key: values[i] for key, values in columns.items()})
+        for i, time in enumerate(times)
+    ]
+
+
+def densify(script: se_script.Script, count: int, ease: str = 'ease_in_out',
+            method: str = 'catmull_rom') -> se_script.Script:
+    """Replace every flight path in a parsed script with count smooth waypoints"""
+    for path in se_script.find(script, se_script.FlightPath):
+        camera = CameraPath.from_flight_path(path, method=method)
+        samples = camera.sample(count, duration=path.duration, ease=ease)
+        path.waypoints = to_waypoints(samples)
+    return script
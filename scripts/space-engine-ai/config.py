@@ -18,14 +18,42 @@ SPACE_ENGINE_DATA = os.getenv(
 )
 
 # Output settings
-OUTPUT_DIR = Path(__file__).parent / "output"
-OUTPUT_DIR.mkdir(exist_ok=True)
+OUTPUT_DIR = Path(__file__).parent / "output"  # Created on first write
+
+# On-disk caches (probe results, etc.)
+CACHE_DIR = OUTPUT_DIR / ".cache"
+PROBE_CACHE_SIZE = 512  # Max files remembered by the ffprobe cache
+
+# Content-addressed stage outputs (script, recording, video) for resumable renders
+ARTIFACTS_DIR = OUTPUT_DIR / "artifacts"
+
+# Per-stage tracing (generate/batch --trace): Chrome trace JSON per run, plus
+# a Prometheus textfile for node_exporter's textfile collector
+TRACE_DIR = OUTPUT_DIR / "traces"
+METRICS_TEXTFILE = Path(os.getenv("METRICS_TEXTFILE", str(TRACE_DIR / "spaceengine.prom")))
 
 # Video settings
 DEFAULT_RESOLUTION = "3840x2160"  # 4K
 DEFAULT_FPS = 30
 DEFAULT_CODEC = "libx264"
 DEFAULT_CRF = 18  # Quality (lower = better, 18-23 recommended)
+KEYFRAME_INTERVAL = DEFAULT_FPS * 2  # Fixed GOP length in frames
+
+# Live encoding (feed the growing recording to FFmpeg during capture). Only
+# containers that can be decoded before they are finalized qualify; others
+# are encoded after the capture as usual.
+LIVE_SUFFIXES = ('.mkv', '.webm', '.ts')
+LIVE_CHUNK_BYTES = 4 * 1024 * 1024  # Read size when tailing the recording
+LIVE_POLL_INTERVAL = 0.25  # Seconds to wait for more data at the end of the file
+
+# Parallel encoding (1 = single FFmpeg process)
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", "1"))
+
+# FFmpeg supervisor (see ffmpeg_runner.py)
+FFMPEG_CPU_BUDGET = int(os.getenv("FFMPEG_CPU_BUDGET", str(os.cpu_count() or 1)))  # Threads shared by all jobs
+FFMPEG_TIMEOUT = float(os.getenv("FFMPEG_TIMEOUT", "0"))  # Max seconds per job (0 = no limit)
+FFMPEG_STALL_TIMEOUT = float(os.getenv("FFMPEG_STALL_TIMEOUT", "300"))  # Kill a job silent this long
+FFMPEG_PROGRESS_INTERVAL = float(os.getenv("FFMPEG_PROGRESS_INTERVAL", "10"))  # Seconds between progress lines
 
 # Resolution presets (width x height)
 RESOLUTION_PRESETS = {
@@ -37,6 +65,16 @@ RESOLUTION_PRESETS = {
     '16k': (15360, 8640),     # 16K (screenshots only, requires 24GB+ VRAM)
 }
 
+# Rendition ladder: deliverables encoded in the same FFmpeg pass as the master
+# (generate --rendition NAME). Each is centre-cropped to its own aspect ratio
+# (or to `crop`, given as FFmpeg crop arguments), scaled to `size` and
+# encoded at `crf`, capped at `maxrate` kbit/s when set.
+RENDITIONS = {
+    '4k': {'size': RESOLUTION_PRESETS['4k'], 'crf': 18, 'maxrate': 45000},
+    '1080p': {'size': RESOLUTION_PRESETS['1080p'], 'crf': 20, 'maxrate': 12000},
+    'short': {'size': (1080, 1920), 'crf': 21, 'maxrate': 8000},  # Vertical 9:16 (Shorts/Reels)
+}
+
 # GPU VRAM recommendations per resolution
 VRAM_REQUIREMENTS = {
     '1080p': '4GB',
@@ -49,20 +87,55 @@ VRAM_REQUIREMENTS = {
 
 # Recording settings
 RECORD_REALTIME = True  # Space Engine records in real-time
-STARTUP_DELAY = 10  # Seconds to wait for SE to load
+STARTUP_TIMEOUT = 120  # Max seconds to wait for the SE window to appear
+SESSION_MAX_RESTARTS = 2  # Relaunches allowed per scene when SE crashes mid-batch
+RECORDINGS_DIR = Path(SPACE_ENGINE_DATA) / "screenshots"  # Where SE writes videos
+# Extensions of SE's video files, matching its recording settings (e.g. ".mkv" for --live)
+RECORDING_SUFFIXES = tuple(
+    suffix.strip().lower() for suffix in os.getenv("RECORDING_SUFFIXES", ".mp4").split(",")
+)
+RECORDING_START_TIMEOUT = 30  # Max seconds for the video file to appear after F9
+RECORDING_FINISH_TIMEOUT = 600  # Max seconds for SE to finish writing after stop
+RECORDING_STABLE_SECONDS = 3  # Size unchanged this long = file complete
+RECORDING_HEALTH_INTERVAL = 5  # Seconds between checks that SE is still alive while recording
+
+# Batch scheduling (recording is always one scene at a time)
+SCRIPT_WORKERS = int(os.getenv("SCRIPT_WORKERS", "4"))  # Concurrent AI script generations
+POSTPROCESS_WORKERS = int(os.getenv("POSTPROCESS_WORKERS", "2"))  # Concurrent FFmpeg jobs
+SCRATCH_BUDGET_GB = float(os.getenv("SCRATCH_BUDGET_GB", "200"))  # Max raw video queued for encoding
+SCRATCH_MIN_FREE_GB = float(os.getenv("SCRATCH_MIN_FREE_GB", "20"))  # Pause recording below this free space
 
 # AI Settings
 AI_PROVIDER = os.getenv("AI_PROVIDER", "openai")  # or "anthropic"
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4-turbo-preview")
+ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-3-opus-20240229")
+
+# AI response cache (identical requests are answered from disk)
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "1") != "0"
+AI_CACHE_TTL = 7 * 24 * 3600  # Seconds before a cached response expires
+AI_CACHE_SIZE = 256  # Max cached responses
+
+AI_STREAM = os.getenv("AI_STREAM", "0") == "1"  # Opt-in: stream + validate responses, stop at StartRecording
+
+# Async generation
+AI_CONCURRENCY = int(os.getenv("AI_CONCURRENCY", "8"))  # In-flight requests per provider
+AI_MAX_RETRIES = 5  # Retries for rate-limited / overloaded responses
 
 # GUI Automation settings
-GUI_DELAY = 0.5  # Delay between GUI actions (seconds)
+GUI_DELAY = 0.02  # Pause after each GUI action (readiness is polled, not slept)
+UI_TIMEOUT = 5  # Max seconds for a menu/console to react to a key press
+SCRIPT_LOAD_TIMEOUT = 30  # Max seconds for SE to finish reacting to a `run` command
+SETTLE_POLLS = 3  # Unchanged captures in a row that mean SE has finished reacting
+UI_MIN_SETTLE = 0.2  # Min seconds after a key press before the window counts as settled
+SCRIPT_MIN_SETTLE = 1.0  # Same, after a `run` command (the script may redraw late)
+POLL_INTERVAL = 0.05  # First readiness poll interval (seconds), backs off from here
+POLL_MAX_INTERVAL = 1.0  # Longest readiness poll interval (seconds)
 SCREENSHOT_DEBUG = False  # Save screenshots for debugging
 
 # Template directory
 TEMPLATES_DIR = Path(__file__).parent / "templates"
-TEMPLATES_DIR.mkdir(exist_ok=True)
 
 # Logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
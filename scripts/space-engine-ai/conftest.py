@@ -0,0 +1,52 @@
+"""
+Shared pytest fixtures
+
+Lives at the project root so the flat modules (config, video_pipeline, ...)
+import by bare name from tests/, the same way main.py imports them.
+"""
+
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture
+def ffmpeg():
+    """Skip tests that shell out to FFmpeg when it is not installed"""
+    if not (shutil.which('ffmpeg') and shutil.which('ffprobe')):
+        pytest.skip("ffmpeg/ffprobe not on PATH")
+
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    """Point OUTPUT_DIR and the probe cache at a scratch directory"""
+    import cache
+    import probe
+    import scheduler
+    import video_pipeline
+
+    output = tmp_path / "output"
+    for module in (scheduler, video_pipeline):
+        monkeypatch.setattr(module, 'OUTPUT_DIR', output)
+    monkeypatch.setattr(probe, '_cache', cache.DiskCache(output / ".cache" / "probe.json"))
+    return output
+
+
+@pytest.fixture
+def make_clip(ffmpeg, tmp_path):
+    """Factory for short synthetic recordings (test pattern, optional tone)"""
+    def make(name: str = "clip.mp4", duration: float = 4, fps: int = 30,
+             size: str = "320x180", audio: bool = True, args: tuple = ()) -> Path:
+        path = tmp_path / name
+        cmd = ['ffmpeg', '-v', 'error', '-f', 'lavfi',
+               '-i', f'testsrc2=size={size}:rate={fps}:duration={duration}']
+        if audio:
+            cmd += ['-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}']
+        cmd += ['-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+                *args, '-y', str(path)]
+        subprocess.run(cmd, check=True)
+        return path
+
+    return make
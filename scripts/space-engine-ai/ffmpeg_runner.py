@@ -0,0 +1,407 @@
+"""
+FFmpeg Runner
+
+Supervises every FFmpeg process the pipeline starts. Jobs run on a shared
+asyncio event loop (in a background thread, so synchronous callers simply
+block on the result) and get:
+- Live progress from `-progress pipe:1`: frame, fps, speed and ETA
+- A global CPU budget: each job reserves the threads it will use and waits
+  until they are free, so concurrent encodes never oversubscribe the machine
+- Cancellation, an optional wall-clock timeout and a stall timeout (no
+  progress for FFMPEG_STALL_TIMEOUT seconds), after which the process is
+  stopped and its partial outputs are deleted
+- A traced span per job (see tracing.py)
+
+Usage:
+    from ffmpeg_runner import runner
+    runner().run(cmd, 'optimize', outputs=[output_path], duration=600, threads=None)
+
+    jobs = [runner().submit(cmd, 'encode_chunk', threads=4) for cmd in cmds]
+    wait_all(jobs)
+"""
+
+import asyncio
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent import futures
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from config import (
+    FFMPEG_CPU_BUDGET,
+    FFMPEG_TIMEOUT,
+    FFMPEG_STALL_TIMEOUT,
+    FFMPEG_PROGRESS_INTERVAL,
+)
+from tracing import tracer, file_size
+
+TERMINATE_GRACE = 5.0  # Seconds FFmpeg gets to exit after SIGTERM before it is killed
+WATCH_INTERVAL = 1.0  # Seconds between timeout / stall checks
+STDERR_TAIL_LINES = 20  # Lines of FFmpeg's log kept for error messages
+STREAM_LIMIT = 1024 * 1024  # Longest log line read from FFmpeg
+
+
+class FFmpegError(subprocess.CalledProcessError):
+    """FFmpeg exited non-zero; the message ends with the tail of its log"""
+
+    def __str__(self):
+        message = super().__str__()
+        if self.stderr:
+            message += f"\n{self.stderr}"
+        return message
+
+
+class Progress:
+    """Latest `-progress` report of one job"""
+
+    def __init__(self, op: str, duration: Optional[float] = None):
+        self.op = op
+        self.duration = duration  # Expected seconds of output, if known
+        self.frame = 0
+        self.fps = 0.0
+        self.speed: Optional[float] = None  # Output seconds per wall-clock second
+        self.out_time = 0.0  # Seconds of output written so far
+        self.total_size = 0
+        self.done = False
+
+    def update(self, fields: dict, done: bool = False):
+        self.frame = _number(fields.get('frame'), int, self.frame)
+        self.fps = _number(fields.get('fps'), float, self.fps)
+        self.total_size = _number(fields.get('total_size'), int, self.total_size)
+        # out_time_ms is also in microseconds (a long-standing FFmpeg quirk)
+        out_time = _number(fields.get('out_time_us', fields.get('out_time_ms')), int, None)
+        if out_time is not None:
+            self.out_time = max(0.0, out_time / 1e6)
+        self.speed = _number((fields.get('speed') or '').rstrip('x'), float, self.speed)
+        self.done = done
+
+    @property
+    def fraction(self) -> Optional[float]:
+        if not self.duration:
+            return None
+        return min(1.0, self.out_time / self.duration)
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds until the output reaches its expected duration"""
+        if not self.duration or not self.speed:
+            return None
+        return max(0.0, self.duration - self.out_time) / self.speed
+
+    def __str__(self):
+        parts = [f"[{self.op}]"]
+        if self.fraction is not None:
+            parts.append(f"{self.fraction:6.1%}")
+        speed = f"{self.speed:.2f}x" if self.speed is not None else "-"
+        parts.append(f"frame {self.frame} ({self.fps:.1f} fps, {speed})")
+        if self.eta is not None:
+            parts.append(f"ETA {timedelta(seconds=round(self.eta))}")
+        return ' '.join(parts)
+
+
+def _number(value, kind, default):
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return default  # Missing or 'N/A'
+
+
+class Job:
+    """Handle for a submitted FFmpeg command"""
+
+    def __init__(self, runner: 'FFmpegRunner', cmd: list[str], op: str,
+                 duration: Optional[float]):
+        self.cmd = cmd
+        self.op = op
+        self.progress = Progress(op, duration)
+        self.future: futures.Future = futures.Future()
+        self.updated = 0.0  # Loop time of the last progress report
+        self.reported = 0.0  # Loop time of the last printed progress line
+        self._runner = runner
+        self._task: Optional[asyncio.Task] = None
+
+    def cancel(self):
+        """Stop the job (waiting or running); its partial outputs are removed"""
+        self._runner._loop.call_soon_threadsafe(self._cancel)
+
+    def _cancel(self):
+        if self._task:
+            self._task.cancel()
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout: Optional[float] = None) -> Progress:
+        """Wait for the job; Ctrl+C cancels it (and cleans up) before re-raising"""
+        try:
+            return self.future.result(timeout)
+        except KeyboardInterrupt:
+            self.cancel()
+            futures.wait([self.future], timeout=TERMINATE_GRACE * 2)
+            raise
+
+    def _finished(self, task: asyncio.Task):
+        if task.cancelled():
+            # Notify as well, or futures.wait() never counts it as done
+            self.future.cancel()
+            self.future.set_running_or_notify_cancel()
+        elif task.exception() is not None:
+            self.future.set_exception(task.exception())
+        else:
+            self.future.set_result(task.result())
+
+
+class FFmpegRunner:
+    """Runs FFmpeg jobs concurrently within a shared CPU budget"""
+
+    def __init__(self, cpu_budget: int = FFMPEG_CPU_BUDGET,
+                 timeout: float = FFMPEG_TIMEOUT,
+                 stall_timeout: float = FFMPEG_STALL_TIMEOUT,
+                 progress_interval: float = FFMPEG_PROGRESS_INTERVAL):
+        self.cpu_budget = max(1, cpu_budget)
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        self.progress_interval = progress_interval
+        self.used = 0  # Threads reserved by running jobs
+        self._slots: Optional[asyncio.Condition] = None  # Created on the loop
+        self._jobs: set[Job] = set()
+        self._jobs_lock = threading.Lock()
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        name="ffmpeg-runner", daemon=True)
+        self._thread.start()
+
+    def submit(self, cmd: list[str], op: str = 'ffmpeg', *,
+               inputs: Iterable = (), outputs: Iterable = (),
+               duration: Optional[float] = None, threads: Optional[int] = 1,
+               stdin: Optional[int] = None, timeout: Optional[float] = None,
+               watch_stalls: bool = True,
+               on_progress: Optional[Callable[[Progress], None]] = None,
+               **attributes) -> Job:
+        """Start an FFmpeg command in the background
+
+        threads is the share of the CPU budget the job reserves (None for the
+        whole budget, e.g. an x264 encode without -threads). duration is the
+        expected output length, used for percentage and ETA. outputs are
+        deleted if the job fails or is cancelled. stdin may be a file
+        descriptor to feed FFmpeg (e.g. for `-i pipe:0`).
+        """
+        if '-progress' not in cmd:
+            cmd = [cmd[0], '-progress', 'pipe:1', '-nostats', *cmd[1:]]
+        job = Job(self, cmd, op, duration)
+        options = dict(inputs=[p for p in inputs if p], outputs=[p for p in outputs if p],
+                       threads=threads, stdin=stdin,
+                       timeout=self.timeout if timeout is None else timeout,
+                       watch_stalls=watch_stalls, on_progress=on_progress,
+                       attributes=attributes)
+
+        with self._jobs_lock:
+            self._jobs.add(job)
+        job.future.add_done_callback(lambda _: self._forget(job))
+
+        def start():
+            job._task = self._loop.create_task(self._run(job, **options))
+            job._task.add_done_callback(job._finished)
+
+        self._loop.call_soon_threadsafe(start)
+        return job
+
+    def run(self, cmd: list[str], op: str = 'ffmpeg', **options) -> Progress:
+        """Run an FFmpeg command and wait for it (see submit for options)"""
+        return self.submit(cmd, op, **options).result()
+
+    async def arun(self, cmd: list[str], op: str = 'ffmpeg', **options) -> Progress:
+        """Await an FFmpeg command from any event loop"""
+        job = self.submit(cmd, op, **options)
+        done = asyncio.wrap_future(job.future)
+        try:
+            return await asyncio.shield(done)
+        except asyncio.CancelledError:
+            job.cancel()
+            await asyncio.wait([done])  # Let the process stop and its outputs be removed
+            raise
+
+    def jobs(self) -> list[Job]:
+        """Jobs that are queued or running"""
+        with self._jobs_lock:
+            return list(self._jobs)
+
+    def cancel_all(self):
+        for job in self.jobs():
+            job.cancel()
+
+    def close(self):
+        """Cancel outstanding jobs and stop the event loop thread"""
+        jobs = self.jobs()
+        for job in jobs:
+            job.cancel()
+        futures.wait([job.future for job in jobs], timeout=TERMINATE_GRACE * 2)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def _forget(self, job: Job):
+        with self._jobs_lock:
+            self._jobs.discard(job)
+
+    @asynccontextmanager
+    async def _reserve(self, threads: int):
+        """Hold `threads` of the CPU budget for the duration of a job"""
+        if self._slots is None:
+            self._slots = asyncio.Condition()
+        async with self._slots:
+            await self._slots.wait_for(lambda: self.used + threads <= self.cpu_budget)
+            self.used += threads
+        try:
+            yield
+        finally:
+            self.used -= threads
+            async with self._slots:
+                self._slots.notify_all()
+
+    async def _run(self, job: Job, inputs, outputs, threads, stdin, timeout,
+                   watch_stalls, on_progress, attributes) -> Progress:
+        threads = self.cpu_budget if threads is None else min(max(1, threads), self.cpu_budget)
+        queued = time.perf_counter()
+
+        async with self._reserve(threads):
+            with tracer.span(f"ffmpeg.{job.op}", threads=threads,
+                             queued=round(time.perf_counter() - queued, 3), **attributes) as span:
+                process = await asyncio.create_subprocess_exec(
+                    *job.cmd,
+                    stdin=subprocess.DEVNULL if stdin is None else stdin,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    limit=STREAM_LIMIT,
+                )
+                log = deque(maxlen=STDERR_TAIL_LINES)
+                job.updated = self._loop.time()
+                readers = [
+                    asyncio.create_task(self._read_progress(job, process.stdout, on_progress)),
+                    asyncio.create_task(self._read_log(process.stderr, log)),
+                ]
+
+                exited = False
+                try:
+                    await self._supervise(job, process, timeout, watch_stalls, span)
+                    await asyncio.gather(*readers)
+                    exited = True
+                finally:
+                    if not exited:
+                        await self._stop(process)
+                        for reader in readers:
+                            reader.cancel()
+                        _remove(outputs)
+
+                span.set(frames=job.progress.frame, speed=job.progress.speed,
+                         bytes_in=sum(file_size(p) or 0 for p in inputs),
+                         bytes_out=sum(file_size(p) or 0 for p in outputs))
+                if process.returncode != 0:
+                    _remove(outputs)
+                    raise FFmpegError(process.returncode, job.cmd, stderr='\n'.join(log))
+
+        return job.progress
+
+    async def _supervise(self, job: Job, process, timeout: float, watch_stalls: bool, span):
+        """Wait for the process, enforcing the timeout and stall limits"""
+        started = self._loop.time()
+        exit_wait = asyncio.ensure_future(process.wait())
+        try:
+            while not exit_wait.done():
+                await asyncio.wait([exit_wait], timeout=WATCH_INTERVAL)
+                now = self._loop.time()
+                if timeout and now - started > timeout and not exit_wait.done():
+                    print(f"[{job.op}] Timed out after {timeout:.0f}s, stopping FFmpeg")
+                    raise subprocess.TimeoutExpired(job.cmd, timeout)
+                if (watch_stalls and self.stall_timeout and not exit_wait.done()
+                        and now - job.updated > self.stall_timeout):
+                    print(f"[{job.op}] No progress for {self.stall_timeout:.0f}s, stopping FFmpeg")
+                    span.set(stalled=True)
+                    raise subprocess.TimeoutExpired(job.cmd, self.stall_timeout)
+        finally:
+            if not exit_wait.done():
+                exit_wait.cancel()
+
+    async def _read_progress(self, job: Job, stream, on_progress):
+        """Parse `-progress` blocks (key=value lines ending in progress=...)"""
+        fields = {}
+        async for raw in stream:
+            key, _, value = raw.decode(errors='replace').strip().partition('=')
+            if key != 'progress':
+                if key:
+                    fields[key] = value
+                continue
+
+            job.progress.update(fields, done=value == 'end')
+            job.updated = self._loop.time()
+            fields = {}
+            if on_progress:
+                on_progress(job.progress)
+            elif not job.progress.done and job.updated - job.reported >= self.progress_interval:
+                # Silent for the first interval, so short jobs print nothing
+                if job.reported:
+                    print(job.progress)
+                job.reported = job.updated
+
+    @staticmethod
+    async def _read_log(stream, log: deque):
+        async for raw in stream:
+            line = raw.decode(errors='replace').rstrip()
+            if line:
+                log.append(line)
+
+    @staticmethod
+    async def _stop(process):
+        """Ask FFmpeg to exit, then kill it if it does not"""
+        if process.returncode is not None:
+            return
+        try:
+            process.terminate()
+            await asyncio.wait_for(process.wait(), TERMINATE_GRACE)
+        except ProcessLookupError:
+            pass
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+
+def _remove(paths):
+    for path in paths:
+        Path(path).unlink(missing_ok=True)
+
+
+def wait_all(jobs: list[Job]) -> list[Progress]:
+    """Wait for every job; on the first failure cancel the others and re-raise"""
+    pending = [job.future for job in jobs]
+    try:
+        done, not_done = futures.wait(pending, return_when=futures.FIRST_EXCEPTION)
+    except KeyboardInterrupt:
+        for job in jobs:
+            job.cancel()
+        futures.wait(pending, timeout=TERMINATE_GRACE * 2)
+        raise
+
+    failed = [f for f in done if not f.cancelled() and f.exception() is not None]
+    if failed:
+        for job in jobs:
+            job.cancel()
+        futures.wait(not_done)
+        raise failed[0].exception()
+    return [job.result() for job in jobs]
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def runner() -> FFmpegRunner:
+    """The process-wide runner (created on first use)"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = FFmpegRunner()
+        return _runner
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Gemini multi-speaker TTS for full-length episodes.
+
+A single generateContent request for a 30-60 minute transcript runs into
+latency and response-size limits, so the transcript is split at speaker-turn
+boundaries into chunks that fit a token budget. Chunks are synthesized
+concurrently (bounded, with retry, over the pooled connections of
+http_transport), and the PCM is stitched back together in
+transcript order with a short crossfade at each join. Audio is decoded from
+the response and written out in fixed-size blocks, so memory use stays flat
+however long the episode is.
+
+Synthesized chunks are cached on disk by content, so after a transcript edit
+only the chunks around the changed lines go back to the API.
+
+Usage:
+    from gemini_tts import synthesize_to_wav
+    synthesize_to_wav("episode.wav", transcript, {"Alex": "Kore", "Jessica": "Puck"})
+"""
+
+import os
+import re
+import json
+import time
+import array
+import base64
+import hashlib
+import shutil
+import tempfile
+import threading
+import unicodedata
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+import http_transport
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
+# Override to point at a local stand-in for the TTS endpoint
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+TTS_MODEL = "gemini-2.5-flash-preview-tts"
+
+# Gemini outputs 24kHz 16-bit mono PCM
+SAMPLE_RATE = 24000
+SAMPLE_WIDTH = 2
+CHANNELS = 1
+
+CHUNK_TOKENS = 1500  # Transcript tokens per request
+CONCURRENCY = 4  # Requests in flight at once
+MAX_RETRIES = 4  # Retries of responses that break off mid-body
+REQUEST_TIMEOUT = 120
+CROSSFADE_MS = 30
+STREAM_BLOCK_BYTES = 64 * 1024  # Read size when decoding and stitching audio
+
+# Segment cache (raw PCM per chunk, oldest evicted past the size limit)
+TTS_CACHE_DIR = Path(os.getenv("TTS_CACHE_DIR", Path(__file__).parent / "temp" / "tts-cache"))
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "2048"))
+# A chunk may end early at a content-chosen turn once it is this full, so
+# chunk boundaries after an edit line up with the previous run again
+CHUNK_MIN_FILL = 0.5
+
+TURN_PATTERN = re.compile(r"^\s*([^:\n]{1,40}):\s*(.*)$")
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+@dataclass
+class Turn:
+    """One speaker turn of the transcript"""
+    speaker: str
+    text: str
+
+    def line(self) -> str:
+        return f"{self.speaker}: {self.text}"
+
+
+def parse_transcript(transcript: str) -> list[Turn]:
+    """Split "Speaker: text" lines into turns (unlabelled lines continue the last turn)"""
+    turns = []
+    for raw in transcript.splitlines():
+        if not raw.strip():
+            continue
+        match = TURN_PATTERN.match(raw)
+        if match:
+            turns.append(Turn(match.group(1).strip(), match.group(2).strip()))
+        elif turns:
+            turns[-1].text = f"{turns[-1].text} {raw.strip()}"
+        else:
+            raise ValueError(f"Transcript must start with a speaker label: {raw!r}")
+    return turns
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English)"""
+    return len(text) // 4 + 1
+
+
+def _split_turn(turn: Turn, max_tokens: int) -> list[Turn]:
+    """Break an oversized turn at sentence boundaries"""
+    pieces, current = [], ""
+    for sentence in SENTENCE_END.split(turn.text):
+        candidate = f"{current} {sentence}".strip()
+        if current and estimate_tokens(candidate) > max_tokens:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = candidate
+    if current:
+        pieces.append(current)
+    return [Turn(turn.speaker, piece) for piece in pieces]
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a line for cache keys (Unicode NFC, collapsed whitespace)"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def _is_anchor(turn: Turn) -> bool:
+    """Content-defined chunk boundary: about one turn in four ends a chunk"""
+    digest = hashlib.sha256(normalize_text(turn.line()).encode("utf-8")).digest()
+    return digest[0] % 4 == 0
+
+
+def chunk_turns(turns: list[Turn], max_tokens: int = CHUNK_TOKENS) -> list[list[Turn]]:
+    """Group consecutive turns into chunks of at most max_tokens
+
+    Chunks only break between turns; a single turn longer than the budget is
+    split between sentences instead. Once a chunk is CHUNK_MIN_FILL full it
+    also ends after any anchor turn (chosen by a hash of its text), so an edit
+    only shifts the boundaries of the chunks near it.
+    """
+    chunks, current, used = [], [], 0
+    for turn in turns:
+        for piece in _split_turn(turn, max_tokens) if estimate_tokens(turn.line()) > max_tokens else [turn]:
+            cost = estimate_tokens(piece.line())
+            if current and used + cost > max_tokens:
+                chunks.append(current)
+                current, used = [], 0
+            current.append(piece)
+            used += cost
+            if used >= max_tokens * CHUNK_MIN_FILL and _is_anchor(piece):
+                chunks.append(current)
+                current, used = [], 0
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class SegmentCache:
+    """Raw PCM of synthesized chunks, addressed by a hash of their content
+
+    Files are named by key; reads refresh the modification time, and the
+    least recently used files are removed once the total exceeds max_bytes.
+    Keys passed as protected (the chunks of a run still being stitched) are
+    never evicted, even if that leaves the cache over its limit.
+    """
+
+    def __init__(self, root: Path = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_MB * 1024 * 1024):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(chunk: list[Turn], voices: dict[str, str], model: str,
+            before: Optional[Turn] = None, after: Optional[Turn] = None) -> str:
+        """Cache key for a chunk and the turns either side of it
+
+        The neighbouring turns affect delivery at the edges of the chunk, so
+        they are part of the key (as a hash).
+        """
+        context = hashlib.sha256(json.dumps(
+            [normalize_text(t.line()) if t else None for t in (before, after)]
+        ).encode("utf-8")).hexdigest()
+        material = {
+            "model": model,
+            "turns": [[t.speaker, voices.get(t.speaker), normalize_text(t.text)] for t in chunk],
+            "context": context,
+        }
+        blob = json.dumps(material, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:32]
+
+    def path(self, key: str) -> Path:
+        return self.root / f"{key}.pcm"
+
+    def get(self, key: str) -> Optional[Path]:
+        path = self.path(key)
+        try:
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, source: Path, protected: frozenset = frozenset()) -> Path:
+        """Move a finished PCM file into the cache"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f".{key}.{threading.get_ident()}.tmp"
+        shutil.move(source, tmp)
+        os.replace(tmp, self.path(key))
+        self._evict(protected | {key})
+        return self.path(key)
+
+    def _evict(self, protected: frozenset = frozenset()):
+        with self._lock:
+            entries = []
+            for path in self.root.glob("*.pcm"):
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path.stem in protected:
+                    continue
+                path.unlink(missing_ok=True)
+                total -= size
+
+    def clear(self):
+        for path in self.root.glob("*.pcm"):
+            path.unlink(missing_ok=True)
+
+
+def build_payload(text: str, voices: dict[str, str]) -> dict:
+    """generateContent request body for a multi-speaker transcript"""
+    return {
+        "contents": [{"parts": [{"text": text}]}],
+        "generationConfig": {
+            "responseModalities": ["AUDIO"],
+            "speechConfig": {
+                "multiSpeakerVoiceConfig": {
+                    "speakerVoiceConfigs": [
+                        {
+                            "speaker": speaker,
+                            "voiceConfig": {"prebuiltVoiceConfig": {"voiceName": voice}},
+                        }
+                        for speaker, voice in voices.items()
+                    ]
+                }
+            },
+        },
+    }
+
+
+INLINE_DATA_START = re.compile(rb'"inlineData"\s*:\s*\{[^{}]*?"data"\s*:\s*"')
+
+
+def decode_inline_audio(blocks, write) -> int:
+    """Stream the base64 inlineData.data field of a JSON response into write()
+
+    blocks is an iterable of response body blocks (e.g. iter_bytes()); the
+    audio string is decoded as it arrives, so memory use does not grow with
+    the length of the audio. Returns the number of PCM bytes written.
+    """
+    buffer = b""  # Unmatched JSON before the audio field, or undecoded base64
+    in_audio = False
+    head = b""  # Start of the response, for error messages
+    written = 0
+
+    for block in blocks:
+        if not block:
+            continue
+        if len(head) < 500:
+            head += block[:500 - len(head)]
+
+        if not in_audio:
+            buffer += block
+            match = INLINE_DATA_START.search(buffer)
+            if not match:
+                buffer = buffer[-1024:]  # Enough to catch a key split across blocks
+                continue
+            in_audio = True
+            block, buffer = buffer[match.end():], b""
+
+        # Base64 never contains a quote, so the first one closes the string.
+        # JSON encoders may escape "/" as "\/"; dropping backslashes undoes that.
+        end = block.find(b'"')
+        if end >= 0:
+            block = block[:end]
+        buffer += block.replace(b"\\", b"")
+        usable = len(buffer) if end >= 0 else len(buffer) - len(buffer) % 4
+        if usable:
+            pcm = base64.b64decode(buffer[:usable])
+            write(pcm)
+            written += len(pcm)
+            buffer = buffer[usable:]
+        if end >= 0:
+            return written
+
+    if in_audio:
+        raise RuntimeError("Response ended inside the audio data")
+    raise RuntimeError(f"No audio in response: {head.decode('utf-8', 'replace')}")
+
+
+def synthesize_chunk(chunk: list[Turn], voices: dict[str, str], output_path: Path,
+                     model: str = TTS_MODEL, max_retries: int = MAX_RETRIES,
+                     timeout: float = REQUEST_TIMEOUT) -> Path:
+    """Synthesize one chunk of turns to a raw PCM file
+
+    Rate limits, 5xx responses and connection failures are retried by the
+    shared transport; this also retries a response that breaks off mid-body.
+    """
+    text = "\n".join(turn.line() for turn in chunk)
+    url = f"{GEMINI_API_BASE}/models/{model}:generateContent"
+    payload = build_payload(text, voices)
+
+    for attempt in range(max_retries + 1):
+        try:
+            with http_transport.client().stream(
+                "POST", url, params={"key": GEMINI_API_KEY}, json=payload,
+                timeout=http_transport.timeout(timeout),
+            ) as response:
+                if response.status_code >= 400:
+                    raise RuntimeError(f"HTTP {response.status_code}: "
+                                       f"{response.read().decode('utf-8', 'replace')}")
+                with open(output_path, "wb") as f:
+                    decode_inline_audio(response.iter_bytes(STREAM_BLOCK_BYTES), f.write)
+            return output_path
+        except (httpx.ReadError, httpx.ReadTimeout, httpx.RemoteProtocolError):
+            if attempt == max_retries:
+                raise
+            time.sleep(http_transport.backoff(attempt))
+
+
+class Stitcher:
+    """Joins 16-bit PCM segments in order, crossfading linearly at each join
+
+    Only the last crossfade_ms of audio is held back (it may be blended with
+    the start of the next segment); everything else goes straight to write().
+    """
+
+    def __init__(self, write, crossfade_ms: int = CROSSFADE_MS):
+        self.write = write
+        self.overlap = SAMPLE_RATE * crossfade_ms // 1000
+        self.tail = array.array("h")
+
+    def add(self, stream, block_size: int = STREAM_BLOCK_BYTES):
+        """Append the PCM read from a binary stream"""
+        head = array.array("h")  # Start of the segment, until the crossfade is done
+        blended = False
+        partial = b""  # Odd trailing byte of a block
+
+        while block := stream.read(block_size):
+            block = partial + block
+            cut = len(block) - len(block) % SAMPLE_WIDTH
+            partial = block[cut:]
+            samples = array.array("h")
+            samples.frombytes(block[:cut])
+
+            if not blended:
+                head.extend(samples)
+                if len(head) < self.overlap:
+                    continue
+                self._blend(head)
+                blended = True
+            else:
+                self._append(samples)
+
+        if not blended:
+            self._blend(head)
+
+    def _blend(self, head: array.array):
+        """Crossfade the held-back tail into the start of a new segment"""
+        n = min(self.overlap, len(self.tail), len(head))
+        start = len(self.tail) - n
+        for i in range(n):
+            w = (i + 1) / (n + 1)
+            head[i] = int(self.tail[start + i] * (1 - w) + head[i] * w)
+        del self.tail[start:]
+        self._append(head)
+
+    def _append(self, samples: array.array):
+        self.tail.extend(samples)
+        flush = len(self.tail) - self.overlap
+        if flush > 0:
+            self.write(self.tail[:flush].tobytes())
+            del self.tail[:flush]
+
+    def close(self):
+        self.write(self.tail.tobytes())
+        self.tail = array.array("h")
+
+
+def synthesize_to(write, transcript: str, voices: dict[str, str], model: str = TTS_MODEL,
+                  max_tokens: int = CHUNK_TOKENS, concurrency: int = CONCURRENCY,
+                  crossfade_ms: int = CROSSFADE_MS, cache: Optional[SegmentCache] = None,
+                  on_chunk=None):
+    """Synthesize a full transcript, streaming the PCM into write()
+
+    Chunks are requested concurrently (at most `concurrency` in flight) and
+    stitched in transcript order as soon as each is ready. Chunks found in
+    the cache are not requested again, and are kept in it until the run is
+    done; one removed by another process sharing the cache directory is
+    synthesized again. on_chunk(index, total, cached) is called as each
+    chunk finishes.
+    """
+    turns = parse_transcript(transcript)
+    unknown = {turn.speaker for turn in turns} - voices.keys()
+    if unknown:
+        raise ValueError(f"No voice configured for: {', '.join(sorted(unknown))}")
+
+    chunks = chunk_turns(turns, max_tokens)
+    keys = [
+        cache.key(chunk, voices, model,
+                  chunks[index - 1][-1] if index > 0 else None,
+                  chunks[index + 1][0] if index + 1 < len(chunks) else None)
+        for index, chunk in enumerate(chunks)
+    ] if cache else []
+    protected = frozenset(keys)  # Workers run ahead of the stitch loop
+
+    with tempfile.TemporaryDirectory(prefix="tts_") as scratch:
+        def request(index: int) -> Path:
+            return synthesize_chunk(chunks[index], voices, Path(scratch) / f"{index:05d}.pcm", model)
+
+        def run(index: int) -> Path:
+            path = cache.get(keys[index]) if cache else None
+            cached = path is not None
+            if not cached:
+                path = request(index)
+                if cache:
+                    path = cache.put(keys[index], path, protected)
+            if on_chunk:
+                on_chunk(index, len(chunks), cached)
+            return path
+
+        stitcher = Stitcher(write, crossfade_ms)
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            for index, path in enumerate(pool.map(run, range(len(chunks)))):
+                try:
+                    f = open(path, "rb")
+                except FileNotFoundError:
+                    # Evicted by another process sharing the cache directory
+                    f = open(request(index), "rb")
+                with f:
+                    stitcher.add(f)
+        stitcher.close()
+
+
+def synthesize(transcript: str, voices: dict[str, str], **kwargs) -> bytes:
+    """Synthesize a full transcript to PCM bytes (see synthesize_to)"""
+    out = bytearray()
+    synthesize_to(out.extend, transcript, voices, **kwargs)
+    return bytes(out)
+
+
+def synthesize_to_wav(path, transcript: str, voices: dict[str, str], **kwargs) -> int:
+    """Synthesize a full transcript straight into a WAV file
+
+    Returns the number of PCM bytes written.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(CHANNELS)
+        wav_file.setsampwidth(SAMPLE_WIDTH)
+        wav_file.setframerate(SAMPLE_RATE)
+        synthesize_to(wav_file.writeframes, transcript, voices, **kwargs)
+        return wav_file.getnframes() * SAMPLE_WIDTH * CHANNELS
+
+
+def write_wav(path, pcm: bytes):
+    """Write raw PCM as a WAV file"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(CHANNELS)
+        wav_file.setsampwidth(SAMPLE_WIDTH)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(pcm)
@@ -8,7 +8,7 @@ Uses PyAutoGUI for mouse/keyboard control.
 import time
 import subprocess
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional, TypeVar
 
 try:
     import pyautogui
@@ -18,30 +18,151 @@ except ImportError:
     pyautogui = None
     gw = None
 
+try:
+    import pyperclip  # Installed with pyautogui
+except ImportError:
+    pyperclip = None
+
+from recording_watcher import RecordingWatcher
 from config import (
     SPACE_ENGINE_PATH, 
-    STARTUP_DELAY, 
+    STARTUP_TIMEOUT, 
+    SESSION_MAX_RESTARTS,
+    RECORDINGS_DIR,
+    RECORDING_SUFFIXES,
+    RECORDING_START_TIMEOUT,
+    RECORDING_FINISH_TIMEOUT,
+    RECORDING_HEALTH_INTERVAL,
     GUI_DELAY,
+    UI_TIMEOUT,
+    SCRIPT_LOAD_TIMEOUT,
+    SETTLE_POLLS,
+    UI_MIN_SETTLE,
+    SCRIPT_MIN_SETTLE,
+    POLL_INTERVAL,
+    POLL_MAX_INTERVAL,
     OUTPUT_DIR,
     SCREENSHOT_DEBUG
 )
 
+T = TypeVar('T')
 
-class SpaceEngineController:
-    """Controls Space Engine through GUI automation"""
+# Mean per-pixel difference (0-255) of the downscaled window that counts as "changed"
+SCREEN_CHANGE_THRESHOLD = 6
+
+
+def wait_until(condition: Callable[[], T], timeout: float,
+               interval: float = POLL_INTERVAL,
+               max_interval: float = POLL_MAX_INTERVAL) -> Optional[T]:
+    """Poll condition with exponential backoff until it returns a truthy value
     
-    def __init__(self):
-        self.process: Optional[subprocess.Popen] = None
-        self.window = None
+    Returns the value as soon as the condition holds, or None on timeout.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        result = condition()
+        if result:
+            return result
         
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 1.5, max_interval)
+
+
+class Desktop:
+    """The GUI that Space Engine is driven through: windows, keys, captures
+    
+    Backed by pygetwindow and PyAutoGUI. SpaceEngineController only reaches
+    the GUI through this interface, so tests can substitute one that drives
+    a stand-in program (see tests/standin_se.py).
+    """
+    
+    WINDOW_TITLES = ("SpaceEngine", "Space Engine", "SE")
+    
+    def __init__(self):
         if pyautogui:
             # Safety settings
             pyautogui.FAILSAFE = True  # Move mouse to corner to abort
             pyautogui.PAUSE = GUI_DELAY
     
+    @property
+    def has_input(self) -> bool:
+        """Whether keys can be sent and the screen captured"""
+        return pyautogui is not None
+    
+    @property
+    def has_windows(self) -> bool:
+        """Whether windows can be looked up"""
+        return gw is not None
+    
+    def find_window(self):
+        """The Space Engine window, or None"""
+        if not gw:
+            return None
+        
+        for title in self.WINDOW_TITLES:
+            windows = gw.getWindowsWithTitle(title)
+            if windows:
+                return windows[0]
+        return None
+    
+    def activate(self, window):
+        window.activate()
+    
+    def press(self, key: str):
+        pyautogui.press(key)
+    
+    def enter_command(self, command: str):
+        """Type a console command, pasting it when a clipboard is available"""
+        if pyperclip:
+            try:
+                pyperclip.copy(command)
+                pyautogui.hotkey('ctrl', 'v')
+                return
+            except pyperclip.PyperclipException:
+                pass
+        pyautogui.typewrite(command, interval=0)
+    
+    def capture(self, window=None):
+        """Small grayscale capture of the window, for change detection"""
+        region = None
+        if window:
+            region = (window.left, window.top, window.width, window.height)
+        return pyautogui.screenshot(region=region).convert('L').resize((160, 90))
+    
+    def screenshot(self):
+        return pyautogui.screenshot()
+
+
+class SpaceEngineController:
+    """Controls Space Engine through GUI automation
+    
+    Used as a context manager the controller is a long-lived session: SE is
+    launched once, scenes are loaded back-to-back with run_scene(), and a
+    crashed instance is relaunched automatically.
+    
+        with SpaceEngineController() as se:
+            for script in scripts:
+                se.run_scene(script, "3840x2160", 600)
+    
+    `executable` defaults to SPACE_ENGINE_PATH and `desktop` to the real
+    GUI; point them at a stand-in program and a Desktop that drives it to
+    exercise the session logic without Space Engine.
+    """
+    
+    def __init__(self, executable: Optional[Path] = None, desktop: Optional[Desktop] = None):
+        self.executable = Path(executable or SPACE_ENGINE_PATH)
+        self.desktop = desktop or Desktop()
+        self.process: Optional[subprocess.Popen] = None
+        self.window = None
+        self.restarts = 0
+    
     def launch(self) -> bool:
         """Launch Space Engine application"""
-        se_path = Path(SPACE_ENGINE_PATH)
+        se_path = self.executable
         
         if not se_path.exists():
             raise FileNotFoundError(f"Space Engine not found at: {se_path}")
@@ -49,63 +170,99 @@ class SpaceEngineController:
         print(f"Launching Space Engine from: {se_path}")
         self.process = subprocess.Popen([str(se_path)])
         
-        # Wait for startup
-        print(f"Waiting {STARTUP_DELAY}s for Space Engine to load...")
-        time.sleep(STARTUP_DELAY)
+        if not self.desktop.has_windows:
+            print("Warning: pygetwindow not available - cannot wait for the window")
+            return False
+        
+        # Wait for the window to appear (or the process to die)
+        print(f"Waiting up to {STARTUP_TIMEOUT}s for Space Engine to load...")
+        started = time.monotonic()
         
-        # Find window
-        self.window = self._find_window()
+        def window_or_exit():
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Space Engine exited during startup (code {self.process.returncode})")
+            return self.desktop.find_window()
+        
+        self.window = wait_until(window_or_exit, STARTUP_TIMEOUT)
         if self.window:
-            self.window.activate()
-            print(f"Space Engine window found: {self.window.title}")
+            self.desktop.activate(self.window)
+            print(f"Space Engine window found after {time.monotonic() - started:.1f}s: {self.window.title}")
             return True
         
         print("Warning: Could not find Space Engine window")
         return False
     
-    def _find_window(self):
-        """Find Space Engine window"""
-        if not gw:
-            return None
-            
-        windows = gw.getWindowsWithTitle("SpaceEngine")
-        if windows:
-            return windows[0]
+    def _grab(self):
+        """Small grayscale capture of the SE window, for change detection"""
+        return self.desktop.capture(self.window)
+    
+    def _wait_for_settle(self, before, timeout: float, min_settle: float) -> bool:
+        """Wait until the window has reacted to an action and stopped changing
         
-        # Try alternative names
-        for title in ["Space Engine", "SE"]:
-            windows = gw.getWindowsWithTitle(title)
-            if windows:
-                return windows[0]
+        The window must first differ from the capture taken before the action,
+        then look the same for SETTLE_POLLS captures in a row, with at least
+        min_settle seconds since the action. A first redraw (the console
+        opening, a loading frame) is therefore not taken for the end state.
+        """
+        from PIL import ImageChops, ImageStat
         
-        return None
+        def differs(a, b) -> bool:
+            return ImageStat.Stat(ImageChops.difference(a, b)).mean[0] > SCREEN_CHANGE_THRESHOLD
+        
+        started = time.monotonic()
+        previous, reacted, still = before, False, 0
+        
+        def settled() -> bool:
+            nonlocal previous, reacted, still
+            frame = self._grab()
+            if not reacted:
+                reacted = differs(before, frame)
+            elif differs(previous, frame):
+                still = 0
+            else:
+                still += 1
+            previous = frame
+            return still >= SETTLE_POLLS and time.monotonic() - started >= min_settle
+        
+        # Fixed interval, so SETTLE_POLLS always spans the same time
+        return bool(wait_until(settled, timeout, max_interval=POLL_INTERVAL))
+    
+    def _press_and_wait(self, key: str, timeout: float = UI_TIMEOUT,
+                        min_settle: float = UI_MIN_SETTLE) -> bool:
+        """Press a key and return once the window has finished reacting to it"""
+        before = self._grab()
+        self.desktop.press(key)
+        if not self._wait_for_settle(before, timeout, min_settle):
+            print(f"Warning: window did not settle after '{key}' within {timeout}s")
+            return False
+        return True
     
     def _screenshot(self, name: str):
         """Save debug screenshot"""
-        if SCREENSHOT_DEBUG and pyautogui:
-            screenshot = pyautogui.screenshot()
+        if SCREENSHOT_DEBUG and self.desktop.has_input:
+            screenshot = self.desktop.screenshot()
+            OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
             screenshot.save(OUTPUT_DIR / f"debug_{name}.png")
     
     def load_script(self, script_path: Path) -> bool:
         """Load an SE Script file"""
-        if not pyautogui:
+        if not self.desktop.has_input:
             print("PyAutoGUI not available - simulating script load")
             return True
         
         print(f"Loading script: {script_path}")
         
         # Open console with ~ key
-        pyautogui.press('`')
-        time.sleep(0.5)
-        
-        # Type run command
-        pyautogui.typewrite(f'run "{script_path}"', interval=0.02)
-        pyautogui.press('enter')
+        self._press_and_wait('`')
         
-        time.sleep(1)
+        # Enter run command and wait for SE to act on it
+        self.desktop.enter_command(f'run "{script_path}"')
+        if not self._press_and_wait('enter', timeout=SCRIPT_LOAD_TIMEOUT,
+                                    min_settle=SCRIPT_MIN_SETTLE):
+            print("Warning: script load not confirmed")
         
         # Close console
-        pyautogui.press('`')
+        self._press_and_wait('`')
         
         self._screenshot("after_script_load")
         return True
@@ -116,80 +273,123 @@ class SpaceEngineController:
         
         print(f"Configuring recording: {resolution} @ 30fps, {duration}s")
         
-        if not pyautogui:
+        if not self.desktop.has_input:
             return
         
         # Open settings menu (F2 in Space Engine)
-        pyautogui.press('f2')
-        time.sleep(0.5)
+        self._press_and_wait('f2')
         
         # Navigate to video settings
         # Note: Actual key sequence depends on SE version
         # This is a placeholder - needs calibration
         
-        pyautogui.press('escape')
+        self.desktop.press('escape')
         self._screenshot("after_config")
     
-    def start_recording(self, duration: int) -> Path:
-        """Start recording and wait for completion"""
+    def start_recording(self, duration: int,
+                        on_start: Optional[Callable[[Path], None]] = None) -> Path:
+        """Start recording and wait for completion
+        
+        on_start is called with the recording path as soon as SE creates
+        the file, e.g. to start encoding while the capture is in progress.
+        """
         output_file = OUTPUT_DIR / f"recording_{int(time.time())}.mp4"
         
         print(f"Starting recording for {duration}s...")
         print("Note: Recording happens in real-time")
         
-        if not pyautogui:
+        if not self.desktop.has_input:
             print(f"Simulating {duration}s recording...")
             time.sleep(min(duration, 5))  # Don't actually wait in simulation
             return output_file
         
-        # Start recording (F9 in Space Engine)
-        pyautogui.press('f9')
-        
-        # Wait for recording duration
-        # Show progress
-        for i in range(duration):
-            if i % 60 == 0:
-                print(f"  Recording: {i // 60}m / {duration // 60}m")
-            time.sleep(1)
-        
-        # Stop recording
-        pyautogui.press('f9')
-        time.sleep(2)
+        with RecordingWatcher(RECORDINGS_DIR, RECORDING_SUFFIXES) as watcher:
+            # Start recording (F9 in Space Engine)
+            self.desktop.press('f9')
+            
+            recording = watcher.wait_for_file(RECORDING_START_TIMEOUT)
+            if not recording:
+                raise RuntimeError(f"No recording appeared in {RECORDINGS_DIR} "
+                                   f"within {RECORDING_START_TIMEOUT}s")
+            print(f"  Recording to: {recording.name}")
+            if on_start:
+                on_start(recording)
+            
+            # Wait for recording duration, reporting progress once a minute
+            # and checking that SE is still alive in between
+            started = time.monotonic()
+            reported = None
+            while True:
+                if not self.is_healthy():
+                    raise RuntimeError("Space Engine stopped responding while recording")
+                elapsed = time.monotonic() - started
+                if elapsed >= duration:
+                    break
+                if reported is None or elapsed - reported >= 60:
+                    size_mb = recording.stat().st_size / 1024 / 1024
+                    print(f"  Recording: {int(elapsed) // 60}m / {duration // 60}m ({size_mb:.0f} MB)")
+                    reported = elapsed
+                time.sleep(min(RECORDING_HEALTH_INTERVAL, duration - elapsed))
+            
+            # Stop recording and wait for SE to finish writing the file
+            self.desktop.press('f9')
+            watcher.wait_until_complete(recording, RECORDING_FINISH_TIMEOUT)
         
         self._screenshot("after_recording")
-        
-        # Find the output file (Space Engine saves to its own location)
-        # We'll need to copy/move it
-        return self._find_recording()
+        return recording
     
-    def _find_recording(self) -> Optional[Path]:
-        """Find the most recent recording file"""
-        # Space Engine typically saves to:
-        # %USERPROFILE%/Documents/SpaceEngine/screenshots/
-        
-        from config import SPACE_ENGINE_DATA
-        recordings_dir = Path(SPACE_ENGINE_DATA) / "screenshots"
+    def is_healthy(self) -> bool:
+        """True if SE is running and (when detectable) its window still exists"""
+        if not self.process or self.process.poll() is not None:
+            return False
+        if self.desktop.has_windows and self.desktop.find_window() is None:
+            return False
+        return True
+    
+    def ensure_running(self):
+        """Launch SE, or relaunch it if the running instance crashed or hung"""
+        if self.is_healthy():
+            return
         
-        if not recordings_dir.exists():
-            return None
+        if self.process:
+            print("Space Engine is not responding, restarting...")
+            self.close()
+            self.restarts += 1
         
-        # Find most recent video file
-        video_files = list(recordings_dir.glob("*.mp4"))
-        if video_files:
-            return max(video_files, key=lambda p: p.stat().st_mtime)
+        self.launch()
+    
+    def run_scene(self, script_path: Path, resolution: str, duration: int) -> Path:
+        """Load and record one scene in the running session
         
-        return None
+        If SE dies part-way through, it is relaunched and the scene retried
+        (up to SESSION_MAX_RESTARTS times).
+        """
+        for attempt in range(SESSION_MAX_RESTARTS + 1):
+            self.ensure_running()
+            try:
+                self.load_script(script_path)
+                self.configure_recording(resolution, duration)
+                return self.start_recording(duration)
+            except Exception:
+                if self.is_healthy() or attempt == SESSION_MAX_RESTARTS:
+                    raise
+                print(f"Space Engine crashed during {script_path.name}, retrying")
     
     def close(self):
         """Close Space Engine"""
         if self.process:
             self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
             self.process = None
         
-        if self.window and pyautogui:
-            pyautogui.hotkey('alt', 'f4')
+        self.window = None
     
     def __enter__(self):
+        self.ensure_running()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
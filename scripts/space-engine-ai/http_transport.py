@@ -0,0 +1,233 @@
+"""
+Shared HTTP transport for outbound API calls.
+
+Every API client (Gemini TTS, and the OpenAI / Anthropic SDKs behind
+AIComposer) goes through httpx clients built here, so they share:
+- Pooled keep-alive connections (HTTP/2 when the h2 package is installed)
+- Configurable connect / read timeouts
+- One retry policy: exponential backoff with jitter on failed connection
+  attempts and 429/5xx responses, honouring Retry-After
+- Per-host request, retry, error and latency metrics
+
+Usage:
+    import http_transport
+    response = http_transport.client().post(url, json=payload)
+    print(http_transport.metrics.summary())
+"""
+
+import os
+import time
+import random
+import asyncio
+import threading
+from typing import Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "32"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "16"))
+HTTP_KEEPALIVE_EXPIRY = 60.0  # Seconds an idle connection stays in the pool
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+HTTP_MAX_BACKOFF = 60.0
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504, 529}
+# Failures while connecting: the request never reached the server, so
+# sending it again is safe whatever the method
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+# A connection dropped mid-exchange may have delivered the request already,
+# so that is only retried for methods the server may safely see twice
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+
+def replayable(request: httpx.Request, error: Exception) -> bool:
+    """Whether a request that failed with error can be sent again"""
+    if isinstance(error, CONNECT_ERRORS):
+        return True
+    return isinstance(error, httpx.RemoteProtocolError) and request.method in IDEMPOTENT_METHODS
+
+
+class Metrics:
+    """Request counts and latency per host (time to response headers)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host(self, host: str) -> dict:
+        return self._hosts.setdefault(host, {
+            'requests': 0, 'errors': 0, 'retries': 0,
+            'total_seconds': 0.0, 'max_seconds': 0.0, 'status': {},
+        })
+
+    def record(self, host: str, seconds: float, status: Optional[int] = None):
+        """Record one attempt; status None means it failed without a response"""
+        with self._lock:
+            stats = self._host(host)
+            stats['requests'] += 1
+            stats['total_seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            if status is None or status >= 400:
+                stats['errors'] += 1
+            key = str(status) if status is not None else 'failed'
+            stats['status'][key] = stats['status'].get(key, 0) + 1
+
+    def retried(self, host: str):
+        with self._lock:
+            self._host(host)['retries'] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                host: {**stats, 'status': dict(stats['status']),
+                       'avg_seconds': stats['total_seconds'] / stats['requests'] if stats['requests'] else 0.0}
+                for host, stats in self._hosts.items()
+            }
+
+    def summary(self) -> str:
+        lines = []
+        for host, stats in sorted(self.snapshot().items()):
+            lines.append(
+                f"{host}: {stats['requests']} requests, {stats['retries']} retries, "
+                f"{stats['errors']} errors, avg {stats['avg_seconds']:.2f}s, max {stats['max_seconds']:.2f}s"
+            )
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._hosts.clear()
+
+
+metrics = Metrics()
+
+
+def retry_after(headers) -> Optional[float]:
+    """Seconds requested by a Retry-After header, if any"""
+    try:
+        return float((headers or {}).get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt: int, requested: Optional[float] = None) -> float:
+    """Delay before retry number attempt + 1: the server's request, else jittered exponential"""
+    if requested is not None:
+        return min(requested, HTTP_MAX_BACKOFF)
+    return min(HTTP_MAX_BACKOFF, 2 ** attempt) * (0.5 + random.random())
+
+
+def timeout(read: Optional[float] = None) -> httpx.Timeout:
+    return httpx.Timeout(read if read is not None else HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY)
+
+
+class RetryTransport(httpx.BaseTransport):
+    """Pooled transport that retries transient failures and records metrics
+
+    retry_status lists the response codes worth retrying; pass an empty set
+    when the caller coordinates its own rate-limit handling.
+    """
+
+    def __init__(self, max_retries: int = HTTP_MAX_RETRIES, retry_status=RETRYABLE_STATUS):
+        self.max_retries = max_retries
+        self.retry_status = retry_status
+        self._inner = httpx.HTTPTransport(http2=HTTP2, limits=_limits())
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            try:
+                response = self._inner.handle_request(request)
+            except httpx.TransportError as e:
+                metrics.record(host, time.monotonic() - started)
+                if not replayable(request, e) or attempt == self.max_retries:
+                    raise
+                delay = backoff(attempt)
+            else:
+                metrics.record(host, time.monotonic() - started, response.status_code)
+                if response.status_code not in self.retry_status or attempt == self.max_retries:
+                    return response
+                delay = backoff(attempt, retry_after(response.headers))
+                response.close()
+            metrics.retried(host)
+            time.sleep(delay)
+
+    def close(self):
+        self._inner.close()
+
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    """asyncio counterpart of RetryTransport"""
+
+    def __init__(self, max_retries: int = HTTP_MAX_RETRIES, retry_status=RETRYABLE_STATUS):
+        self.max_retries = max_retries
+        self.retry_status = retry_status
+        self._inner = httpx.AsyncHTTPTransport(http2=HTTP2, limits=_limits())
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            try:
+                response = await self._inner.handle_async_request(request)
+            except httpx.TransportError as e:
+                metrics.record(host, time.monotonic() - started)
+                if not replayable(request, e) or attempt == self.max_retries:
+                    raise
+                delay = backoff(attempt)
+            else:
+                metrics.record(host, time.monotonic() - started, response.status_code)
+                if response.status_code not in self.retry_status or attempt == self.max_retries:
+                    return response
+                delay = backoff(attempt, retry_after(response.headers))
+                await response.aclose()
+            metrics.retried(host)
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def client() -> httpx.Client:
+    """The process-wide pooled client (thread-safe, created on first use)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(transport=RetryTransport(), timeout=timeout())
+        return _client
+
+
+def async_client(retry_status=RETRYABLE_STATUS) -> httpx.AsyncClient:
+    """A pooled asyncio client with the shared settings
+
+    Async clients are tied to an event loop, so callers own (and close) the
+    client rather than sharing one per process.
+    """
+    return httpx.AsyncClient(transport=AsyncRetryTransport(retry_status=retry_status),
+                             timeout=timeout())
+
+
+def close():
+    """Close the shared client's pooled connections"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -10,15 +10,18 @@ Usage:
     python main.py --batch scenes.json
 """
 
+import threading
+
 import click
 from pathlib import Path
 from rich.console import Console
 from rich.panel import Panel
 
-from config import OUTPUT_DIR, TEMPLATES_DIR
-from ai_composer import AIComposer
-from gui_automation import SpaceEngineController
-from video_pipeline import VideoProcessor
+from config import OUTPUT_DIR, TEMPLATES_DIR, RENDITIONS
+from tracing import tracer, file_size
+
+# Commands import the pipeline modules they need, so `templates` and `status`
+# start without loading the GUI automation stack or the AI provider SDKs
 
 console = Console()
 
@@ -29,6 +32,67 @@ def cli():
     pass
 
 
+class _LiveEncode:
+    """Runs VideoProcessor.process_live in the background during a recording
+    
+    Recordings in a container that cannot be read while it is written (see
+    LIVE_SUFFIXES) are not started; they are encoded after the capture.
+    """
+    
+    def __init__(self, processor, output_path: Path):
+        self.processor = processor
+        self.output_path = output_path
+        self.done = threading.Event()
+        self.drained = threading.Event()
+        self.error = None
+        self.thread = None
+    
+    @property
+    def started(self) -> bool:
+        return self.thread is not None
+    
+    def start(self, recording: Path):
+        from config import LIVE_SUFFIXES
+        if recording.suffix.lower() not in LIVE_SUFFIXES:
+            console.print(f"[yellow]{recording.suffix} recordings cannot be read while they are "
+                          f"written; encoding after the capture instead[/yellow]")
+            return
+        self.thread = threading.Thread(target=self._run, args=(recording,), daemon=True)
+        self.thread.start()
+    
+    def _run(self, recording: Path):
+        try:
+            self.processor.process_live(recording, self.output_path, finished=self.done.is_set,
+                                        drained=self.drained)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.drained.set()
+    
+    def stop(self):
+        """Signal that the recording is complete and wait until it has been read"""
+        self.done.set()
+        self.drained.wait()
+    
+    def finish(self) -> Path:
+        """Wait for the encode to finish"""
+        self.stop()
+        self.thread.join()
+        if self.error:
+            raise self.error
+        return self.output_path
+
+
+def _write_trace(name: str, **labels):
+    """Export the spans recorded so far (see tracing.py)"""
+    from datetime import datetime
+    from config import TRACE_DIR, METRICS_TEXTFILE
+    
+    trace_path = tracer.write_chrome_trace(TRACE_DIR / f"{name}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    metrics_path = tracer.write_prometheus(METRICS_TEXTFILE, labels={'run': name, **labels})
+    console.print(f"[dim]Trace: {trace_path}\nMetrics: {metrics_path}[/dim]")
+
+
 @cli.command()
 @click.option('--template', '-t', type=click.Choice(['black_hole', 'asteroid_belt', 'galaxy_collision']),
               help='Use a pre-built template')
@@ -38,10 +102,22 @@ def cli():
 @click.option('--resolution', '-r', type=click.Choice(['1080p', '1440p', '4k', '5k', '8k']), 
               default='4k', help='Video resolution preset (default: 4k)')
 @click.option('--preview', is_flag=True, help='Preview settings without rendering')
-def generate(template, prompt, duration, output, resolution, preview):
+@click.option('--fresh', is_flag=True, help='Ignore stages finished by a previous run')
+@click.option('--no-ai-cache', is_flag=True, help='Always send prompts to the AI provider')
+@click.option('--live', is_flag=True,
+              help='Encode while recording (needs a streamable format, e.g. RECORDING_SUFFIXES=.mkv)')
+@click.option('--rendition', 'renditions', multiple=True, type=click.Choice(list(RENDITIONS)),
+              help='Also publish this rendition, encoded in the same pass (repeatable)')
+@click.option('--trace', is_flag=True, help='Write a Chrome trace and Prometheus metrics for the run')
+def generate(template, prompt, duration, output, resolution, preview, fresh, no_ai_cache, live,
+             renditions, trace):
     """Generate a space video from template or prompt"""
     
-    from config import RESOLUTION_PRESETS, VRAM_REQUIREMENTS
+    from config import RESOLUTION_PRESETS, VRAM_REQUIREMENTS, RECORDING_SUFFIXES
+    from ai_composer import AIComposer
+    from artifacts import ArtifactStore
+    from gui_automation import SpaceEngineController
+    from video_pipeline import VideoProcessor, Rendition, X264_ARGS
     
     console.print(Panel.fit("🚀 Space Engine AI Interface", style="bold blue"))
     
@@ -58,29 +134,71 @@ def generate(template, prompt, duration, output, resolution, preview):
         console.print(f"[yellow]⚠️  {resolution.upper()} requires {vram_needed} VRAM. Render will be slow.[/yellow]")
     
     # Initialize components
-    composer = AIComposer()
+    composer = AIComposer(use_cache=not no_ai_cache)
     controller = SpaceEngineController()
     processor = VideoProcessor()
+    store = ArtifactStore()
     
-    # Generate SE Script
+    # Generate SE Script (stored under a hash of its inputs)
     if template:
         console.print(f"[cyan]Using template:[/cyan] {template}")
-        script_path = TEMPLATES_DIR / f"{template}.se"
-        if not script_path.exists():
-            console.print(f"[yellow]Template not found, generating from AI...[/yellow]")
-            script_content = composer.from_template(template, duration=duration)
-            script_path.write_text(script_content)
+        template_path = TEMPLATES_DIR / f"{template}.se"
+        if template_path.exists():
+            script_content = template_path.read_text()
+            script_key = store.key('script', template=template, duration=duration,
+                                   resolution=resolution_str,
+                                   source=store.digest(script_content))
+        else:
+            script_key = store.key('script', template=template, duration=duration,
+                                   resolution=resolution_str)
     else:
         console.print(f"[cyan]Generating from prompt:[/cyan] {prompt}")
-        script_content = composer.from_prompt(prompt, duration=duration)
-        script_path = TEMPLATES_DIR / "custom_scene.se"
-        script_path.write_text(script_content)
+        script_key = store.key('script', prompt=prompt, duration=duration,
+                               resolution=resolution_str, provider=composer.provider)
+    
+    script_path = None if fresh else store.get('script', script_key, '.se')
+    with tracer.span('stage.script', source='template' if template else 'prompt',
+                     cached=bool(script_path)) as span:
+        if script_path:
+            console.print("[dim]Reusing script from a previous run[/dim]")
+            script_content = script_path.read_text()
+        else:
+            if template and not template_path.exists():
+                console.print(f"[yellow]Template not found, generating from AI...[/yellow]")
+                script_content = composer.from_template(template, duration=duration)
+            elif prompt:
+                script_content = composer.from_prompt(prompt, duration=duration)
+            
+            # Fit the script to the requested duration and resolution locally
+            try:
+                script_content = composer.adjust_script(script_content, duration=duration,
+                                                        resolution=(width, height))
+            except ValueError as e:
+                console.print(f"[yellow]Could not parse script, using it unchanged: {e}[/yellow]")
+            script_path = store.put_text('script', script_key, script_content, '.se')
+        span.set(bytes_out=len(script_content.encode('utf-8')))
+    
+    # Downstream stages are keyed on everything that affects their output
+    recording_key = store.key('recording', script=store.digest(script_content),
+                              resolution=resolution_str, duration=duration)
+    video_key = store.key('video', recording=recording_key, encoder=X264_ARGS)
+    rendition_keys = {
+        name: store.key('rendition', video=video_key, **Rendition.named(name).settings())
+        for name in renditions
+    }
     
     # Set output filename
     if not output:
         output = f"{template or 'custom'}_{resolution}_{duration}s.mp4"
     output_path = OUTPUT_DIR / output
     
+    raw_video = None if fresh else store.find('recording', recording_key, RECORDING_SUFFIXES)
+    final_video = None if fresh else store.get('video', video_key, '.mp4')
+    rendition_videos = {
+        name: None if fresh else store.get('rendition', key, '.mp4')
+        for name, key in rendition_keys.items()
+    }
+    
     # Show preview
     console.print("\n[bold]Scene Configuration:[/bold]")
     console.print(f"  Script: {script_path}")
@@ -88,6 +206,10 @@ def generate(template, prompt, duration, output, resolution, preview):
     console.print(f"  Resolution: {resolution.upper()} ({resolution_str})")
     console.print(f"  VRAM Required: {vram_needed}")
     console.print(f"  Output: {output_path}")
+    if renditions:
+        console.print(f"  Renditions: {', '.join(renditions)}")
+    if final_video or raw_video:
+        console.print(f"  Resuming: {'video' if final_video else 'recording'} already rendered")
     
     if preview:
         console.print("\n[yellow]Preview mode - no rendering[/yellow]")
@@ -97,47 +219,141 @@ def generate(template, prompt, duration, output, resolution, preview):
     console.print("\n[bold green]Starting render pipeline...[/bold green]")
     
     try:
-        # Step 1: Launch Space Engine and load script
-        console.print("[dim]1/4 Launching Space Engine...[/dim]")
-        controller.launch()
-        
-        # Step 2: Load script and configure
-        console.print("[dim]2/4 Loading script...[/dim]")
-        controller.load_script(script_path)
-        controller.configure_recording(resolution, duration)
+        if final_video:
+            console.print("[dim]1-4/4 Skipped (video already rendered)[/dim]")
+        else:
+            if raw_video:
+                console.print("[dim]1-3/4 Skipped (recording already captured)[/dim]")
+            else:
+                # Step 1: Launch Space Engine and load script
+                console.print("[dim]1/4 Launching Space Engine...[/dim]")
+                with tracer.span('stage.launch'):
+                    controller.launch()
+                
+                # Step 2: Load script and configure
+                console.print("[dim]2/4 Loading script...[/dim]")
+                with tracer.span('stage.load_script', resolution=resolution_str):
+                    controller.load_script(script_path)
+                    controller.configure_recording(resolution_str, duration)
+                
+                # Step 3: Record (optionally encoding as the file grows)
+                console.print("[dim]3/4 Recording (this takes real-time)...[/dim]")
+                live_encode = None
+                if live:
+                    live_encode = _LiveEncode(processor, store.reserve('video', video_key, '.mp4'))
+                with tracer.span('stage.record', resolution=resolution_str, duration=duration,
+                                 live=live) as span:
+                    recording = controller.start_recording(
+                        duration, on_start=live_encode.start if live_encode else None
+                    )
+                    if not recording:
+                        raise RuntimeError("Recording file not found")
+                    span.set(bytes_out=file_size(recording))
+                # Keep the recording whatever happens to the live encode (it is
+                # moved only once the encoder has stopped reading it)
+                if live_encode and live_encode.started:
+                    live_encode.stop()
+                raw_video = store.put('recording', recording_key, recording, move=True,
+                                      suffix=recording.suffix.lower())
+                if live_encode and live_encode.started:
+                    console.print("[dim]4/4 Finishing live encode...[/dim]")
+                    try:
+                        with tracer.span('stage.encode', resolution=resolution_str,
+                                         live=True) as span:
+                            partial = live_encode.finish()
+                            span.set(bytes_in=file_size(raw_video), bytes_out=file_size(partial))
+                        final_video = store.commit('video', video_key, partial)
+                    except Exception as e:
+                        console.print(f"[yellow]Live encode failed, encoding the recording "
+                                      f"instead: {e}[/yellow]")
+            
+            if not final_video:
+                # Step 4: Post-process (into a partial file, so a crash never
+                # leaves something that looks finished)
+                console.print("[dim]4/4 Post-processing...[/dim]")
+                partial = store.reserve('video', video_key, '.mp4')
+                ladder = {name: store.reserve('rendition', rendition_keys[name], '.mp4')
+                          for name, video in rendition_videos.items() if not video}
+                with tracer.span('stage.encode', resolution=resolution_str, live=False,
+                                 renditions=','.join(ladder)) as span:
+                    processor.process(raw_video, partial, renditions=ladder)
+                    span.set(bytes_in=file_size(raw_video), bytes_out=file_size(partial))
+                final_video = store.commit('video', video_key, partial)
+                for name, path in ladder.items():
+                    rendition_videos[name] = store.commit('rendition', rendition_keys[name], path)
         
-        # Step 3: Record
-        console.print("[dim]3/4 Recording (this takes real-time)...[/dim]")
-        raw_video = controller.start_recording(duration)
-        
-        # Step 4: Post-process
-        console.print("[dim]4/4 Post-processing...[/dim]")
-        processor.process(raw_video, output_path)
+        # Renditions the master was encoded without (resumed or live runs)
+        # are made from it in one more pass
+        ladder = {name: store.reserve('rendition', rendition_keys[name], '.mp4')
+                  for name, video in rendition_videos.items() if not video}
+        if ladder:
+            with tracer.span('stage.renditions', renditions=','.join(ladder)):
+                processor.process_renditions(final_video, ladder)
+            for name, path in ladder.items():
+                rendition_videos[name] = store.commit('rendition', rendition_keys[name], path)
         
+        with tracer.span('stage.publish'):
+            store.publish(final_video, output_path)
+            for name, video in rendition_videos.items():
+                published = store.publish(video, output_path.with_name(
+                    f"{output_path.stem}_{name}{output_path.suffix}"))
+                console.print(f"  [cyan]{name}:[/cyan] {published}")
         console.print(f"\n[bold green]✓ Complete![/bold green] Output: {output_path}")
         
     except Exception as e:
         console.print(f"[red]Error: {e}[/red]")
         raise
+    finally:
+        if trace:
+            _write_trace(f"generate_{Path(output).stem}", resolution=resolution)
 
 
 @cli.command()
 @click.argument('scenes_file', type=click.Path(exists=True))
-def batch(scenes_file):
+@click.option('--trace', is_flag=True, help='Write a Chrome trace and Prometheus metrics for the batch')
+def batch(scenes_file, trace):
     """Process multiple scenes from a JSON file"""
     import json
+    from ai_composer import AIComposer
+    from gui_automation import SpaceEngineController
+    from scheduler import BatchScheduler, load_scenes
+    from video_pipeline import VideoProcessor
     
     console.print(Panel.fit("🎬 Batch Processing", style="bold blue"))
     
     with open(scenes_file) as f:
-        scenes = json.load(f)
+        scenes = load_scenes(json.load(f))
     
     console.print(f"Found {len(scenes)} scenes to process")
     
     for i, scene in enumerate(scenes, 1):
-        console.print(f"\n[cyan]Scene {i}/{len(scenes)}:[/cyan] {scene.get('name', 'Unnamed')}")
-        # Process each scene...
-        # TODO: Implement batch processing
+        if scene.error:
+            console.print(f"  [red]Scene {i}/{len(scenes)}:[/red] {scene.error}")
+        else:
+            console.print(f"  [cyan]Scene {i}/{len(scenes)}:[/cyan] {scene.name} → {scene.output_path.name}")
+    
+    console.print("\n[bold green]Starting batch pipeline...[/bold green]")
+    
+    # One Space Engine session for the whole batch
+    try:
+        with SpaceEngineController() as controller:
+            scheduler = BatchScheduler(AIComposer(), controller, VideoProcessor())
+            results = scheduler.run(scenes)
+            if controller.restarts:
+                console.print(f"[yellow]Space Engine was restarted {controller.restarts}x[/yellow]")
+    finally:
+        if trace:
+            _write_trace(f"batch_{Path(scenes_file).stem}")
+    
+    failed = 0
+    for scene, result in zip(scenes, results):
+        if isinstance(result, Exception):
+            failed += 1
+            console.print(f"  [red]✗ {scene.name}:[/red] {result}")
+        else:
+            console.print(f"  [green]✓ {scene.name}:[/green] {result}")
+    
+    console.print(f"\n[bold]{len(scenes) - failed}/{len(scenes)} scenes complete[/bold]")
 
 
 @cli.command()
@@ -0,0 +1,121 @@
+"""
+Media Probe
+
+Single-call ffprobe wrapper returning stream and format metadata, backed by
+an on-disk cache keyed by file identity (path + size + mtime) so the same
+source is only probed once across runs.
+
+Keyframe times need every packet of the file to be read, so they come from
+a separate keyframes() call that only the chunked encoder makes, and are
+not cached.
+"""
+
+import json
+import subprocess
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Optional
+
+from cache import DiskCache
+from config import CACHE_DIR, PROBE_CACHE_SIZE
+from tracing import tracer
+
+
+@dataclass
+class MediaInfo:
+    """Metadata for the first video stream of a file"""
+    duration: float
+    codec: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+
+
+_cache = DiskCache(CACHE_DIR / "probe.json", max_entries=PROBE_CACHE_SIZE)
+
+
+def _file_key(path: Path) -> str:
+    """Identity of a file's current contents"""
+    stat = path.stat()
+    return f"{path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+def _parse_rate(rate: Optional[str]) -> Optional[float]:
+    """Parse an ffprobe frame rate such as '30000/1001'"""
+    if not rate:
+        return None
+    num, _, den = rate.partition('/')
+    try:
+        value = float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return value or None
+
+
+def _ffprobe(path: Path) -> MediaInfo:
+    """Run ffprobe once for format and stream metadata (headers only)"""
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries',
+        'format=duration'
+        ':stream=codec_name,width,height,avg_frame_rate,r_frame_rate',
+        '-of', 'json',
+        str(path)
+    ]
+    
+    with tracer.span('ffprobe', path=path.name):
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    data = json.loads(result.stdout)
+    
+    stream = (data.get('streams') or [{}])[0]
+    
+    return MediaInfo(
+        duration=float(data['format']['duration']),
+        codec=stream.get('codec_name'),
+        width=stream.get('width'),
+        height=stream.get('height'),
+        fps=_parse_rate(stream.get('avg_frame_rate')) or _parse_rate(stream.get('r_frame_rate')),
+    )
+
+
+def probe(path: Path) -> MediaInfo:
+    """Return cached metadata for path, probing only if the file changed"""
+    key = _file_key(path)
+    cached = _cache.get(key)
+    if cached is not None:
+        try:
+            return MediaInfo(**cached)
+        except TypeError:
+            pass  # Entry written by an older MediaInfo layout
+    
+    info = _ffprobe(path)
+    _cache.put(key, asdict(info))
+    return info
+
+
+def keyframes(path: Path) -> list[float]:
+    """Timestamps (s) of the first video stream's keyframes, in order
+    
+    Demuxes the whole file, so this is only worth it where the cut points
+    matter (chunked encoding).
+    """
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'json',
+        str(path)
+    ]
+    
+    with tracer.span('ffprobe.keyframes', path=path.name):
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    packets = json.loads(result.stdout).get('packets', [])
+    
+    return sorted(
+        float(packet['pts_time'])
+        for packet in packets
+        if 'K' in packet.get('flags', '') and packet.get('pts_time') not in (None, 'N/A')
+    )
@@ -0,0 +1,120 @@
+"""
+Recording Watcher
+
+Detects the video file Space Engine creates when recording starts, tracks
+its growth and signals completion once the writer closes it (or its size
+stops changing). Uses inotify where available (Linux, `inotify_simple`)
+and falls back to polling the directory listing for new names.
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+    flags = None
+
+from config import POLL_INTERVAL, POLL_MAX_INTERVAL, RECORDING_STABLE_SECONDS
+
+
+class RecordingWatcher:
+    """Watches a directory for one new recording file"""
+    
+    def __init__(self, directory: Path, suffixes: tuple[str, ...] = ('.mp4',)):
+        self.directory = directory
+        self.suffixes = suffixes
+        self._inotify = None
+        self._known: set[str] = set()
+        self._closed: set[str] = set()  # Names inotify reported as closed after writing
+    
+    def start(self) -> 'RecordingWatcher':
+        """Begin watching; call before triggering the recording"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        
+        if INotify:
+            self._inotify = INotify()
+            self._inotify.add_watch(
+                str(self.directory),
+                flags.CREATE | flags.MOVED_TO | flags.CLOSE_WRITE
+            )
+        else:
+            # Names only: no stat() of existing files
+            self._known = set(os.listdir(self.directory))
+        return self
+    
+    def close(self):
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def _matches(self, name: str) -> bool:
+        return name.lower().endswith(self.suffixes)
+    
+    def _read_events(self, timeout: float) -> list:
+        events = self._inotify.read(timeout=int(timeout * 1000))
+        for event in events:
+            if event.mask & flags.CLOSE_WRITE:
+                self._closed.add(event.name)
+        return events
+    
+    def wait_for_file(self, timeout: float) -> Optional[Path]:
+        """Return the first new recording file, or None on timeout"""
+        deadline = time.monotonic() + timeout
+        interval = POLL_INTERVAL
+        
+        while True:
+            remaining = deadline - time.monotonic()
+            
+            if self._inotify:
+                for event in self._read_events(max(remaining, 0)):
+                    if event.mask & (flags.CREATE | flags.MOVED_TO) and self._matches(event.name):
+                        return self.directory / event.name
+            else:
+                new = set(os.listdir(self.directory)) - self._known
+                self._known |= new
+                matches = sorted(name for name in new if self._matches(name))
+                if matches:
+                    return self.directory / matches[0]
+                time.sleep(max(0, min(interval, remaining)))
+                interval = min(interval * 1.5, POLL_MAX_INTERVAL)
+            
+            if remaining <= 0:
+                return None
+    
+    def wait_until_complete(self, path: Path, timeout: float,
+                            stable_for: float = RECORDING_STABLE_SECONDS,
+                            on_progress: Optional[Callable[[int], None]] = None) -> Path:
+        """Block until the writer closes path or its size stops changing"""
+        deadline = time.monotonic() + timeout
+        last_size, stable_since = -1, time.monotonic()
+        
+        while True:
+            if path.name in self._closed:
+                return path
+            
+            size = path.stat().st_size
+            now = time.monotonic()
+            if size != last_size:
+                last_size, stable_since = size, now
+                if on_progress:
+                    on_progress(size)
+            elif now - stable_since >= stable_for:
+                return path
+            
+            if now >= deadline:
+                raise TimeoutError(f"Recording still growing after {timeout}s: {path}")
+            
+            if self._inotify:
+                self._read_events(POLL_MAX_INTERVAL)
+            else:
+                time.sleep(POLL_MAX_INTERVAL)
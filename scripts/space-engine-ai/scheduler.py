@@ -0,0 +1,299 @@
+"""
+Batch Scheduler
+
+Runs a list of scenes through the render pipeline with the stages overlapped:
+- AI script generation runs ahead in its own worker pool
+- Space Engine recording is serialized behind a single-slot lock (one GUI)
+- Finished recordings are queued to background FFmpeg workers
+  (CapturePipeline) while the next scene records, with backpressure on
+  scratch disk use and outputs published in scene order
+"""
+
+import os
+import queue
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from config import (
+    OUTPUT_DIR,
+    TEMPLATES_DIR,
+    RESOLUTION_PRESETS,
+    SCRIPT_WORKERS,
+    POSTPROCESS_WORKERS,
+    SCRATCH_BUDGET_GB,
+    SCRATCH_MIN_FREE_GB,
+)
+from tracing import tracer, file_size
+
+GB = 1024 ** 3
+
+
+class Scene:
+    """One entry of a scenes.json batch file
+    
+    An invalid entry still becomes a Scene, with the problem in `error`, so
+    it fails on its own instead of aborting the whole batch.
+    """
+    
+    def __init__(self, index: int, spec: dict):
+        self.index = index
+        self.error: Optional[ValueError] = None
+        if not isinstance(spec, dict):
+            self.error = ValueError(f"Scene {index + 1} is not an object: {spec!r}")
+            spec = {}
+        
+        self.name = spec.get('name', f'scene_{index + 1:02d}')
+        self.template = spec.get('template')
+        self.prompt = spec.get('prompt')
+        self.resolution = spec.get('resolution', '4k')
+        self.params = spec.get('params', {})
+        try:
+            self.duration = int(spec.get('duration', 600))
+        except (TypeError, ValueError):
+            self.duration = 0
+            self.error = self.error or ValueError(
+                f"Scene '{self.name}' has invalid duration: {spec.get('duration')!r}")
+        
+        if not self.template and not self.prompt:
+            self.error = self.error or ValueError(f"Scene '{self.name}' needs a template or prompt")
+        if self.resolution not in RESOLUTION_PRESETS:
+            self.error = self.error or ValueError(
+                f"Scene '{self.name}' has unknown resolution: {self.resolution}")
+        
+        output = spec.get('output') or f"{self.name}_{self.resolution}_{self.duration}s.mp4"
+        self.output_path = OUTPUT_DIR / output
+    
+    @property
+    def resolution_str(self) -> str:
+        width, height = RESOLUTION_PRESETS[self.resolution]
+        return f"{width}x{height}"
+
+
+def load_scenes(specs: list) -> list[Scene]:
+    """Scenes for the entries of a batch file
+    
+    A scene's script and output files are named after it and written
+    concurrently, so an entry reusing the name or output path of an earlier
+    valid scene gets a ValueError instead of overwriting its files.
+    """
+    scenes = [Scene(index, spec) for index, spec in enumerate(specs)]
+    by_name: dict[str, Scene] = {}
+    by_output: dict[Path, Scene] = {}
+    for scene in scenes:
+        if scene.error:
+            continue
+        if scene.name in by_name:
+            other = by_name[scene.name]
+            scene.error = ValueError(
+                f"Scene {scene.index + 1} reuses the name '{scene.name}' of scene {other.index + 1}")
+        elif scene.output_path in by_output:
+            other = by_output[scene.output_path]
+            scene.error = ValueError(
+                f"Scene '{scene.name}' has the same output as scene '{other.name}': "
+                f"{scene.output_path.name}")
+        else:
+            by_name[scene.name] = scene
+            by_output[scene.output_path] = scene
+    return scenes
+
+
+class CapturePipeline:
+    """Background encoders fed by the recorder through a queue
+    
+    submit() hands over a finished recording and returns immediately unless
+    the recordings waiting for (or in) encoding already exceed the scratch
+    budget, or free space on the recordings' disk is below the reserve;
+    then it blocks until an encode finishes. Each output is written to a
+    partial file and only renamed into place once every earlier scene has
+    been published, so final outputs always appear in scene order; the raw
+    recording is deleted at that point.
+    """
+    
+    def __init__(self, process: Callable[[Path, Path], Path],
+                 workers: int = POSTPROCESS_WORKERS,
+                 scratch_budget: float = SCRATCH_BUDGET_GB * GB,
+                 min_free: float = SCRATCH_MIN_FREE_GB * GB):
+        self.process = process
+        self.scratch_budget = scratch_budget
+        self.min_free = min_free
+        self.queue: queue.Queue = queue.Queue()
+        self.results: dict[int, Union[Path, Exception]] = {}
+        
+        self._pending_bytes = 0
+        self._space = threading.Condition()
+        self._finished: dict[int, tuple[Optional[Path], Union[Path, Exception], Optional[Path]]] = {}
+        self._next_publish = 0
+        self._publish_lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"ffmpeg-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+    
+    def _has_room(self, size: int, volume: Path) -> bool:
+        if self._pending_bytes == 0:
+            return True  # Never block on an empty pipeline
+        if self._pending_bytes + size > self.scratch_budget:
+            return False
+        return shutil.disk_usage(volume).free >= self.min_free
+    
+    def submit(self, index: int, raw_video: Path, output_path: Path):
+        """Queue a recording for encoding, blocking while scratch space is exhausted
+        
+        Free space is measured where the recording lives (Space Engine's
+        recordings folder), since that is the disk the next capture fills.
+        """
+        size = raw_video.stat().st_size
+        volume = raw_video.parent
+        with self._space:
+            if not self._has_room(size, volume):
+                print(f"Waiting for encodes to free scratch space ({self._pending_bytes / GB:.1f} GB queued)")
+                self._space.wait_for(lambda: self._has_room(size, volume))
+            self._pending_bytes += size
+        self.queue.put((index, raw_video, output_path, size))
+    
+    def skip(self, index: int, error: Exception):
+        """Record a scene that never reached encoding so later scenes can publish"""
+        self._finish(index, None, error)
+    
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            
+            index, raw_video, output_path, size = item
+            partial = output_path.with_name(f".partial_{output_path.name}")
+            try:
+                with tracer.span('scene.encode', scene=output_path.stem, bytes_in=size) as span:
+                    result = self.process(raw_video, partial)
+                    span.set(bytes_out=file_size(partial))
+            except Exception as e:
+                result = e
+            finally:
+                with self._space:
+                    self._pending_bytes -= size
+                    self._space.notify_all()
+            
+            self._finish(index, output_path, result, raw_video)
+    
+    def _finish(self, index: int, output_path: Optional[Path], result: Union[Path, Exception],
+                raw_video: Optional[Path] = None):
+        """Publish finished scenes strictly in order
+        
+        A scene's raw recording is deleted once its output is in place; a
+        failed scene keeps it for another attempt.
+        """
+        with self._publish_lock:
+            self._finished[index] = (output_path, result, raw_video)
+            while self._next_publish in self._finished:
+                output_path, result, raw_video = self._finished.pop(self._next_publish)
+                if not isinstance(result, Exception):
+                    try:
+                        os.replace(result, output_path)
+                        result = output_path
+                    except OSError as e:
+                        result = e
+                    else:
+                        raw_video.unlink(missing_ok=True)
+                self.results[self._next_publish] = result
+                self._next_publish += 1
+    
+    def close(self) -> dict[int, Union[Path, Exception]]:
+        """Wait for queued encodes to finish and return results by scene index"""
+        for _ in self._workers:
+            self.queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        return self.results
+
+
+class BatchScheduler:
+    """Overlaps script generation, recording and encoding across scenes"""
+    
+    def __init__(self, composer, controller, processor,
+                 script_workers: int = SCRIPT_WORKERS,
+                 postprocess_workers: int = POSTPROCESS_WORKERS):
+        self.composer = composer
+        self.controller = controller
+        self.processor = processor
+        self.script_workers = script_workers
+        self.postprocess_workers = postprocess_workers
+        
+        # Space Engine drives a single window, so only one recording at a time
+        self.recorder_slot = threading.BoundedSemaphore(1)
+    
+    def prepare_script(self, scene: Scene) -> Path:
+        """Resolve or generate the SE Script for a scene"""
+        with tracer.span('scene.script', scene=scene.name):
+            return self._prepare_script(scene)
+    
+    def _prepare_script(self, scene: Scene) -> Path:
+        template_path = TEMPLATES_DIR / f"{scene.template}.se"
+        if scene.template and not scene.params and template_path.exists():
+            content = template_path.read_text()
+        elif scene.template:
+            content = self.composer.from_template(scene.template, duration=scene.duration,
+                                                  **scene.params)
+        else:
+            content = self.composer.from_prompt(scene.prompt, duration=scene.duration)
+        
+        # Fit duration and resolution locally (see se_script.py)
+        width, height = RESOLUTION_PRESETS[scene.resolution]
+        try:
+            content = self.composer.adjust_script(content, duration=scene.duration,
+                                                  resolution=(width, height))
+        except ValueError as e:
+            print(f"[{scene.name}] Could not parse script, using it unchanged: {e}")
+        
+        script_path = OUTPUT_DIR / f"{scene.name}.se"
+        script_path.parent.mkdir(parents=True, exist_ok=True)
+        script_path.write_text(content)
+        return script_path
+    
+    def record(self, scene: Scene, script_path: Path) -> Path:
+        """Record a scene while holding the recorder slot"""
+        with self.recorder_slot, tracer.span('scene.record', scene=scene.name,
+                                             resolution=scene.resolution_str,
+                                             duration=scene.duration) as span:
+            print(f"[{scene.name}] Recording {scene.duration}s at {scene.resolution}")
+            raw_video = self.controller.run_scene(script_path, scene.resolution_str,
+                                                  scene.duration)
+            span.set(bytes_out=file_size(raw_video))
+        
+        if not raw_video:
+            raise RuntimeError(f"No recording found for scene '{scene.name}'")
+        return raw_video
+    
+    def run(self, scenes: list[Scene]) -> list[Union[Path, Exception]]:
+        """Process all scenes, returning an output path or error per scene (in order)"""
+        encoder = CapturePipeline(self.processor.process, workers=self.postprocess_workers)
+        
+        with ThreadPoolExecutor(self.script_workers, thread_name_prefix="script") as scripts:
+            # All scripts start generating immediately
+            script_jobs = [None if scene.error else scripts.submit(self.prepare_script, scene)
+                           for scene in scenes]
+            
+            # Recording is the bottleneck: feed it scenes in order as soon as
+            # their script is ready, queueing each recording for the encoders
+            for scene, script_job in zip(scenes, script_jobs):
+                if scene.error:
+                    encoder.skip(scene.index, scene.error)
+                    continue
+                try:
+                    raw_video = self.record(scene, script_job.result())
+                    encoder.submit(scene.index, raw_video, scene.output_path)
+                except Exception as e:
+                    encoder.skip(scene.index, e)
+                    continue
+                print(f"[{scene.name}] Queued for post-processing")
+        
+        results = encoder.close()
+        for scene in scenes:
+            if isinstance(results[scene.index], Exception):
+                print(f"[{scene.name}] Failed: {results[scene.index]}")
+        return [results[scene.index] for scene in scenes]
@@ -0,0 +1,422 @@
+"""
+SE Script IR
+
+Tokenizer, parser and serializer for the Space Engine script command set
+(see SE_SCRIPT_REFERENCE in ai_composer.py). Scripts parse into a list of
+typed nodes that can be edited with plain Python, which makes adjustments
+like FOV, exposure, resolution or duration local transforms instead of an
+AI round trip.
+
+    script = parse(text)
+    rescale_duration(script, 1200)
+    text = compile_script(script)
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Optional, Union
+
+# Every command in the reference
+COMMANDS = {
+    'Goto', 'Select', 'Track', 'Follow',
+    'GotoSurface', 'GotoPos', 'SetFOV',
+    'StartFlightPath', 'AddWaypoint', 'PlayFlightPath',
+    'SetTime', 'SetTimeRate',
+    'StartRecording', 'StopRecording',
+    'SetExposure', 'SetBloom', 'SetHDR',
+}
+
+Value = Union[str, float, bool, tuple]
+
+
+# ============================================
+# IR nodes
+# ============================================
+
+@dataclass(kw_only=True)
+class Node:
+    comment: Optional[str] = None  # Trailing `// ...` on the same line
+
+
+@dataclass(kw_only=True)
+class Comment(Node):
+    """A comment-only line, or a blank line when text is None"""
+    text: Optional[str] = None
+
+
+@dataclass(kw_only=True)
+class Select(Node):
+    target: str
+
+
+@dataclass(kw_only=True)
+class Goto(Node):
+    params: dict = field(default_factory=dict)  # e.g. {'Target': 'Andromeda'}
+
+
+@dataclass(kw_only=True)
+class GotoPos(Node):
+    params: dict = field(default_factory=dict)  # e.g. {'Dist': 1e11}
+
+
+@dataclass(kw_only=True)
+class SetFOV(Node):
+    fov: float
+
+
+@dataclass(kw_only=True)
+class SetTimeRate(Node):
+    rate: float
+
+
+@dataclass(kw_only=True)
+class Waypoint(Node):
+    time: float
+    params: dict = field(default_factory=dict)  # Pos, Rot, Dist, ...
+
+
+@dataclass(kw_only=True)
+class FlightPath(Node):
+    """StartFlightPath, its waypoints (and interleaved comments), PlayFlightPath"""
+    waypoints: list = field(default_factory=list)  # Waypoint and Comment nodes
+    play_comment: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        times = [w.time for w in self.waypoints if isinstance(w, Waypoint)]
+        return max(times, default=0.0)
+
+
+@dataclass(kw_only=True)
+class StartRecording(Node):
+    params: dict = field(default_factory=dict)  # Width, Height, FPS, Duration, Codec
+
+
+@dataclass(kw_only=True)
+class Command(Node):
+    """Any other command, kept verbatim as positional args and/or a block"""
+    name: str
+    args: list = field(default_factory=list)
+    block: Optional[dict] = None
+
+
+Script = list
+
+
+# ============================================
+# Tokenizer
+# ============================================
+
+TOKEN_RE = re.compile(r'''
+    (?P<COMMENT>//[^\n]*)
+  | (?P<STRING>"[^"\n]*")
+  | (?P<NUMBER>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+  | (?P<IDENT>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<PUNCT>[{}(),])
+  | (?P<NEWLINE>\n)
+  | (?P<SPACE>[ \t\r]+)
+  | (?P<ERROR>.)
+''', re.VERBOSE)
+
+
+def tokenize(text: str) -> list[tuple[str, str, int]]:
+    """Split script text into (kind, value, line) tokens"""
+    tokens = []
+    line = 1
+    for match in TOKEN_RE.finditer(text):
+        kind, value = match.lastgroup, match.group()
+        if kind == 'SPACE':
+            continue
+        if kind == 'ERROR':
+            raise ValueError(f"Line {line}: unexpected character {value!r}")
+        tokens.append((kind, value, line))
+        if kind == 'NEWLINE':
+            line += 1
+    tokens.append(('NEWLINE', '\n', line))
+    tokens.append(('EOF', '', line))
+    return tokens
+
+
+# ============================================
+# Parser
+# ============================================
+
+class _Parser:
+    def __init__(self, text: str):
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self) -> tuple[str, str, int]:
+        return self.tokens[min(self.pos, len(self.tokens) - 1)]
+
+    def take(self, kind: Optional[str] = None, value: Optional[str] = None) -> tuple[str, str, int]:
+        token = self.peek()
+        if (kind and token[0] != kind) or (value and token[1] != value):
+            expected = value or kind
+            raise ValueError(f"Line {token[2]}: expected {expected}, got {token[1]!r}")
+        self.pos += 1
+        return token
+
+    def skip_newlines(self):
+        while self.peek()[0] == 'NEWLINE':
+            self.pos += 1
+
+    def value(self) -> Value:
+        kind, text, line = self.peek()
+        if kind == 'STRING':
+            self.pos += 1
+            return text[1:-1]
+        if kind == 'NUMBER':
+            self.pos += 1
+            return float(text)
+        if kind == 'IDENT' and text in ('true', 'false'):
+            self.pos += 1
+            return text == 'true'
+        if text == '(':
+            self.pos += 1
+            items = []
+            while True:
+                items.append(self.value())
+                if self.peek()[1] == ',':
+                    self.pos += 1
+                    continue
+                self.take(value=')')
+                return tuple(items)
+        raise ValueError(f"Line {line}: expected a value, got {text!r}")
+
+    def block(self) -> dict:
+        self.take(value='{')
+        params = {}
+        while True:
+            self.skip_newlines()
+            if self.peek()[1] == '}':
+                self.pos += 1
+                return params
+            if self.peek()[0] == 'COMMENT':
+                self.pos += 1
+                continue
+            key = self.take('IDENT')[1]
+            params[key] = self.value()
+
+    def end_of_line(self) -> Optional[str]:
+        """Consume an optional trailing comment and the newline"""
+        comment = None
+        if self.peek()[0] == 'COMMENT':
+            comment = self.take()[1][2:].strip()
+        self.take('NEWLINE')
+        return comment
+
+    def statement(self) -> Node:
+        kind, text, line = self.peek()
+        if kind == 'COMMENT':
+            self.pos += 1
+            self.take('NEWLINE')
+            return Comment(text=text[2:].strip())
+
+        name = self.take('IDENT')[1]
+        if name not in COMMANDS:
+            raise ValueError(f"Line {line}: unknown command {name!r}")
+
+        if name == 'Select':
+            target = self.value()
+            return Select(target=target, comment=self.end_of_line())
+        if name in ('Goto', 'GotoPos', 'StartRecording'):
+            params = self.block()
+            node = {'Goto': Goto, 'GotoPos': GotoPos, 'StartRecording': StartRecording}[name]
+            return node(params=params, comment=self.end_of_line())
+        if name == 'SetFOV':
+            fov = self.value()
+            return SetFOV(fov=fov, comment=self.end_of_line())
+        if name == 'SetTimeRate':
+            rate = self.value()
+            return SetTimeRate(rate=rate, comment=self.end_of_line())
+        if name == 'StartFlightPath':
+            return self.flight_path(self.end_of_line())
+        if name in ('AddWaypoint', 'PlayFlightPath'):
+            raise ValueError(f"Line {line}: {name} outside StartFlightPath")
+
+        args, block = [], None
+        while self.peek()[0] not in ('NEWLINE', 'COMMENT'):
+            if self.peek()[1] == '{':
+                block = self.block()
+            else:
+                args.append(self.value())
+        return Command(name=name, args=args, block=block, comment=self.end_of_line())
+
+    def flight_path(self, comment: Optional[str]) -> FlightPath:
+        path = FlightPath(comment=comment)
+        while True:
+            kind, text, line = self.peek()
+            if kind == 'EOF':
+                raise ValueError(f"Line {line}: StartFlightPath without PlayFlightPath")
+            if kind == 'NEWLINE':
+                self.pos += 1
+                path.waypoints.append(Comment())
+            elif kind == 'COMMENT':
+                self.pos += 1
+                self.take('NEWLINE')
+                path.waypoints.append(Comment(text=text[2:].strip()))
+            elif text == 'AddWaypoint':
+                self.pos += 1
+                params = self.block()
+                time = params.pop('Time', 0.0)
+                path.waypoints.append(Waypoint(time=time, params=params, comment=self.end_of_line()))
+            elif text == 'PlayFlightPath':
+                self.pos += 1
+                path.play_comment = self.end_of_line()
+                return path
+            else:
+                raise ValueError(f"Line {line}: expected AddWaypoint or PlayFlightPath, got {text!r}")
+
+    def script(self) -> Script:
+        nodes = []
+        while self.peek()[0] != 'EOF':
+            if self.peek()[0] == 'NEWLINE':
+                self.pos += 1
+                nodes.append(Comment())
+                continue
+            nodes.append(self.statement())
+        return nodes
+
+
+def parse(text: str) -> Script:
+    """Parse SE Script text into IR nodes (raises ValueError on bad syntax)"""
+    return _Parser(text).script()
+
+
+# ============================================
+# Serializer
+# ============================================
+
+def format_value(value: Value) -> str:
+    """Render a value the way SE Script writes it"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, str):
+        return f'"{value}"'
+    if isinstance(value, tuple):
+        return '(' + ', '.join(format_value(v) for v in value) + ')'
+    if float(value).is_integer() and abs(value) < 1e6:
+        return str(int(value))
+    text = f'{value:.9g}'
+    # 1e+13 -> 1e13, 2.5e-05 -> 2.5e-5
+    return re.sub(r'e([-+])0*(\d)', lambda m: f"e{'-' if m.group(1) == '-' else ''}{m.group(2)}", text)
+
+
+def format_block(params: dict) -> str:
+    inner = ' '.join(f'{key} {format_value(value)}' for key, value in params.items())
+    return f'{{ {inner} }}' if inner else '{ }'
+
+
+def _with_comment(line: str, comment: Optional[str]) -> str:
+    return f'{line}  // {comment}' if comment else line
+
+
+def compile_node(node: Node) -> list[str]:
+    """Render one node as script lines"""
+    if isinstance(node, Comment):
+        return [''] if node.text is None else [f'// {node.text}'.rstrip()]
+    if isinstance(node, Select):
+        line = f'Select {format_value(node.target)}'
+    elif isinstance(node, Goto):
+        line = f'Goto {format_block(node.params)}'
+    elif isinstance(node, GotoPos):
+        line = f'GotoPos {format_block(node.params)}'
+    elif isinstance(node, SetFOV):
+        line = f'SetFOV {format_value(node.fov)}'
+    elif isinstance(node, SetTimeRate):
+        line = f'SetTimeRate {format_value(node.rate)}'
+    elif isinstance(node, StartRecording):
+        line = f'StartRecording {format_block(node.params)}'
+    elif isinstance(node, Waypoint):
+        line = f'AddWaypoint {format_block({"Time": node.time, **node.params})}'
+    elif isinstance(node, FlightPath):
+        lines = [_with_comment('StartFlightPath', node.comment)]
+        for waypoint in node.waypoints:
+            lines += compile_node(waypoint)
+        lines.append(_with_comment('PlayFlightPath', node.play_comment))
+        return lines
+    elif isinstance(node, Command):
+        parts = [node.name] + [format_value(arg) for arg in node.args]
+        if node.block is not None:
+            parts.append(format_block(node.block))
+        line = ' '.join(parts)
+    else:
+        raise TypeError(f"Unknown SE Script node: {node!r}")
+    return [_with_comment(line, node.comment)]
+
+
+def compile_script(script: Script) -> str:
+    """Serialize IR nodes back to SE Script text"""
+    lines = []
+    for node in script:
+        lines += compile_node(node)
+    return '\n'.join(lines).strip('\n') + '\n'
+
+
+# ============================================
+# Transforms
+# ============================================
+
+def find(script: Script, node_type: type) -> list:
+    """All top-level nodes of a type"""
+    return [node for node in script if isinstance(node, node_type)]
+
+
+def set_fov(script: Script, fov: float) -> Script:
+    """Set the camera field of view, adding SetFOV if the script has none"""
+    nodes = find(script, SetFOV)
+    for node in nodes:
+        node.fov = fov
+    if not nodes:
+        script.insert(_setup_index(script), SetFOV(fov=fov))
+    return script
+
+
+def set_exposure(script: Script, exposure: float) -> Script:
+    """Set rendering exposure, adding SetExposure if the script has none"""
+    nodes = [n for n in find(script, Command) if n.name == 'SetExposure']
+    for node in nodes:
+        node.args = [exposure]
+    if not nodes:
+        script.insert(_setup_index(script), Command(name='SetExposure', args=[exposure]))
+    return script
+
+
+def set_resolution(script: Script, width: int, height: int, fps: Optional[int] = None) -> Script:
+    """Set the StartRecording output size (and frame rate)"""
+    for node in find(script, StartRecording):
+        node.params['Width'] = width
+        node.params['Height'] = height
+        if fps:
+            node.params['FPS'] = fps
+    return script
+
+
+def rescale_duration(script: Script, duration: float) -> Script:
+    """Stretch flight paths and recording length to a new duration"""
+    recordings = find(script, StartRecording)
+    paths = find(script, FlightPath)
+
+    current = next((r.params['Duration'] for r in recordings if 'Duration' in r.params), None)
+    if current is None:
+        current = max((p.duration for p in paths), default=0.0)
+
+    if current:
+        scale = duration / current
+        for path in paths:
+            for waypoint in path.waypoints:
+                if isinstance(waypoint, Waypoint):
+                    waypoint.time = round(waypoint.time * scale, 3)
+
+    for node in recordings:
+        node.params['Duration'] = duration
+    return script
+
+
+def _setup_index(script: Script) -> int:
+    """Position for new camera settings: before the first flight path / recording"""
+    for i, node in enumerate(script):
+        if isinstance(node, (FlightPath, StartRecording)):
+            return i
+    return len(script)
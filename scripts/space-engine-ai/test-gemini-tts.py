@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Quick test of Gemini TTS API for podcast generation.
+This bypasses all the TypeScript complexity.
+"""
+
+from pathlib import Path
+
+import http_transport
+from gemini_tts import synthesize_to_wav, SegmentCache, SAMPLE_RATE, SAMPLE_WIDTH
+
+def test_gemini_tts():
+    """Test the Gemini TTS API with a simple multi-speaker prompt."""
+    
+    print("🎙️ Testing Gemini Multi-Speaker TTS...")
+    
+    # Simple test transcript
+    transcript = """Alex: Hey Jessica, welcome to AI Deep Dive! Today we're talking about the latest in AI news.
+Jessica: Thanks Alex! I'm excited to dive in. What's the big story today?
+Alex: Well, Apple just announced they're partnering with Google to bring Gemini to Siri.
+Jessica: Wow, that's huge! How do you think that will change the assistant landscape?
+Alex: It could be a game-changer. Siri has always been behind, but with Gemini's capabilities...
+Jessica: Right, it finally might be competitive. What else is happening?
+Alex: Tech CEOs were at Davos this week, and AI was the dominant topic.
+Jessica: Not surprising. It seems like everyone wants to talk about AI these days.
+Alex: Exactly. That's all for today's quick update!
+Jessica: Thanks for listening everyone. See you next time on AI Deep Dive with Alex and Jessica!"""
+
+    voices = {"Alex": "Kore", "Jessica": "Puck"}
+    
+    print(f"  Sending request to Gemini TTS...")
+    
+    def progress(index, total, cached):
+        print(f"  Chunk {index + 1}/{total} {'(cached)' if cached else 'done'}")
+    
+    try:
+        # Unchanged chunks come from the segment cache on reruns
+        # and audio is streamed straight into the WAV file
+        wav_path = Path(__file__).parent / "temp" / "test-gemini-tts.wav"
+        size = synthesize_to_wav(wav_path, transcript, voices, cache=SegmentCache(), on_chunk=progress)
+        
+        print(f"✅ Audio saved to: {wav_path}")
+        print(f"   Size: {size / 1024:.1f} KB")
+        print(f"   Duration: ~{size / (SAMPLE_RATE * SAMPLE_WIDTH):.1f} seconds")
+        print(f"   {http_transport.metrics.summary()}")
+        print(f"\n🎉 SUCCESS! Play the file to hear NotebookLM-quality audio!")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return False
+
+if __name__ == "__main__":
+    test_gemini_tts()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the Space Engine executable
+
+Emulates just enough of SE for SpaceEngineController's session logic. The
+window, its screen and the keyboard are files in $STANDIN_DIR, driven by
+StandInDesktop (tests/test_gui_automation.py):
+
+- window     pid of the program while it runs (a killed one leaves it behind)
+- frame      grey level (0-255) currently on screen
+- keys       keys pressed, one per line (`command <text>` for typed commands)
+- recordings F9 starts writing a growing capture_*.mp4 here, F9 again stops
+"""
+
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+
+STATE_DIR = Path(os.environ['STANDIN_DIR'])
+RECORDINGS_DIR = STATE_DIR / "recordings"
+TICK = 0.02  # Seconds between steps of the main loop
+LOAD_SECONDS = 0.3  # How long the screen keeps redrawing after a `run` command
+RECORD_BYTES = 16 * 1024  # Written to the capture each tick
+
+SCENE, CONSOLE, SETTINGS = 40, 120, 200
+
+
+def show(level: int):
+    frame = STATE_DIR / "frame.tmp"
+    frame.write_text(str(level))
+    os.replace(frame, STATE_DIR / "frame")
+
+
+def main():
+    signal.signal(signal.SIGTERM, lambda signum, stack: sys.exit(0))
+    RECORDINGS_DIR.mkdir(parents=True, exist_ok=True)
+    keys = STATE_DIR / "keys"
+    keys.touch()
+    show(SCENE)
+
+    console = False
+    loading_until = 0.0
+    capture = None
+    try:
+        with open(keys) as presses:
+            presses.seek(0, os.SEEK_END)  # Only keys pressed in this session
+            # The window appears once keys can be received
+            (STATE_DIR / "window").write_text(str(os.getpid()))
+            while True:
+                for line in presses.readlines():
+                    key = line.strip()
+                    if key == '`':
+                        console = not console
+                        show(CONSOLE if console else SCENE)
+                    elif key == 'enter' and console:
+                        loading_until = time.monotonic() + LOAD_SECONDS
+                    elif key == 'f2':
+                        show(SETTINGS)
+                    elif key == 'escape':
+                        show(CONSOLE if console else SCENE)
+                    elif key == 'f9' and capture is None:
+                        capture = open(RECORDINGS_DIR / f"capture_{time.time_ns()}.mp4", 'wb')
+                    elif key == 'f9':
+                        capture.close()
+                        capture = None
+
+                if time.monotonic() < loading_until:
+                    show(int(time.monotonic() * 1000) % 256)  # Script redrawing the scene
+                elif loading_until:
+                    loading_until = 0.0
+                    show(CONSOLE if console else SCENE)
+
+                if capture:
+                    capture.write(b'\0' * RECORD_BYTES)
+                    capture.flush()
+                time.sleep(TICK)
+    finally:
+        (STATE_DIR / "window").unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from ai_composer import AIComposer
+
+SCRIPT = 'Select "Milky Way/Sun"\nStartRecording { Width 1920 Height 1080 FPS 30 Duration 10 }\n'
+
+
+class FakeAsyncOpenAI:
+    """Stand-in for openai.AsyncOpenAI: answers chat completions in-process"""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.loop = None
+        self.closed = False
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def __aenter__(self):
+        self.loop = asyncio.get_running_loop()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.closed = True
+
+    async def create(self, model, messages, temperature, **kwargs):
+        assert asyncio.get_running_loop() is self.loop
+        prompt = messages[-1]['content']
+        self.requests.append(prompt)
+        content = await self.answer(prompt)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+                               usage=SimpleNamespace(prompt_tokens=10, completion_tokens=20))
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """Route the composer's async client to FakeAsyncOpenAI instances"""
+    clients = []
+
+    def install(answer):
+        def init(self):
+            clients.append(FakeAsyncOpenAI(answer))
+            return clients[-1]
+        monkeypatch.setattr(AIComposer, '_init_async_client', init)
+        return clients
+
+    return install
+
+
+def composer() -> AIComposer:
+    composer = AIComposer(use_cache=False)
+    composer.provider = 'openai'
+    return composer
+
+
+def test_each_call_gets_its_own_client(provider):
+    async def answer(prompt):
+        return SCRIPT
+    clients = provider(answer)
+    ai = composer()
+
+    # Separate asyncio.run calls mean separate event loops
+    assert asyncio.run(ai.afrom_prompt("first")) == SCRIPT
+    assert asyncio.run(ai.agenerate_many(["a", "b", "c"])) == [SCRIPT] * 3
+
+    assert len(clients) == 2
+    assert all(client.closed for client in clients)
+    assert clients[1].requests == ["a", "b", "c"]
+
+
+def test_failure_cancels_sibling_requests(provider):
+    cancelled = []
+
+    async def answer(prompt):
+        if prompt == "bad":
+            raise RuntimeError("provider error")
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.append(prompt)
+            raise
+        return SCRIPT
+    clients = provider(answer)
+
+    async def run():
+        with pytest.raises(RuntimeError, match="provider error"):
+            await asyncio.wait_for(composer().agenerate_many(["slow", "bad", "slower"]), 5)
+        return sorted(cancelled)  # Before asyncio.run() tears down leftover tasks
+
+    assert asyncio.run(run()) == ["slow", "slower"]
+    assert clients[0].closed
+
+
+def test_results_keep_input_order(provider):
+    async def answer(prompt):
+        await asyncio.sleep(0.01 * (3 - int(prompt)))
+        return prompt
+    provider(answer)
+
+    assert asyncio.run(composer().agenerate_many(["0", "1", "2"], concurrency=3)) == ["0", "1", "2"]
+
+
+def test_streamed_and_unvalidated_responses_are_cached_apart(tmp_path, monkeypatch):
+    import cache
+    ai = composer()
+    ai.cache = cache.DiskCache(tmp_path / "ai_responses.json")
+    ai.__dict__['client'] = object()  # Any configured client; requests are faked below
+    unchecked = 'Frobnicate 3\n' + SCRIPT
+    monkeypatch.setattr(ai, '_complete', lambda system_prompt, prompt: unchecked)
+    monkeypatch.setattr(ai, '_stream_chunks', lambda system_prompt, prompt: (c for c in [unchecked]))
+
+    assert ai.from_prompt("pulsar", stream=False) == unchecked
+
+    # The cached unvalidated script must not satisfy a validating request
+    with pytest.raises(ValueError, match="Unknown command: Frobnicate"):
+        ai.from_prompt("pulsar", stream=True)
+    assert ai.from_prompt("pulsar", stream=False) == unchecked
+
+
+class FakeOpenAIStream:
+    """Chat completion chunks as sent with stream_options={"include_usage": True}"""
+
+    def __init__(self, text, **kwargs):
+        assert kwargs['stream_options'] == {"include_usage": True}
+        self.chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=line))],
+                                       usage=None)
+                       for line in text.splitlines(keepends=True)]
+        self.chunks.append(SimpleNamespace(
+            choices=[], usage=SimpleNamespace(prompt_tokens=12, completion_tokens=34)))
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAnthropicStream:
+    """MessageStream events: message_start, text, then the final message_delta"""
+
+    def __init__(self, text, **kwargs):
+        usage = SimpleNamespace(input_tokens=56, output_tokens=1)
+        self.events = [SimpleNamespace(type='message_start', message=SimpleNamespace(usage=usage))]
+        self.events += [SimpleNamespace(type='text', text=line)
+                        for line in text.splitlines(keepends=True)]
+        self.events.append(SimpleNamespace(type='message_delta',
+                                           usage=SimpleNamespace(output_tokens=78)))
+
+    def __enter__(self):
+        return iter(self.events)
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+@pytest.mark.parametrize('name, client, tokens', [
+    ('openai', SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        create=lambda **kwargs: FakeOpenAIStream(SCRIPT + 'Wait 1\n', **kwargs)))), (12, 34)),
+    ('anthropic', SimpleNamespace(messages=SimpleNamespace(
+        stream=lambda **kwargs: FakeAnthropicStream(SCRIPT, **kwargs))), (56, 78)),
+])
+def test_streamed_calls_record_token_counts(name, client, tokens):
+    from tracing import tracer
+    tracer.reset()
+    ai = AIComposer(use_cache=False)
+    ai.provider = name
+    ai.__dict__['client'] = client
+
+    assert ''.join(ai._stream_chunks("system", "pulsar")).startswith(SCRIPT)
+
+    span, = [span for span in tracer.spans if span.name == 'ai.stream']
+    assert (span.attributes['input_tokens'], span.attributes['output_tokens']) == tokens
+    assert 'error' not in span.attributes
+
+
+def test_stream_closed_early_is_not_an_error():
+    from tracing import tracer
+    tracer.reset()
+    stream = FakeOpenAIStream(SCRIPT + 'Wait 1\n' * 50, stream_options={"include_usage": True})
+    ai = composer()
+    ai.__dict__['client'] = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        create=lambda **kwargs: stream)))
+
+    assert ai.from_prompt("pulsar", stream=True) == SCRIPT
+
+    span, = [span for span in tracer.spans if span.name == 'ai.stream']
+    assert stream.closed
+    assert span.attributes['stopped_early'] and 'error' not in span.attributes
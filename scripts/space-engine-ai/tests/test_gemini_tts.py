@@ -0,0 +1,174 @@
+import array
+import base64
+import json
+import time
+import wave
+
+import httpx
+import pytest
+
+import gemini_tts
+import http_transport
+
+SAMPLES_PER_CHAR = 20  # Length of the stand-in's speech
+
+
+def speech(text: str) -> bytes:
+    """PCM the stand-in returns for text: a constant level per request"""
+    return array.array("h", [1000] * (len(text) * SAMPLES_PER_CHAR)).tobytes()
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Stand-in for the generateContent endpoint; returns the texts it was sent"""
+    requests = []
+
+    def handler(request):
+        text = json.loads(request.content)["contents"][0]["parts"][0]["text"]
+        requests.append(text)
+        if text.startswith("Alex: Line 0 "):
+            time.sleep(0.2)  # Later chunks finish first and wait to be stitched
+        audio = base64.b64encode(speech(text)).decode()
+        body = {"candidates": [{"content": {"parts": [
+            {"inlineData": {"mimeType": "audio/L16;codec=pcm;rate=24000", "data": audio}}
+        ]}}]}
+        # Escape "/" the way some JSON encoders do
+        return httpx.Response(200, content=json.dumps(body).replace("/", "\\/").encode())
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(http_transport, 'client', lambda: client)
+    monkeypatch.setattr(gemini_tts, 'STREAM_BLOCK_BYTES', 1000)  # Many blocks per response
+    yield requests
+    client.close()
+
+
+def transcript(lines: int, edit: int = None) -> str:
+    speakers = ["Alex", "Jessica"]
+    return "\n".join(
+        f"{speakers[i % 2]}: {'Edited' if i == edit else 'Line'} {i} of the episode, "
+        f"with a few more words to say."
+        for i in range(lines)
+    )
+
+
+VOICES = {"Alex": "Kore", "Jessica": "Puck"}
+
+
+def test_chunks_end_at_anchors_or_the_budget():
+    turns = gemini_tts.parse_transcript(transcript(200))
+    max_tokens = 100
+
+    chunks = gemini_tts.chunk_turns(turns, max_tokens)
+
+    assert [turn for chunk in chunks for turn in chunk] == turns
+    for chunk, following in zip(chunks, chunks[1:]):
+        used = sum(gemini_tts.estimate_tokens(turn.line()) for turn in chunk)
+        assert used <= max_tokens
+        at_anchor = (used >= max_tokens * gemini_tts.CHUNK_MIN_FILL
+                     and gemini_tts._is_anchor(chunk[-1]))
+        full = used + gemini_tts.estimate_tokens(following[0].line()) > max_tokens
+        assert at_anchor or full
+    assert any(gemini_tts._is_anchor(chunk[-1]) for chunk in chunks[:-1])
+
+
+def test_edit_only_moves_nearby_chunks():
+    before = gemini_tts.chunk_turns(gemini_tts.parse_transcript(transcript(200)), 100)
+    after = gemini_tts.chunk_turns(gemini_tts.parse_transcript(transcript(200, edit=100)), 100)
+
+    changed = [chunk for chunk in after if chunk not in before]
+    assert 1 <= len(changed) <= 3
+
+
+def test_decode_inline_audio_across_blocks():
+    pcm = bytes(range(256)) * 40
+    body = json.dumps({"inlineData": {"data": base64.b64encode(pcm).decode()}})
+    body = body.replace("/", "\\/").encode()
+    out = bytearray()
+
+    # Blocks split the key, the escapes and the base64 quanta at odd offsets
+    blocks = [body[i:i + 7] for i in range(0, len(body), 7)]
+
+    assert gemini_tts.decode_inline_audio(blocks, out.extend) == len(pcm)
+    assert bytes(out) == pcm
+
+
+def test_decode_inline_audio_truncated_response():
+    body = json.dumps({"inlineData": {"data": base64.b64encode(b"\0" * 300).decode()}})
+
+    with pytest.raises(RuntimeError, match="ended inside the audio"):
+        gemini_tts.decode_inline_audio([body[:-10].encode()], bytearray().extend)
+
+
+def test_wav_is_stitched_chunks_minus_crossfades(api, tmp_path):
+    path = tmp_path / "episode.wav"
+    script = transcript(40)
+
+    size = gemini_tts.synthesize_to_wav(path, script, VOICES, max_tokens=100, concurrency=3)
+
+    chunks = gemini_tts.chunk_turns(gemini_tts.parse_transcript(script), 100)
+    assert len(api) == len(chunks) > 1
+    overlap = gemini_tts.SAMPLE_RATE * gemini_tts.CROSSFADE_MS // 1000
+    samples = sum(len(text) * SAMPLES_PER_CHAR for text in api) - overlap * (len(chunks) - 1)
+    assert size == samples * gemini_tts.SAMPLE_WIDTH
+    with wave.open(str(path)) as wav:
+        assert wav.getnframes() == samples
+        assert wav.getframerate() == gemini_tts.SAMPLE_RATE
+
+
+def test_cached_segments_are_reused(api, tmp_path):
+    cache = gemini_tts.SegmentCache(tmp_path / "cache")
+    script = transcript(40)
+
+    first = gemini_tts.synthesize(script, VOICES, max_tokens=100, cache=cache)
+    requested = len(api)
+    cached = []
+    second = gemini_tts.synthesize(script, VOICES, max_tokens=100, cache=cache,
+                                   on_chunk=lambda index, total, hit: cached.append(hit))
+
+    assert len(api) == requested  # Nothing sent again
+    assert cached and all(cached)
+    assert second == first
+
+
+def test_edit_resynthesizes_only_nearby_chunks(api, tmp_path):
+    cache = gemini_tts.SegmentCache(tmp_path / "cache")
+    gemini_tts.synthesize(transcript(200), VOICES, max_tokens=100, cache=cache)
+    api.clear()
+
+    gemini_tts.synthesize(transcript(200, edit=100), VOICES, max_tokens=100, cache=cache)
+
+    assert any("Edited 100" in text for text in api)
+    total = len(gemini_tts.chunk_turns(gemini_tts.parse_transcript(transcript(200)), 100))
+    assert len(api) <= 5 < total
+
+
+def test_cache_smaller_than_the_episode(api, tmp_path):
+    script = transcript(40)
+    expected = gemini_tts.synthesize(script, VOICES, max_tokens=100)
+    cache = gemini_tts.SegmentCache(tmp_path / "cache", max_bytes=30_000)
+
+    assert gemini_tts.synthesize(script, VOICES, max_tokens=100, cache=cache,
+                                 concurrency=4) == expected
+
+    # The run's chunks were kept past the limit, and are evicted by the next put
+    assert sum(p.stat().st_size for p in cache.root.glob("*.pcm")) > cache.max_bytes
+    other = tmp_path / "other.pcm"
+    other.write_bytes(b"\0" * 10)
+    cache.put("other", other)
+    assert sum(p.stat().st_size for p in cache.root.glob("*.pcm")) <= cache.max_bytes
+
+
+def test_segment_removed_by_another_process_is_resynthesized(api, tmp_path):
+    script = transcript(40)
+    expected = gemini_tts.synthesize(script, VOICES, max_tokens=100)
+    requested = len(api)
+    cache = gemini_tts.SegmentCache(tmp_path / "cache")
+
+    def evict(index, total, cached):
+        if index > 0:
+            for path in cache.root.glob("*.pcm"):
+                path.unlink(missing_ok=True)
+
+    assert gemini_tts.synthesize(script, VOICES, max_tokens=100, cache=cache,
+                                 concurrency=4, on_chunk=evict) == expected
+    assert len(api) > 2 * requested
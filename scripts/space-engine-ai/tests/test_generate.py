@@ -0,0 +1,96 @@
+import shutil
+from functools import partial
+
+import pytest
+from click.testing import CliRunner
+
+import artifacts
+import config
+import gui_automation
+import main
+import video_pipeline
+
+
+class FakeController:
+    """Hands over a prepared clip as if Space Engine had just recorded it"""
+
+    clip = None
+
+    def launch(self):
+        return True
+
+    def load_script(self, script_path):
+        return True
+
+    def configure_recording(self, resolution, duration):
+        pass
+
+    def start_recording(self, duration, on_start=None):
+        recording = self.recordings / f"capture{self.clip.suffix}"
+        shutil.copyfile(self.clip, recording)
+        if on_start:
+            on_start(recording)
+        return recording
+
+
+@pytest.fixture
+def generate(tmp_path, output_dir, monkeypatch):
+    """Run `main.py generate` against FakeController, returning the stored artifacts dir"""
+    store = tmp_path / "artifacts"
+    FakeController.recordings = tmp_path / "recordings"
+    FakeController.recordings.mkdir()
+    monkeypatch.setattr(main, 'OUTPUT_DIR', output_dir)
+    monkeypatch.setattr(artifacts, 'ArtifactStore', partial(artifacts.ArtifactStore, store))
+    monkeypatch.setattr(gui_automation, 'SpaceEngineController', FakeController)
+
+    def run(clip, *args):
+        FakeController.clip = clip
+        monkeypatch.setattr(config, 'RECORDING_SUFFIXES', (clip.suffix,))
+        result = CliRunner().invoke(main.cli, ['generate', '-t', 'black_hole', '-d', '2',
+                                               '-o', 'final.mp4', *args])
+        assert result.exit_code == 0, result.output
+        return store, ' '.join(result.output.split())  # Undo console wrapping
+
+    return run
+
+
+def test_live_encode_of_a_streamable_recording(make_clip, generate, output_dir):
+    clip = make_clip("clip.mkv", duration=2)
+
+    store, output = generate(clip, '--live')
+
+    assert "Finishing live encode" in output
+    assert (output_dir / "final.mp4").exists()
+    recordings = list((store / "recording").glob("*"))
+    assert [path.suffix for path in recordings] == ['.mkv']
+
+    # A rerun finds the stored .mkv recording and video
+    store, output = generate(clip, '--live')
+    assert "Resuming: video already rendered" in output
+
+
+def test_live_falls_back_for_regular_mp4(make_clip, generate, output_dir, monkeypatch):
+    monkeypatch.setattr(video_pipeline.VideoProcessor, 'process_live',
+                        lambda *args, **kwargs: pytest.fail("MP4 cannot be encoded live"))
+    clip = make_clip("clip.mp4", duration=2)
+
+    store, output = generate(clip, '--live')
+
+    assert "encoding after the capture instead" in output
+    assert "Post-processing" in output
+    assert (output_dir / "final.mp4").exists()
+
+
+def test_failed_live_encode_falls_back_to_process(make_clip, generate, output_dir, monkeypatch):
+    def broken(self, recording_path, output_path, finished, audio_path=None, drained=None):
+        raise RuntimeError("FFmpeg could not read the stream")
+
+    monkeypatch.setattr(video_pipeline.VideoProcessor, 'process_live', broken)
+    clip = make_clip("clip.mkv", duration=2)
+
+    store, output = generate(clip, '--live')
+
+    assert "Live encode failed" in output
+    assert "Post-processing" in output
+    assert (output_dir / "final.mp4").exists()
+    assert [path.suffix for path in (store / "recording").glob("*")] == ['.mkv']
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import gui_automation
+from gui_automation import SpaceEngineController
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def frame(value: int):
+    return Image.new('L', (160, 90), value)
+
+
+@pytest.fixture
+def screen(monkeypatch):
+    """A fake window whose contents follow a timeline from the last key press
+
+    timeline maps seconds since the press to a frame value (or a callable
+    of the poll count, for flicker).
+    """
+    pressed = []
+    state = SimpleNamespace(timeline=[(0, 0)], pressed_at=None, polls=0)
+
+    def press(key):
+        pressed.append(key)
+        state.pressed_at = time.monotonic()
+
+    def grab(self):
+        state.polls += 1
+        if state.pressed_at is None:
+            return frame(0)
+        elapsed = time.monotonic() - state.pressed_at
+        value = [v for t, v in state.timeline if elapsed >= t][-1]
+        return frame(value(state.polls) if callable(value) else value)
+
+    monkeypatch.setattr(gui_automation, 'pyautogui', SimpleNamespace(press=press))
+    monkeypatch.setattr(SpaceEngineController, '_grab', grab)
+    state.pressed = pressed
+    return state
+
+
+def test_waits_past_the_first_redraw(screen):
+    # Console opens at once, the script then redraws for 0.6 s before settling
+    screen.timeline = [(0, 0), (0.05, 120), (0.2, lambda n: 40 + 60 * (n % 2)), (0.8, 200)]
+
+    started = time.monotonic()
+    assert SpaceEngineController()._press_and_wait('enter', timeout=5, min_settle=0.1)
+
+    assert time.monotonic() - started >= 0.8
+    assert screen.pressed == ['enter']
+
+
+def test_minimum_settle_time(screen):
+    screen.timeline = [(0, 0), (0.01, 120)]
+
+    started = time.monotonic()
+    assert SpaceEngineController()._press_and_wait('`', timeout=5, min_settle=0.5)
+
+    assert time.monotonic() - started >= 0.5
+
+
+def test_no_end_state_times_out(screen):
+    screen.timeline = [(0, lambda n: 255 * (n % 2))]
+
+    assert not SpaceEngineController()._press_and_wait('f2', timeout=0.5)
+
+
+def test_no_reaction_times_out(screen):
+    assert not SpaceEngineController()._press_and_wait('f2', timeout=0.5)
+
+
+class StandInDesktop(gui_automation.Desktop):
+    """Drives tests/standin_se.py through the files in its state directory"""
+
+    has_input = True
+    has_windows = True
+
+    def __init__(self, state_dir: Path):
+        self.state_dir = state_dir
+
+    def find_window(self):
+        # Like a real window, it is gone once its process is (a killed
+        # stand-in cannot remove its window file)
+        try:
+            pid = int((self.state_dir / "window").read_text())
+            os.kill(pid, 0)
+        except (FileNotFoundError, ValueError, ProcessLookupError):
+            return None
+        return SimpleNamespace(title=f"SpaceEngine (stand-in, pid {pid})")
+
+    def activate(self, window):
+        pass
+
+    def press(self, key: str):
+        with open(self.state_dir / "keys", 'a') as keys:
+            keys.write(f"{key}\n")
+
+    def enter_command(self, command: str):
+        self.press(f"command {command}")
+
+    def capture(self, window=None):
+        try:
+            level = int((self.state_dir / "frame").read_text())
+        except (FileNotFoundError, ValueError):
+            level = 0
+        return frame(level)
+
+    def screenshot(self):
+        return self.capture()
+
+
+@pytest.fixture
+def standin(tmp_path, monkeypatch):
+    """A controller whose Space Engine is the stand-in program"""
+    monkeypatch.setenv('STANDIN_DIR', str(tmp_path))
+    monkeypatch.setattr(gui_automation, 'RECORDINGS_DIR', tmp_path / "recordings")
+    monkeypatch.setattr(gui_automation, 'RECORDING_HEALTH_INTERVAL', 0.1)
+    executable = Path(__file__).with_name("standin_se.py")
+    return SpaceEngineController(executable, desktop=StandInDesktop(tmp_path))
+
+
+def test_run_scene_records_with_the_standin(standin, tmp_path):
+    with standin as se:
+        recording = se.run_scene(tmp_path / "scene.se", "1920x1080", 1)
+
+    assert recording.parent == tmp_path / "recordings"
+    assert recording.stat().st_size > 0
+    assert se.restarts == 0
+    keys = (tmp_path / "keys").read_text().splitlines()
+    assert keys == ['`', f'command run "{tmp_path / "scene.se"}"', 'enter', '`',
+                    'f2', 'escape', 'f9', 'f9']
+
+
+def test_run_scene_retries_after_a_crash(standin, tmp_path):
+    recordings = tmp_path / "recordings"
+
+    def crash_during_capture(process):
+        # Kill SE as soon as the first capture starts growing
+        assert gui_automation.wait_until(lambda: any(recordings.glob("*.mp4")), 30)
+        process.kill()
+
+    with standin as se:
+        first = se.process
+        killer = threading.Thread(target=crash_during_capture, args=(first,))
+        killer.start()
+        recording = se.run_scene(tmp_path / "scene.se", "1920x1080", 1)
+        killer.join()
+
+    assert se.restarts == 1
+    assert first.returncode is not None
+    captures = sorted(recordings.glob("*.mp4"))
+    assert len(captures) == 2
+    assert recording == captures[1]  # The retry's capture, not the crashed one
+    assert recording.stat().st_size > 0
@@ -0,0 +1,66 @@
+import asyncio
+
+import httpx
+import pytest
+
+import http_transport
+
+
+def flaky(error, failures=1):
+    """A MockTransport handler failing with error for the first few attempts"""
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        if len(calls) <= failures:
+            raise error("connection dropped", request=request)
+        return httpx.Response(200, json={'ok': True})
+
+    return handler, calls
+
+
+def sync_client(handler) -> httpx.Client:
+    transport = http_transport.RetryTransport(max_retries=2)
+    transport._inner = httpx.MockTransport(handler)
+    return httpx.Client(transport=transport)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(http_transport, 'backoff', lambda attempt, requested=None: 0)
+
+
+@pytest.mark.parametrize('method', ['GET', 'POST'])
+def test_connect_errors_are_retried_for_any_method(method):
+    handler, calls = flaky(httpx.ConnectError)
+    with sync_client(handler) as client:
+        assert client.request(method, 'https://api.example/v1').status_code == 200
+    assert calls == [method, method]
+
+
+def test_dropped_post_is_not_replayed():
+    handler, calls = flaky(httpx.RemoteProtocolError)
+    with sync_client(handler) as client, pytest.raises(httpx.RemoteProtocolError):
+        client.post('https://api.example/v1', json={'prompt': 'once'})
+    assert calls == ['POST']
+
+
+def test_dropped_get_is_replayed():
+    handler, calls = flaky(httpx.RemoteProtocolError)
+    with sync_client(handler) as client:
+        assert client.get('https://api.example/v1').status_code == 200
+    assert calls == ['GET', 'GET']
+
+
+def test_async_transport_does_not_replay_dropped_post():
+    handler, calls = flaky(httpx.RemoteProtocolError)
+
+    async def post():
+        transport = http_transport.AsyncRetryTransport(max_retries=2)
+        transport._inner = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            await client.post('https://api.example/v1', json={'prompt': 'once'})
+
+    with pytest.raises(httpx.RemoteProtocolError):
+        asyncio.run(post())
+    assert calls == ['POST']
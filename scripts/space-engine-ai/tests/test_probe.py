@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+import probe
+import video_pipeline
+
+
+def test_probe_reads_metadata_only(make_clip, output_dir):
+    clip = make_clip(duration=2, fps=30)
+
+    info = probe.probe(clip)
+
+    assert info.fps == 30
+    assert (info.width, info.height) == (320, 180)
+    assert abs(info.duration - 2) < 0.1
+    cached = json.loads((output_dir / ".cache" / "probe.json").read_text())
+    assert all('keyframes' not in str(entry) for entry in cached.values())
+
+
+def test_probe_ignores_entries_with_keyframes(make_clip, output_dir):
+    clip = make_clip(duration=2)
+    probe._cache.put(probe._file_key(clip), {'duration': 2.0, 'keyframes': [0.0]})
+
+    assert probe.probe(clip).duration > 0
+
+
+def test_keyframes(make_clip):
+    clip = make_clip(duration=3, fps=30, args=('-g', '30', '-sc_threshold', '0'))
+
+    assert probe.keyframes(clip) == [0.0, 1.0, 2.0]
+
+
+def test_eta_does_not_read_keyframes(make_clip, output_dir, monkeypatch):
+    clip = make_clip(duration=2)
+    monkeypatch.setattr(video_pipeline, 'keyframes', lambda path: pytest.fail("keyframes read"))
+
+    assert abs(video_pipeline.FFmpegPipeline('ffmpeg', clip).expected_duration() - 2) < 0.1
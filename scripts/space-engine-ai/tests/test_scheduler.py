@@ -0,0 +1,159 @@
+import shutil
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+import pytest
+
+import scheduler as scheduler_module
+from scheduler import BatchScheduler, CapturePipeline, Scene, load_scenes
+
+
+class FakeComposer:
+    def from_template(self, template, duration=600, **params):
+        return f"// {template}\nStartRecording {{ Duration {duration} }}\n"
+
+    def from_prompt(self, prompt, duration=600):
+        return f"// {prompt}\nStartRecording {{ Duration {duration} }}\n"
+
+    def adjust_script(self, script, duration=None, resolution=None):
+        if 'unparseable' in script:
+            raise ValueError("Unknown command: Frobnicate")
+        return script
+
+
+class FakeController:
+    """Writes a small file per scene in place of a Space Engine recording"""
+
+    def __init__(self, recordings: Path):
+        self.recordings = recordings
+        self.recorded = []
+
+    def run_scene(self, script_path, resolution, duration):
+        self.recorded.append(script_path.stem)
+        self.recordings.mkdir(parents=True, exist_ok=True)
+        raw = self.recordings / f"{script_path.stem}.mp4"
+        if script_path.stem != 'vanished':
+            raw.write_bytes(b'\0' * 1024)
+        return raw
+
+
+class FakeProcessor:
+    def process(self, raw_video, output_path):
+        if raw_video.stem == 'broken':
+            raise RuntimeError("FFmpeg failed")
+        shutil.copyfile(raw_video, output_path)
+        return output_path
+
+
+@pytest.fixture
+def scheduler(tmp_path, output_dir):
+    controller = FakeController(tmp_path / "recordings")
+    return BatchScheduler(FakeComposer(), controller, FakeProcessor(),
+                          script_workers=2, postprocess_workers=2)
+
+
+def test_invalid_scenes_fail_alone(scheduler, output_dir):
+    specs = [
+        {'name': 'first', 'template': 'black_hole', 'duration': 10, 'params': {'distance': 5}},
+        {'name': 'no_source', 'duration': 10},
+        {'name': 'bad_resolution', 'prompt': 'nebula', 'resolution': '3k'},
+        {'name': 'bad_duration', 'prompt': 'nebula', 'duration': 'long'},
+        'not a scene',
+        {'name': 'last', 'prompt': 'pulsar', 'duration': 10},
+    ]
+    scenes = [Scene(i, spec) for i, spec in enumerate(specs)]
+
+    results = scheduler.run(scenes)
+
+    assert results[0] == output_dir / "first_4k_10s.mp4" and results[0].exists()
+    assert results[5] == output_dir / "last_4k_10s.mp4" and results[5].exists()
+    for result in results[1:5]:
+        assert isinstance(result, ValueError)
+    assert "needs a template or prompt" in str(results[1])
+    assert "unknown resolution" in str(results[2])
+    assert "invalid duration" in str(results[3])
+    assert scheduler.controller.recorded == ['first', 'last']
+
+
+def test_clashing_scenes_fail_alone(scheduler, output_dir):
+    scenes = load_scenes([
+        {'name': 'orbit', 'prompt': 'quasar', 'duration': 10},
+        {'name': 'orbit', 'prompt': 'pulsar', 'duration': 10},
+        {'name': 'other', 'prompt': 'comet', 'duration': 10, 'output': 'orbit_4k_10s.mp4'},
+        {'name': 'orbit', 'duration': 10},  # Invalid anyway; reported as such
+        {'name': 'last', 'prompt': 'nebula', 'duration': 10},
+    ])
+
+    results = scheduler.run(scenes)
+
+    assert results[0] == output_dir / "orbit_4k_10s.mp4"
+    assert "reuses the name 'orbit' of scene 1" in str(results[1])
+    assert "same output as scene 'orbit'" in str(results[2])
+    assert "needs a template or prompt" in str(results[3])
+    assert results[4] == output_dir / "last_4k_10s.mp4"
+    assert scheduler.controller.recorded == ['orbit', 'last']
+    assert sorted(p.name for p in output_dir.glob("*.se")) == ['last.se', 'orbit.se']
+
+
+def test_raw_recordings_are_removed_once_published(scheduler, tmp_path):
+    scenes = [Scene(0, {'name': 'kept', 'prompt': 'quasar', 'duration': 10}),
+              Scene(1, {'name': 'broken', 'prompt': 'magnetar', 'duration': 10})]
+
+    results = scheduler.run(scenes)
+
+    assert results[0].exists()
+    assert isinstance(results[1], RuntimeError)
+    recordings = tmp_path / "recordings"
+    assert not (recordings / "kept.mp4").exists()
+    assert (recordings / "broken.mp4").exists()  # Kept for another attempt
+
+
+def test_missing_recording_fails_only_its_scene(scheduler):
+    scenes = [Scene(0, {'name': 'vanished', 'prompt': 'comet', 'duration': 10}),
+              Scene(1, {'name': 'after', 'prompt': 'comet', 'duration': 10})]
+
+    results = scheduler.run(scenes)
+
+    assert isinstance(results[0], FileNotFoundError)
+    assert results[1].exists()
+
+
+def test_unparseable_script_is_used_unchanged(scheduler, output_dir):
+    scenes = [Scene(0, {'name': 'odd', 'prompt': 'unparseable', 'duration': 10})]
+
+    results = scheduler.run(scenes)
+
+    assert results[0].exists()
+    assert 'unparseable' in (output_dir / "odd.se").read_text()
+
+
+def test_free_space_is_measured_on_the_recordings_volume(tmp_path, output_dir, monkeypatch):
+    Usage = namedtuple('Usage', 'total used free')
+    measured = []
+
+    def disk_usage(path):
+        measured.append(Path(path))
+        return Usage(1, 0, 1 << 50)
+
+    monkeypatch.setattr(scheduler_module.shutil, 'disk_usage', disk_usage)
+    release = threading.Event()
+
+    def process(raw_video, output_path):
+        release.wait(5)
+        shutil.copyfile(raw_video, output_path)
+        return output_path
+
+    recordings = tmp_path / "recordings"
+    recordings.mkdir()
+    output_dir.mkdir()
+    encoder = CapturePipeline(process, workers=1)
+    for index in range(2):
+        raw = recordings / f"raw_{index}.mp4"
+        raw.write_bytes(b'\0' * 1024)
+        encoder.submit(index, raw, output_dir / f"out_{index}.mp4")
+    release.set()
+    results = encoder.close()
+
+    assert all(path.exists() for path in results.values())
+    assert measured and set(measured) == {recordings}
@@ -0,0 +1,38 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT = Path(__file__).parent.parent
+HEAVY = {'openai', 'anthropic', 'pyautogui', 'numpy'}
+IMPORT_BUDGET_US = 1_500_000  # Cumulative import time of main, in microseconds
+
+
+def run(statement: str) -> subprocess.CompletedProcess:
+    """Run statement in a fresh interpreter with -X importtime"""
+    return subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                          cwd=PROJECT, capture_output=True, text=True, check=True)
+
+
+@pytest.mark.parametrize('statement', [
+    'import main',
+    'import main; main.cli.main(["generate", "--help"], standalone_mode=False)',
+])
+def test_startup_leaves_heavy_dependencies_unloaded(statement):
+    # importtime also lists imports that failed, so ask the interpreter itself
+    result = run(f'{statement}\nimport sys; print(",".join(sys.modules))')
+
+    loaded = {name.split('.')[0] for name in result.stdout.splitlines()[-1].split(',')}
+    assert 'main' in loaded
+    assert not HEAVY & loaded
+
+
+def test_import_time_budget():
+    times = {}
+    for line in run('import main').stderr.splitlines():
+        if line.startswith('import time:') and 'cumulative' not in line:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            times[name.strip()] = int(cumulative)
+
+    assert times['main'] < IMPORT_BUDGET_US
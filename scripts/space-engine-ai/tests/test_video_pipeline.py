@@ -0,0 +1,51 @@
+import json
+import subprocess
+
+import pytest
+
+from probe import keyframes
+from video_pipeline import VideoProcessor
+
+
+def streams(path) -> list[str]:
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'stream=codec_type', '-of', 'json', str(path)],
+        capture_output=True, text=True, check=True,
+    )
+    return [s['codec_type'] for s in json.loads(result.stdout)['streams']]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_optimize_keeps_source_audio(make_clip, output_dir, workers):
+    source = make_clip(duration=4)
+    output = output_dir / "final.mp4"
+
+    VideoProcessor().process(source, output, workers=workers)
+
+    assert streams(output) == ['video', 'audio']
+
+
+def test_optimize_silent_recording(make_clip, output_dir):
+    source = make_clip(audio=False)
+    output = output_dir / "final.mp4"
+
+    VideoProcessor().process(source, output)
+
+    assert streams(output) == ['video']
+
+
+def test_chunk_boundaries_stay_on_the_gop_grid():
+    # Keyframes every 1.5 s at 30 fps; only multiples of 60 frames qualify
+    keyframes = [i * 1.5 for i in range(8)]
+
+    assert VideoProcessor._chunk_boundaries(keyframes, 12, 3, 30) == [6.0]
+    assert VideoProcessor._chunk_boundaries([0.0, 1.5, 4.5], 6, 2, 30) == []
+
+
+def test_chunked_encode_keeps_global_keyframe_grid(make_clip, output_dir):
+    source = make_clip(duration=12, args=('-g', '45', '-keyint_min', '45', '-sc_threshold', '0'))
+    output = output_dir / "final.mp4"
+
+    VideoProcessor().process(source, output, workers=3)
+
+    assert keyframes(output) == [float(t) for t in range(0, 12, 2)]
@@ -0,0 +1,197 @@
+"""
+Tracing
+
+Lightweight timed spans for the render pipeline. Each span records its
+wall-clock interval, thread and attributes (bytes in/out, resolution,
+tokens, ...). A run can be exported as:
+- Chrome trace JSON (open in chrome://tracing or ui.perfetto.dev)
+- A Prometheus textfile (node_exporter textfile collector) with per-span
+  duration, count, error and byte/token totals
+
+Usage:
+    from tracing import tracer
+    with tracer.span('ffmpeg.optimize', resolution='3840x2160') as span:
+        ...
+        span.set(bytes_out=output.stat().st_size)
+    tracer.write_chrome_trace(path)
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+# Numeric attributes summed into Prometheus counters
+COUNTED_ATTRIBUTES = ('bytes_in', 'bytes_out', 'input_tokens', 'output_tokens')
+METRIC_PREFIX = 'spaceengine'
+
+
+class Span:
+    """One timed operation; attributes can be added until it ends"""
+
+    __slots__ = ('name', 'start', 'end', 'tid', 'attributes')
+
+    def __init__(self, name: str, tid: int, attributes: dict):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = None
+        self.tid = tid
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+
+def _track_id() -> int:
+    """Trace row for the caller: its thread, or its asyncio task if in one
+
+    Concurrent tasks on one event loop get separate rows, since Chrome trace
+    events on the same row must nest.
+    """
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return id(task) % 1_000_000_000
+    return threading.get_native_id()
+
+
+class Tracer:
+    """Collects spans from every thread of a run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._origin_wall = time.time()
+        self.spans: list[Span] = []
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time the enclosed block; exceptions are recorded and re-raised"""
+        span = Span(name, _track_id(), attributes)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            span.end = time.perf_counter()
+            with self._lock:
+                self.spans.append(span)
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self._origin = time.perf_counter()
+            self._origin_wall = time.time()
+
+    def summary(self) -> dict:
+        """Aggregates per span name: count, errors, seconds and counted attributes"""
+        totals = defaultdict(lambda: defaultdict(float))
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            stats = totals[span.name]
+            stats['count'] += 1
+            stats['seconds'] += span.duration
+            if 'error' in span.attributes:
+                stats['errors'] += 1
+            for key in COUNTED_ATTRIBUTES:
+                value = span.attributes.get(key)
+                if isinstance(value, (int, float)):
+                    stats[key] += value
+        return {name: dict(stats) for name, stats in totals.items()}
+
+    def write_chrome_trace(self, path: Path) -> Path:
+        """Write complete ("X") events in the Chrome trace event format"""
+        with self._lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        events = [{
+            'name': span.name,
+            'cat': span.name.split('.', 1)[0],
+            'ph': 'X',
+            'ts': round((span.start - self._origin) * 1e6, 1),
+            'dur': round(span.duration * 1e6, 1),
+            'pid': pid,
+            'tid': span.tid,
+            'args': {k: v if isinstance(v, (int, float, bool, str)) or v is None else str(v)
+                     for k, v in span.attributes.items()},
+        } for span in sorted(spans, key=lambda s: s.start)]
+
+        trace = {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'started': self._origin_wall},
+        }
+        _write_atomic(path, json.dumps(trace))
+        return path
+
+    def write_prometheus(self, path: Path, labels: Optional[dict] = None) -> Path:
+        """Write span totals as a Prometheus textfile (replaced atomically)"""
+        extra = ''.join(f',{k}="{_escape(v)}"' for k, v in (labels or {}).items())
+        summary = self.summary()
+
+        lines = [
+            f'# HELP {METRIC_PREFIX}_span_duration_seconds Time spent in each pipeline span',
+            f'# TYPE {METRIC_PREFIX}_span_duration_seconds summary',
+        ]
+        for name, stats in sorted(summary.items()):
+            label = f'span="{_escape(name)}"{extra}'
+            lines.append(f'{METRIC_PREFIX}_span_duration_seconds_sum{{{label}}} {stats["seconds"]:.6f}')
+            lines.append(f'{METRIC_PREFIX}_span_duration_seconds_count{{{label}}} {int(stats["count"])}')
+
+        lines += [
+            f'# HELP {METRIC_PREFIX}_span_errors_total Spans that ended with an exception',
+            f'# TYPE {METRIC_PREFIX}_span_errors_total counter',
+        ]
+        for name, stats in sorted(summary.items()):
+            lines.append(f'{METRIC_PREFIX}_span_errors_total{{span="{_escape(name)}"{extra}}} '
+                         f'{int(stats.get("errors", 0))}')
+
+        for key in COUNTED_ATTRIBUTES:
+            rows = [(name, stats[key]) for name, stats in sorted(summary.items()) if key in stats]
+            if not rows:
+                continue
+            lines += [
+                f'# HELP {METRIC_PREFIX}_span_{key}_total Sum of {key} over spans',
+                f'# TYPE {METRIC_PREFIX}_span_{key}_total counter',
+            ]
+            for name, value in rows:
+                lines.append(f'{METRIC_PREFIX}_span_{key}_total{{span="{_escape(name)}"{extra}}} {int(value)}')
+
+        _write_atomic(path, '\n'.join(lines) + '\n')
+        return path
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _write_atomic(path: Path, text: str):
+    """Write via a temp file so readers never see a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+def file_size(path) -> Optional[int]:
+    """Size of path in bytes, or None if it does not exist"""
+    try:
+        return Path(path).stat().st_size
+    except (OSError, TypeError):
+        return None
+
+
+tracer = Tracer()
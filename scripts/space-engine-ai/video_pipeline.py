@@ -6,14 +6,282 @@ Post-processing for Space Engine recordings:
 - Looping/extending
 - Audio merging
 - Quality optimization
+- Rendition ladders (several deliverables from one decode)
 """
 
+import csv
+import math
+import os
+import stat
 import subprocess
 import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
-from config import OUTPUT_DIR, DEFAULT_CRF, DEFAULT_CODEC
+from config import (
+    OUTPUT_DIR,
+    DEFAULT_CRF,
+    DEFAULT_CODEC,
+    DEFAULT_FPS,
+    KEYFRAME_INTERVAL,
+    ENCODE_WORKERS,
+    LIVE_CHUNK_BYTES,
+    LIVE_POLL_INTERVAL,
+    RENDITIONS,
+)
+from ffmpeg_runner import runner, wait_all
+from probe import probe, keyframes
+
+
+def x264_args(crf: int = DEFAULT_CRF) -> list[str]:
+    """Encoder settings shared by every re-encoding path
+    
+    The GOP is pinned so single-process and chunked encodes place keyframes
+    on the same grid.
+    """
+    return [
+        '-c:v', DEFAULT_CODEC,
+        '-crf', str(crf),
+        '-preset', 'slow',
+        '-profile:v', 'high',
+        '-level', '4.1',
+        '-pix_fmt', 'yuv420p',  # Filters such as xfade may negotiate 4:4:4, which High rejects
+        '-g', str(KEYFRAME_INTERVAL),
+        '-keyint_min', str(KEYFRAME_INTERVAL),
+        '-sc_threshold', '0',
+    ]
+
+
+X264_ARGS = x264_args()
+
+
+@dataclass
+class Rendition:
+    """One deliverable of the rendition ladder (see RENDITIONS in config.py)"""
+    name: str
+    width: int
+    height: int
+    crf: int = DEFAULT_CRF
+    maxrate: Optional[int] = None  # kbit/s; the VBV buffer holds two seconds' worth
+    crop: Optional[str] = None  # FFmpeg crop arguments; default: centre crop to width:height
+    
+    @classmethod
+    def named(cls, name: str) -> 'Rendition':
+        spec = dict(RENDITIONS[name])
+        width, height = spec.pop('size')
+        return cls(name, width, height, **spec)
+    
+    def filter(self) -> str:
+        """Crop to the rendition's aspect ratio, then scale (filtergraph syntax)"""
+        w, h = self.width, self.height
+        crop = self.crop or (f"'trunc(min(iw,ih*{w}/{h})/2)*2':"
+                             f"'trunc(min(ih,iw*{h}/{w})/2)*2'")
+        return f"crop={crop},scale={w}:{h}:flags=lanczos,setsar=1"
+    
+    def encoder_args(self) -> list[str]:
+        args = x264_args(self.crf)
+        if self.maxrate:
+            args += ['-maxrate', f'{self.maxrate}k', '-bufsize', f'{self.maxrate * 2}k']
+        return args
+    
+    def settings(self) -> dict:
+        """Everything that affects the encoded output (for artifact keys)"""
+        return {**asdict(self), 'filter': self.filter(), 'encoder': self.encoder_args()}
+
+
+class FFmpegPipeline:
+    """Collects processing stages and runs them as one FFmpeg invocation
+
+    Instead of writing an intermediate file per stage, every requested stage
+    (optimize, loop, crossfade, audio merge, thumbnail, renditions) is
+    compiled into a single filter graph with one or more outputs, so the
+    source is read and decoded exactly once.
+    """
+    
+    def __init__(self, ffmpeg: str, input_path: Path):
+        self.ffmpeg = ffmpeg
+        self.input_path = input_path
+        self.encode = False
+        self.audio_path: Optional[Path] = None
+        self.source_duration: Optional[float] = None
+        self.target_duration: Optional[float] = None
+        self.fade_duration: Optional[float] = None
+        self.thumbnail_path: Optional[Path] = None
+        self.thumbnail_time: float = 0
+        self.ladder: list[tuple[Rendition, Path]] = []
+    
+    def optimize(self) -> 'FFmpegPipeline':
+        """Re-encode video with the YouTube delivery settings"""
+        self.encode = True
+        return self
+    
+    def merge_audio(self, audio_path: Path) -> 'FFmpegPipeline':
+        """Mux an audio track into the output"""
+        self.audio_path = audio_path
+        return self
+    
+    def loop(self, target_duration: float, source_duration: float) -> 'FFmpegPipeline':
+        """Repeat the source until it reaches target_duration seconds"""
+        self.target_duration = target_duration
+        self.source_duration = source_duration
+        return self
+    
+    def crossfade(self, fade_duration: float, source_duration: float) -> 'FFmpegPipeline':
+        """Crossfade the end of each pass into the start of the next"""
+        if fade_duration * 2 >= source_duration:
+            raise ValueError("Crossfade must be shorter than half the source duration")
+        self.fade_duration = fade_duration
+        self.source_duration = source_duration
+        self.encode = True
+        return self
+    
+    def thumbnail(self, thumbnail_path: Path, timestamp: float = 0) -> 'FFmpegPipeline':
+        """Write a still frame as an extra output of the same pass"""
+        self.thumbnail_path = thumbnail_path
+        self.thumbnail_time = timestamp
+        return self
+    
+    def renditions(self, outputs: list[tuple[Rendition, Path]]) -> 'FFmpegPipeline':
+        """Also write each rendition, split from the same decoded video"""
+        self.ladder = list(outputs)
+        return self
+    
+    def build(self, output_path: Optional[Path]) -> list[str]:
+        """Compile the collected stages into an FFmpeg command line
+        
+        output_path may be None to write only the renditions (and thumbnail).
+        """
+        cmd = [self.ffmpeg]
+        filters = []
+        video = '0:v:0'
+        target = self.target_duration
+        
+        if self.fade_duration:
+            # Lead with the clip's tail so the output opens on the seam, then
+            # chain one input per pass with an xfade at every boundary
+            fade = self.fade_duration
+            period = self.source_duration - fade
+            target = target or period
+            passes = max(1, math.ceil(target / period))
+            
+            cmd += ['-ss', str(period), '-i', str(self.input_path)]
+            for _ in range(passes):
+                cmd += ['-i', str(self.input_path)]
+            
+            previous, length = '0:v', fade
+            for i in range(1, passes + 1):
+                label = f'x{i}'
+                filters.append(
+                    f'[{previous}][{i}:v]xfade=transition=fade:'
+                    f'duration={fade}:offset={length - fade}[{label}]'
+                )
+                previous, length = label, length + period
+            video = f'[{previous}]'
+        elif self.target_duration:
+            loops = math.ceil(self.target_duration / self.source_duration)
+            cmd += ['-stream_loop', str(loops - 1), '-i', str(self.input_path)]
+        else:
+            cmd += ['-i', str(self.input_path)]
+        
+        audio_index = None
+        if self.audio_path:
+            audio_index = len([arg for arg in cmd if arg == '-i'])
+            cmd += ['-i', str(self.audio_path)]
+        
+        # Fan the decoded video out to every output that needs frames. A
+        # stream-copied main output maps the input directly instead.
+        filtered = bool(filters) or self.encode
+        branches = [f'r{i}' for i in range(len(self.ladder))]
+        thumb = None
+        if self.thumbnail_path and (filtered or output_path is None):
+            branches.append('thumbsrc')
+        if branches:
+            if output_path is not None and filtered:
+                branches.insert(0, 'vout')
+            source = video if video.startswith('[') else f'[{video}]'
+            filters.append(f'{source}split={len(branches)}' + ''.join(f'[{b}]' for b in branches))
+            if 'vout' in branches:
+                video = '[vout]'
+            if 'thumbsrc' in branches:
+                filters.append(
+                    f'[thumbsrc]trim=start={self.thumbnail_time},setpts=PTS-STARTPTS[thumb]'
+                )
+                thumb = '[thumb]'
+            for i, (rendition, _) in enumerate(self.ladder):
+                filters.append(f'[r{i}]{rendition.filter()}[r{i}out]')
+        
+        if filters:
+            cmd += ['-filter_complex', ';'.join(filters)]
+        
+        def output(video: str, codec_args: list[str], path: Path) -> list[str]:
+            args = ['-map', video]
+            if audio_index is not None:
+                args += ['-map', f'{audio_index}:a:0', '-c:a', 'aac', '-b:a', '192k', '-shortest']
+            elif not self.fade_duration:
+                # Keep the recording's own audio, if any (a crossfaded loop
+                # starts mid-clip, so its source audio would not line up)
+                args += ['-map', '0:a?', '-c:a', 'aac', '-b:a', '192k']
+            args += codec_args
+            if target:
+                args += ['-t', str(target)]
+            return args + ['-movflags', '+faststart', '-y', str(path)]
+        
+        # Main output
+        if output_path is not None:
+            cmd += output(video, X264_ARGS if self.encode else ['-c:v', 'copy'], output_path)
+        
+        # Renditions
+        for i, (rendition, path) in enumerate(self.ladder):
+            cmd += output(f'[r{i}out]', rendition.encoder_args(), path)
+        
+        # Thumbnail output
+        if self.thumbnail_path:
+            if thumb:
+                cmd += ['-map', thumb]
+            else:
+                cmd += ['-map', '0:v:0', '-ss', str(self.thumbnail_time)]
+            cmd += ['-frames:v', '1', '-y', str(self.thumbnail_path)]
+        
+        return cmd
+    
+    def expected_duration(self) -> Optional[float]:
+        """Seconds of video the main output will hold, if known (for the ETA)"""
+        if self.fade_duration:
+            return self.target_duration or self.source_duration - self.fade_duration
+        if self.target_duration:
+            return self.target_duration
+        if self.input_path.is_file():  # Not pipe:0 or a FIFO
+            try:
+                return probe(self.input_path).duration
+            except (subprocess.CalledProcessError, KeyError, ValueError):
+                pass
+        return None
+    
+    def stages(self) -> list[str]:
+        """Names of the requested stages, for tracing"""
+        flags = [('optimize', self.encode), ('loop', self.target_duration),
+                 ('crossfade', self.fade_duration), ('audio', self.audio_path),
+                 ('thumbnail', self.thumbnail_path),
+                 ('renditions', ','.join(r.name for r, _ in self.ladder))]
+        return [name for name, on in flags if on]
+    
+    def run(self, output_path: Optional[Path]) -> Optional[Path]:
+        """Execute the pipeline in a single FFmpeg process"""
+        outputs = [output_path, self.thumbnail_path, *(path for _, path in self.ladder)]
+        for path in outputs:
+            if path:
+                path.parent.mkdir(parents=True, exist_ok=True)
+        runner().run(self.build(output_path), 'pipeline',
+                     inputs=[self.input_path, self.audio_path],
+                     outputs=outputs,
+                     duration=self.expected_duration(),
+                     threads=None if self.encode or self.ladder else 1,
+                     stages=','.join(self.stages()))
+        return output_path
 
 
 class VideoProcessor:
@@ -25,66 +293,279 @@ class VideoProcessor:
             print("Warning: FFmpeg not found in PATH")
     
     def process(self, input_path: Path, output_path: Path, 
-                audio_path: Optional[Path] = None) -> Path:
-        """Full processing pipeline"""
+                audio_path: Optional[Path] = None,
+                loop_to: Optional[int] = None,
+                crossfade: Optional[float] = None,
+                thumbnail: bool = False,
+                renditions: Optional[dict[str, Path]] = None,
+                workers: Optional[int] = None) -> Path:
+        """Full processing pipeline, run as a single FFmpeg pass
+        
+        renditions maps RENDITIONS names to output paths; they are encoded
+        alongside the main output from the same decode.
+        """
+        
+        if not input_path.exists():
+            raise FileNotFoundError(f"Input video not found: {input_path}")
+        
+        workers = workers or ENCODE_WORKERS
+        if workers > 1 and not (loop_to or crossfade or renditions):
+            # Audio is muxed during the stream-copy concat, so the chunked
+            # path still only encodes the video once
+            if not (audio_path and audio_path.exists()):
+                audio_path = None
+            self._optimize_chunked(input_path, output_path, workers, audio_path)
+            if thumbnail:
+                self.add_thumbnail(output_path)
+            return output_path
+        
+        pipeline = self.pipeline(input_path).optimize()
+        
+        if loop_to or crossfade:
+            duration = self._get_duration(input_path)
+            if loop_to:
+                pipeline.loop(loop_to, duration)
+            if crossfade:
+                pipeline.crossfade(crossfade, duration)
+        
+        if audio_path and audio_path.exists():
+            pipeline.merge_audio(audio_path)
+        
+        if thumbnail:
+            pipeline.thumbnail(output_path.with_suffix('.jpg'))
+        
+        if renditions:
+            pipeline.renditions(self._ladder(renditions))
+        
+        print(f"Processing video: {input_path.name}")
+        return pipeline.run(output_path)
+    
+    def process_renditions(self, input_path: Path, renditions: dict[str, Path],
+                           audio_path: Optional[Path] = None) -> dict[str, Path]:
+        """Encode a rendition ladder from a finished master in one FFmpeg pass
         
+        The master is decoded once and split to every rendition, instead of
+        a separate process() run (and decode) per deliverable.
+        """
         if not input_path.exists():
             raise FileNotFoundError(f"Input video not found: {input_path}")
         
-        # Step 1: Optimize video
-        optimized = self._optimize(input_path)
+        pipeline = self.pipeline(input_path).renditions(self._ladder(renditions))
+        if audio_path and audio_path.exists():
+            pipeline.merge_audio(audio_path)
         
-        # Step 2: Add audio if provided
+        print(f"Encoding renditions ({', '.join(renditions)}): {input_path.name}")
+        pipeline.run(None)
+        return renditions
+    
+    @staticmethod
+    def _ladder(renditions: dict[str, Path]) -> list[tuple[Rendition, Path]]:
+        return [(Rendition.named(name), path) for name, path in renditions.items()]
+    
+    def process_live(self, recording_path: Path, output_path: Path,
+                     finished: Callable[[], bool],
+                     audio_path: Optional[Path] = None,
+                     drained: Optional[threading.Event] = None) -> Path:
+        """Encode a recording while it is still being written
+        
+        The growing file is tailed and streamed into FFmpeg's stdin until
+        finished() returns True and the end of the file has been read, so
+        the encode overlaps the real-time capture. drained is set once the
+        recording has been read to the end and closed (FFmpeg may still be
+        encoding), after which the file can be moved. A named pipe is handed
+        to FFmpeg directly. The recording must be in a streamable container
+        (MKV, MPEG-TS, fragmented MP4): a regular MP4 cannot be decoded
+        until its index is written at the end.
+        """
+        if stat.S_ISFIFO(recording_path.stat().st_mode):
+            source = recording_path
+        else:
+            source = Path('pipe:0')
+        
+        pipeline = self.pipeline(source).optimize()
         if audio_path and audio_path.exists():
-            optimized = self._merge_audio(optimized, audio_path)
+            pipeline.merge_audio(audio_path)
+        cmd = pipeline.build(output_path)
+        
+        print(f"Live encoding: {recording_path.name}")
+        output_path.parent.mkdir(parents=True, exist_ok=True)
         
-        # Step 3: Move to final location
-        shutil.move(str(optimized), str(output_path))
+        # A recording has no known length yet, and waits for Space Engine
+        # are not stalls
+        options = dict(outputs=[output_path], threads=None, watch_stalls=False)
+        if source == recording_path:
+            try:
+                runner().run(cmd, 'live', source='fifo', **options)
+            finally:
+                if drained:
+                    drained.set()
+            return output_path
         
+        read_fd, write_fd = os.pipe()
+        feeder = threading.Thread(
+            target=self._tail, args=(recording_path, open(write_fd, 'wb'), finished, drained),
+            daemon=True
+        )
+        feeder.start()
+        try:
+            runner().run(cmd, 'live', inputs=[recording_path], stdin=read_fd,
+                         source='tail', **options)
+        finally:
+            os.close(read_fd)  # Unblocks the feeder if FFmpeg exited early
+            feeder.join()
         return output_path
     
-    def _optimize(self, input_path: Path) -> Path:
+    @staticmethod
+    def _tail(path: Path, sink, finished: Callable[[], bool],
+              drained: Optional[threading.Event] = None):
+        """Copy a growing file into sink until the writer is done"""
+        try:
+            with open(path, 'rb') as f:
+                while True:
+                    data = f.read(LIVE_CHUNK_BYTES)
+                    if data:
+                        sink.write(data)
+                        continue
+                    
+                    if finished():
+                        # Drain anything written between the last read and finishing
+                        while data := f.read(LIVE_CHUNK_BYTES):
+                            sink.write(data)
+                        break
+                    
+                    time.sleep(LIVE_POLL_INTERVAL)
+        except BrokenPipeError:
+            pass  # FFmpeg exited early; its return code reports the error
+        finally:
+            if drained:
+                drained.set()
+            try:
+                sink.close()
+            except BrokenPipeError:
+                pass
+    
+    def pipeline(self, input_path: Path) -> FFmpegPipeline:
+        """Start a single-pass pipeline for input_path"""
+        return FFmpegPipeline(self.ffmpeg, input_path)
+    
+    def _optimize(self, input_path: Path, workers: Optional[int] = None) -> Path:
         """Optimize video for YouTube"""
         output = OUTPUT_DIR / f"optimized_{input_path.name}"
         
-        cmd = [
-            self.ffmpeg,
-            '-i', str(input_path),
-            '-c:v', DEFAULT_CODEC,
-            '-crf', str(DEFAULT_CRF),
-            '-preset', 'slow',
-            '-profile:v', 'high',
-            '-level', '4.1',
-            '-movflags', '+faststart',  # Web optimization
-            '-y',
-            str(output)
-        ]
+        workers = workers or ENCODE_WORKERS
+        if workers > 1:
+            return self._optimize_chunked(input_path, output, workers)
         
         print(f"Optimizing video: {input_path.name}")
-        subprocess.run(cmd, check=True)
+        return self.pipeline(input_path).optimize().run(output)
+    
+    def _optimize_chunked(self, input_path: Path, output_path: Path, workers: int,
+                          audio_path: Optional[Path] = None) -> Path:
+        """Optimize video by encoding keyframe-aligned chunks in parallel
         
-        return output
+        The input is stream-copied into `workers` segments (the segment muxer
+        only cuts on keyframes), each segment is encoded by its own FFmpeg
+        process, and the results are joined with the concat demuxer using
+        `-c copy`. Forced keyframes keep every chunk on the global GOP grid.
+        """
+        info = probe(input_path)
+        fps = info.fps or DEFAULT_FPS
+        split_times = self._chunk_boundaries(keyframes(input_path), info.duration, workers, fps)
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        work_dir = Path(tempfile.mkdtemp(prefix="chunks_", dir=OUTPUT_DIR))
+        threads = max(1, runner().cpu_budget // workers)
+        
+        print(f"Optimizing video in {len(split_times) + 1} chunks: {input_path.name}")
+        
+        try:
+            # Step 1: Split at keyframes without re-encoding
+            segment_list = work_dir / "segments.csv"
+            runner().run([
+                self.ffmpeg,
+                '-i', str(input_path),
+                '-map', '0:v:0',
+                '-c', 'copy',
+                '-f', 'segment',
+                '-segment_times', ','.join(f'{t:.6f}' for t in split_times) or str(info.duration),
+                '-segment_list', str(segment_list),
+                '-segment_list_type', 'csv',
+                '-reset_timestamps', '1',
+                '-y',
+                str(work_dir / "raw_%04d.mkv")
+            ], 'split', inputs=[input_path], duration=info.duration, chunks=len(split_times) + 1)
+            
+            with open(segment_list, newline='') as f:
+                segments = [(work_dir / name, float(start), float(end))
+                            for name, start, end in csv.reader(f)]
+            
+            # Step 2: Encode chunks concurrently, one FFmpeg process each
+            # (they fit side by side in the runner's CPU budget)
+            encoded, jobs = [], []
+            for raw, start, end in segments:
+                chunk = raw.with_name(raw.stem.replace('raw_', 'enc_') + '.mp4')
+                offset = round(start * fps)
+                jobs.append(runner().submit([
+                    self.ffmpeg,
+                    '-i', str(raw),
+                    *X264_ARGS,
+                    '-force_key_frames', f'expr:eq(mod(n+{offset},{KEYFRAME_INTERVAL}),0)',
+                    '-threads', str(threads),
+                    '-y',
+                    str(chunk)
+                ], 'encode_chunk', inputs=[raw], outputs=[chunk], duration=end - start,
+                    threads=threads, start=start))
+                encoded.append(chunk)
+            wait_all(jobs)
+            
+            # Step 3: Join losslessly (and mux audio in the same copy pass)
+            concat_file = work_dir / "concat_list.txt"
+            with open(concat_file, 'w') as f:
+                for chunk in encoded:
+                    f.write(f"file '{chunk.absolute()}'\n")
+            
+            cmd = [self.ffmpeg, '-f', 'concat', '-safe', '0', '-i', str(concat_file)]
+            if audio_path:
+                cmd += ['-i', str(audio_path), '-map', '0:v:0', '-map', '1:a:0',
+                        '-c:a', 'aac', '-b:a', '192k', '-shortest']
+            else:
+                # The chunks are video only; take the source's audio, if any
+                cmd += ['-i', str(input_path), '-map', '0:v:0', '-map', '1:a?',
+                        '-c:a', 'aac', '-b:a', '192k']
+            cmd += ['-c:v', 'copy', '-movflags', '+faststart', '-y', str(output_path)]
+            runner().run(cmd, 'concat', inputs=[*encoded, audio_path or input_path],
+                         outputs=[output_path], duration=info.duration)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        
+        return output_path
+    
+    @staticmethod
+    def _chunk_boundaries(keyframes: list[float], duration: float, chunks: int,
+                          fps: float) -> list[float]:
+        """Pick the on-grid keyframe closest to each even split point
+        
+        Only source keyframes whose frame index is a multiple of
+        KEYFRAME_INTERVAL are eligible, so every chunk starts on the global
+        GOP grid and the forced keyframes line up across the joins. With
+        too few of those, fewer (longer) chunks are produced.
+        """
+        aligned = [t for t in keyframes if t > 0 and round(t * fps) % KEYFRAME_INTERVAL == 0]
+        boundaries = []
+        for i in range(1, chunks):
+            if not aligned:
+                break
+            target = duration * i / chunks
+            target = min(aligned, key=lambda t: abs(t - target))
+            if not boundaries or target > boundaries[-1]:
+                boundaries.append(target)
+        return boundaries
     
     def _merge_audio(self, video_path: Path, audio_path: Path) -> Path:
         """Merge audio track with video"""
         output = OUTPUT_DIR / f"merged_{video_path.name}"
         
-        cmd = [
-            self.ffmpeg,
-            '-i', str(video_path),
-            '-i', str(audio_path),
-            '-c:v', 'copy',
-            '-c:a', 'aac',
-            '-b:a', '192k',
-            '-map', '0:v:0',
-            '-map', '1:a:0',
-            '-shortest',
-            '-y',
-            str(output)
-        ]
-        
         print(f"Merging audio: {audio_path.name}")
-        subprocess.run(cmd, check=True)
+        self.pipeline(video_path).merge_audio(audio_path).run(output)
         
         # Clean up intermediate
         video_path.unlink()
@@ -106,6 +587,7 @@ class VideoProcessor:
         
         # Create concat file
         concat_file = OUTPUT_DIR / "concat_list.txt"
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
         with open(concat_file, 'w') as f:
             for _ in range(loops_needed):
                 f.write(f"file '{input_path.absolute()}'\n")
@@ -122,62 +604,121 @@ class VideoProcessor:
             str(output_path)
         ]
         
-        subprocess.run(cmd, check=True)
+        runner().run(cmd, 'loop', inputs=[input_path], outputs=[output_path],
+                     duration=target_duration, loops=loops_needed)
         concat_file.unlink()
         
         return output_path
     
     def crossfade_loop(self, input_path: Path, target_duration: int,
-                       fade_duration: float = 2.0) -> Path:
-        """Create seamless loop with crossfade transitions"""
+                       fade_duration: float = 2.0, stream_copy: bool = True) -> Path:
+        """Create seamless loop with crossfade transitions
+        
+        With stream_copy (the default) only one loop's worth of video is
+        encoded; see _crossfade_loop_copy. Otherwise every looped pass is
+        decoded and re-encoded through the filter graph.
+        """
         
         output_path = OUTPUT_DIR / f"seamless_{input_path.name}"
         duration = self._get_duration(input_path)
         
         print(f"Creating seamless loop with {fade_duration}s crossfades")
         
-        # Complex filter for crossfade
-        # This creates a seamless loop by crossfading end to beginning
+        if stream_copy:
+            return self._crossfade_loop_copy(input_path, output_path, target_duration,
+                                             fade_duration, duration)
         
-        filter_complex = f"""
-        [0:v]split[main][fade];
-        [fade]trim=start={duration - fade_duration},setpts=PTS-STARTPTS[fadeout];
-        [main]trim=end={fade_duration},setpts=PTS-STARTPTS[fadein];
-        [fadeout][fadein]xfade=transition=fade:duration={fade_duration}:offset=0[seamless];
-        [0:v][seamless]concat=n=2:v=1[out]
+        pipeline = self.pipeline(input_path)
+        pipeline.loop(target_duration, duration).crossfade(fade_duration, duration)
+        pipeline.run(output_path)
+        
+        return output_path
+    
+    def _crossfade_loop_copy(self, input_path: Path, output_path: Path,
+                             target_duration: int, fade_duration: float,
+                             duration: float) -> Path:
+        """Assemble a crossfaded loop from two encoded clips and stream copies
+        
+        The seam (the clip's tail crossfaded into its head) and the clean body
+        between the fades are each encoded once with identical settings. The
+        target duration is then built as seam, body, seam, body, ... with the
+        concat demuxer and `-c copy`, so encode time no longer grows with the
+        number of loops.
         """
+        if fade_duration * 2 >= duration:
+            raise ValueError("Crossfade must be shorter than half the source duration")
         
-        cmd = [
+        period = duration - fade_duration
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        work_dir = Path(tempfile.mkdtemp(prefix="loop_", dir=OUTPUT_DIR))
+        seam = work_dir / "seam.mp4"
+        body = work_dir / "body.mp4"
+        threads = max(1, runner().cpu_budget // 2)  # Seam and body encode side by side
+        encode_args = [*X264_ARGS, '-threads', str(threads), '-an']
+        
+        seam_cmd = [
+            self.ffmpeg,
+            '-ss', str(period), '-t', str(fade_duration), '-i', str(input_path),
+            '-t', str(fade_duration), '-i', str(input_path),
+            '-filter_complex',
+            f'[0:v][1:v]xfade=transition=fade:duration={fade_duration}:offset=0[seam]',
+            '-map', '[seam]',
+            *encode_args,
+            '-y',
+            str(seam)
+        ]
+        body_cmd = [
             self.ffmpeg,
-            '-stream_loop', str(int(target_duration / duration)),
+            '-ss', str(fade_duration), '-t', str(period - fade_duration),
             '-i', str(input_path),
-            '-filter_complex', filter_complex.strip(),
-            '-map', '[out]',
-            '-t', str(target_duration),
+            '-map', '0:v:0',
+            *encode_args,
             '-y',
-            str(output_path)
+            str(body)
         ]
         
-        subprocess.run(cmd, check=True)
+        try:
+            # The two encodes are independent, so run them side by side
+            wait_all([
+                runner().submit(seam_cmd, 'seam', inputs=[input_path], outputs=[seam],
+                                duration=fade_duration, threads=threads),
+                runner().submit(body_cmd, 'body', inputs=[input_path], outputs=[body],
+                                duration=period - fade_duration, threads=threads),
+            ])
+            
+            loops_needed = math.ceil(target_duration / period)
+            concat_file = work_dir / "concat_list.txt"
+            with open(concat_file, 'w') as f:
+                for _ in range(loops_needed):
+                    f.write(f"file '{seam.absolute()}'\n")
+                    f.write(f"file '{body.absolute()}'\n")
+            
+            cmd = [
+                self.ffmpeg,
+                '-f', 'concat',
+                '-safe', '0',
+                '-i', str(concat_file),
+                '-t', str(target_duration),
+                '-c', 'copy',
+                '-movflags', '+faststart',
+                '-y',
+                str(output_path)
+            ]
+            runner().run(cmd, 'concat', inputs=[seam, body], outputs=[output_path],
+                         duration=target_duration, loops=loops_needed)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
         
         return output_path
     
     def _get_duration(self, video_path: Path) -> float:
         """Get video duration in seconds"""
-        cmd = [
-            'ffprobe',
-            '-v', 'error',
-            '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
-            str(video_path)
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        return float(result.stdout.strip())
+        return probe(video_path).duration
     
-    def add_thumbnail(self, video_path: Path, timestamp: float = 0) -> Path:
-        """Extract thumbnail from video"""
-        thumbnail_path = video_path.with_suffix('.jpg')
+    def add_thumbnail(self, video_path: Path, timestamp: float = 0,
+                      thumbnail_path: Optional[Path] = None) -> Path:
+        """Extract thumbnail from video (next to it, unless thumbnail_path is given)"""
+        thumbnail_path = thumbnail_path or video_path.with_suffix('.jpg')
         
         cmd = [
             self.ffmpeg,
@@ -188,7 +729,7 @@ class VideoProcessor:
             str(thumbnail_path)
         ]
         
-        subprocess.run(cmd, check=True)
+        runner().run(cmd, 'thumbnail', inputs=[video_path], outputs=[thumbnail_path])
         return thumbnail_path
 
 